@@ -0,0 +1,360 @@
+"""Benchmarks of point generation, coordinate conversion and output
+
+Every benchmark is timed (best of `--repeat` runs) and its peak memory is measured in a separate
+run: memory allocated through Python's allocator (including NumPy arrays) for the in-process
+benchmarks, the maximum resident set size of the process for the CLI. Results are written as
+JSON, so that runs on different commits can be compared:
+
+    python benchmarks/run.py --sizes 1000 100000 1000000 -o before.json
+    python benchmarks/run.py --sizes 1000 100000 1000000 -o after.json
+    python benchmarks/run.py --compare before.json after.json
+"""
+from __future__ import division, print_function
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+from tempfile import mkdtemp
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from equidistantpoints import EquidistantPoints, coord_utils  # noqa: E402
+
+RESULTS_VERSION = 1
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000, 10000000)
+BENCHMARKS = OrderedDict()
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+
+def benchmark(name, in_process=True):
+    """
+    Registers a benchmark. The decorated function prepares everything that should not be
+    measured and returns the function to be measured.
+
+    Parameters
+    ----------
+    name : str
+        Name of the benchmark
+    in_process : bool
+        Whether the benchmark runs in this process. Otherwise, the measured function runs a
+        subprocess and returns its run time in seconds and its maximum resident set size in
+        bytes (None if it cannot be measured).
+    """
+    def register(setup):
+        BENCHMARKS[name] = (setup, in_process)
+        return setup
+
+    return register
+
+
+@benchmark('generate_points')
+def _generate_points(n_points, directory):
+    if coord_utils.HAS_NUMPY:
+        return lambda: coord_utils.generate_points_array(n_points)
+    return lambda: coord_utils.generate_points(n_points)
+
+
+@benchmark('cartesian_to_ecef')
+def _cartesian_to_ecef(n_points, directory):
+    if coord_utils.HAS_NUMPY:
+        cartesian = coord_utils.generate_points_array(n_points)
+        convert = coord_utils.cartesian_to_ecef_array
+    else:
+        cartesian = coord_utils.generate_points(n_points)
+        convert = coord_utils.cartesian_to_ecef
+
+    return lambda: convert(cartesian, 6378137.0, 6356752.3, coord_utils.ROTATION_AXIS)
+
+
+@benchmark('ecef_to_geodetic')
+def _ecef_to_geodetic(n_points, directory):
+    ecef = EquidistantPoints(n_points).ecef
+    if coord_utils.HAS_NUMPY:
+        return lambda: coord_utils.ecef_to_geodetic_array(ecef, coord_utils.ROTATION_AXIS)
+    ecef = ecef.tolist()
+    return lambda: coord_utils.ecef_to_geodetic(ecef, coord_utils.ROTATION_AXIS)
+
+
+@benchmark('geodetic_to_ecef')
+def _geodetic_to_ecef(n_points, directory):
+    geodetic = EquidistantPoints(n_points).geodetic
+    if coord_utils.HAS_NUMPY:
+        return lambda: coord_utils.geodetic_to_ecef_array(geodetic, coord_utils.ROTATION_AXIS)
+    geodetic = geodetic.tolist()
+    return lambda: coord_utils.geodetic_to_ecef(geodetic, coord_utils.ROTATION_AXIS)
+
+
+@benchmark('ecef_to_cartesian')
+def _ecef_to_cartesian(n_points, directory):
+    ecef = EquidistantPoints(n_points).ecef
+    if coord_utils.HAS_NUMPY:
+        convert = coord_utils.ecef_to_cartesian_array
+    else:
+        ecef, convert = ecef.tolist(), coord_utils.ecef_to_cartesian
+
+    return lambda: convert(ecef, 6378137.0, 6356752.3, coord_utils.ROTATION_AXIS)
+
+
+@benchmark('region')
+def _region(n_points, directory):
+    points = EquidistantPoints(n_points)
+    return lambda: points.region((5.9, 45.8, 10.5, 47.8)).geodetic
+
+
+def _writer(method, cached_type, file_name, kwargs):
+    """Benchmark of a write method of EquidistantPoints, with the coordinates computed already"""
+    def setup(n_points, directory):
+        points = EquidistantPoints(n_points)
+        getattr(points, cached_type)
+        file_path = os.path.join(directory, file_name)
+        return lambda: getattr(points, method)(file_path, **kwargs)
+
+    return setup
+
+
+for _method, _cached_type, _file_name, _kwargs in (
+        ('write_geodetic_to_csv', 'geodetic', 'geodetic.csv', {}),
+        ('write_cartesian_to_csv', 'cartesian', 'cartesian.csv', {}),
+        ('write_ecef_to_csv', 'ecef', 'ecef.csv', {}),
+        ('write_geodetic_to_geojson', 'geodetic', 'geodetic.json', {}),
+        ('write_to_ndjson', 'geodetic', 'geodetic.ndjson', {'coord_type': 'geodetic'}),
+        ('write_to_binary', 'ecef', 'ecef.edp', {'coord_type': 'ecef'}),
+        ('write_to_npy', 'ecef', 'ecef.npy', {'coord_type': 'ecef'})):
+    benchmark(_method)(_writer(_method, _cached_type, _file_name, _kwargs))
+
+
+# Runs a command and prints its run time and maximum resident set size. The size is measured in
+# this small process rather than in the benchmark process, whose memory would be counted as well
+# while the forked child has not replaced it with the command yet.
+LAUNCHER = """
+import json, subprocess, sys, time
+try:
+    import resource
+except ImportError:
+    resource = None
+timer = getattr(time, 'perf_counter', time.time)
+start = timer()
+subprocess.check_call(sys.argv[1:])
+seconds = timer() - start
+peak = None
+if resource is not None:
+    # ru_maxrss is given in kilobytes on Linux, in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    peak *= 1 if sys.platform == 'darwin' else 1024
+print(json.dumps([seconds, peak]))
+"""
+
+
+@benchmark('cli', in_process=False)
+def _cli(n_points, directory):
+    command = [sys.executable, '-c', LAUNCHER, sys.executable, '-c',
+               'from equidistantpoints import cli; cli.main()', str(n_points),
+               '-f', os.path.join(directory, 'geodetic.csv')]
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        [ROOT] + [path for path in [os.environ.get('PYTHONPATH')] if path]))
+
+    def run():
+        return json.loads(subprocess.check_output(command, env=environment).decode('ascii'))
+
+    return run
+
+
+def run_benchmark(name, n_points, repeat):
+    """
+    Runs a benchmark
+
+    Parameters
+    ----------
+    name : str
+        Name of the benchmark
+    n_points : int
+        Number of points
+    repeat : int
+        Number of timed runs
+
+    Returns
+    -------
+    dict
+        'name', 'n_points', 'seconds' (fastest run), 'peak_bytes' (None if it cannot be
+        measured) and 'repeat'
+    """
+    setup, in_process = BENCHMARKS[name]
+    directory = mkdtemp()
+    try:
+        function = setup(n_points, directory)
+        if in_process:
+            seconds = []
+            for _ in range(repeat):
+                start = _timer()
+                function()
+                seconds.append(_timer() - start)
+            peak = None
+            if tracemalloc is not None:
+                tracemalloc.start()
+                function()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        else:
+            seconds, peaks = zip(*[function() for _ in range(repeat)])
+            peak = max(peaks) if None not in peaks else None
+    finally:
+        shutil.rmtree(directory)
+
+    return {'name': name, 'n_points': n_points, 'seconds': min(seconds), 'peak_bytes': peak,
+            'repeat': repeat}
+
+
+def run(names, sizes, repeat=3):
+    """
+    Runs benchmarks for all sizes
+
+    Parameters
+    ----------
+    names : list
+        Names of the benchmarks
+    sizes : list
+        Numbers of points
+    repeat : int
+        Number of timed runs per benchmark and size
+
+    Returns
+    -------
+    dict
+        Environment ('commit', 'python', 'numpy', 'machine', 'platform', 'date') and 'results'
+    """
+    results = []
+    print('{:<28}{:>10}{:>14}{:>16}'.format('benchmark', 'n_points', 'time', 'peak memory'),
+          file=sys.stderr)
+    for n_points in sizes:
+        for name in names:
+            result = run_benchmark(name, n_points, repeat)
+            print('{:<28}{:>10}{:>12.4f} s{:>12} MiB'.format(
+                name, n_points, result['seconds'], _format_mib(result['peak_bytes'])),
+                file=sys.stderr)
+            results.append(result)
+
+    return {'version': RESULTS_VERSION, 'commit': _commit(),
+            'python': platform.python_version(),
+            'numpy': coord_utils.np.__version__ if coord_utils.HAS_NUMPY else None,
+            'machine': platform.machine(), 'platform': platform.platform(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}
+
+
+def compare(old, new, threshold=0.1):
+    """
+    Compares two result documents of `run`
+
+    Parameters
+    ----------
+    old : dict
+        Baseline results
+    new : dict
+        Results to be compared with the baseline
+    threshold : float
+        Relative increase of time or peak memory that counts as a regression
+
+    Returns
+    -------
+    list
+        (name, n_points, time ratio, memory ratio, regressed) of every benchmark in both
+        documents. Ratios are new / old, None if not available in both.
+    """
+    baseline = dict(((r['name'], r['n_points']), r) for r in old['results'])
+    rows = []
+    for result in new['results']:
+        before = baseline.get((result['name'], result['n_points']))
+        if before is None:
+            continue
+        time_ratio = result['seconds'] / before['seconds'] if before['seconds'] else None
+        memory_ratio = None
+        if result['peak_bytes'] is not None and before['peak_bytes']:
+            memory_ratio = result['peak_bytes'] / before['peak_bytes']
+        regressed = any(ratio is not None and ratio > 1 + threshold
+                        for ratio in (time_ratio, memory_ratio))
+        rows.append((result['name'], result['n_points'], time_ratio, memory_ratio, regressed))
+
+    return rows
+
+
+def _commit():
+    """Hash of the checked-out commit, None outside of a git repository"""
+    try:
+        with open(os.devnull, 'w') as devnull:
+            output = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=devnull,
+                                             cwd=ROOT)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode('ascii').strip()
+
+
+def _format_mib(n_bytes):
+    return '-' if n_bytes is None else '{:.1f}'.format(n_bytes / 2 ** 20)
+
+
+def _format_ratio(ratio):
+    return '-' if ratio is None else '{:.2f}x'.format(ratio)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Numbers of points (default: {})'.format(
+                            ' '.join(str(size) for size in DEFAULT_SIZES)))
+    parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS),
+                        default=list(BENCHMARKS), metavar='NAME',
+                        help='Benchmarks to be run (default: all): {}'.format(
+                            ', '.join(BENCHMARKS)))
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed runs, the fastest is reported (default: 3)')
+    parser.add_argument('-o', '--output', default='-',
+                        help='Path to the JSON results (default: stdout)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='Compare two result files instead of running benchmarks. Exits with '
+                             'status 1 if any benchmark regressed.')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Relative increase of time or peak memory reported as regression by '
+                             '--compare (default: 0.1)')
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error('`--repeat` must be a positive integer.')
+
+    if args.compare:
+        documents = []
+        for file_path in args.compare:
+            with open(file_path) as source_file:
+                documents.append(json.load(source_file))
+        for key in ('python', 'numpy', 'machine'):
+            old, new = documents[0].get(key), documents[1].get(key)
+            if old != new:
+                print('Warning: the results were measured on different {} ({} vs. {})'.format(
+                    key, old, new), file=sys.stderr)
+        rows = compare(documents[0], documents[1], threshold=args.threshold)
+        print('{:<28}{:>10}{:>10}{:>10}'.format('benchmark', 'n_points', 'time', 'memory'))
+        for name, n_points, time_ratio, memory_ratio, regressed in rows:
+            print('{:<28}{:>10}{:>10}{:>10}{}'.format(name, n_points, _format_ratio(time_ratio),
+                                                      _format_ratio(memory_ratio),
+                                                      '  REGRESSION' if regressed else ''))
+        sys.exit(1 if any(row[-1] for row in rows) else 0)
+
+    document = json.dumps(run(args.benchmarks, args.sizes, repeat=args.repeat), indent=2)
+    if args.output == '-':
+        print(document)
+    else:
+        with open(args.output, 'w') as target_file:
+            target_file.write(document + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,6 @@
-from .edpoints import EquidistantPoints
\ No newline at end of file
+from .cache import LatticeCache
+from .coord_array import CoordinateArray
+from .edpoints import EquidistantPoints
+from .hierarchy import Hierarchy
+from .neighbors import NeighborGraph
+from .spatial_index import SpatialIndex
@@ -0,0 +1,285 @@
+"""Bulk assignment of coordinate datasets to their nearest generated points"""
+import csv
+import struct
+import sys
+from array import array
+from collections import deque
+from multiprocessing import Pool
+
+from . import coord_utils, lookup
+from .coord_array import extend_from_bytes
+from .storage import NonClosing
+
+INPUT_FORMATS = ('csv', 'binary')
+OUTPUT_FORMATS = ('csv', 'binary')
+DEFAULT_CHUNK_SIZE = 65536
+
+
+def assign_file(points, input_path, output_path, input_format='csv', output_format='csv',
+                lon_column=0, lat_column=1, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Assigns every coordinate of a file to the index of its nearest generated point.
+
+    The input is read in chunks of `chunk_size` coordinates, which are distributed across a pool
+    of `workers` processes. At most two chunks per worker are in flight at any time, so memory
+    usage is bounded by the chunk size regardless of the size of the input. The indices are
+    written in input order.
+
+    Parameters
+    ----------
+    points : EquidistantPoints
+        The generated points (only `n_points` and the radii are used)
+    input_path : str
+        Path to the input file. CSV files hold one coordinate per row, binary files hold
+        little-endian float64 [longitude, latitude] pairs.
+    output_path : str
+        Path to the output file, '-' for stdout. CSV files hold one index per row (with an
+        `index` header), binary files hold little-endian int64 indices.
+    input_format : str
+        Format of the input file ('csv' | 'binary')
+    output_format : str
+        Format of the output file ('csv' | 'binary')
+    lon_column : int or str
+        Index or header name of the CSV longitude column
+    lat_column : int or str
+        Index or header name of the CSV latitude column
+    workers : int
+        Number of worker processes (1 computes everything in the calling process)
+    chunk_size : int
+        Number of coordinates per chunk
+
+    Returns
+    -------
+    int
+        Number of assigned coordinates
+    """
+    if input_format not in INPUT_FORMATS:
+        raise ValueError('Argument `input_format` must be one of: `csv`, `binary`')
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError('Argument `output_format` must be one of: `csv`, `binary`')
+    if workers < 1 or chunk_size < 1:
+        raise ValueError('`workers` and `chunk_size` must be positive integers.')
+    if len(points) != points.n_points:
+        raise ValueError('Nearest-point lookups are only supported on the full lattice')
+
+    lattice = (points.n_points, points.equatorial_radius, points.polar_radius)
+    mode = 'rb' if input_format == 'binary' else 'r'
+    with open(input_path, mode) as source, _open_output(output_path, output_format) as target:
+        if input_format == 'binary':
+            chunks = read_binary_coordinates(source, chunk_size)
+        else:
+            chunks = read_csv_coordinates(source, chunk_size, lon_column, lat_column)
+        if output_format == 'csv':
+            target.write('index\n')
+
+        count = 0
+        for indices in _map_chunks(chunks, lattice, workers):
+            _write_indices(target, indices, output_format)
+            count += len(indices)
+
+    return count
+
+
+def read_csv_coordinates(source, chunk_size, lon_column=0, lat_column=1):
+    """
+    Reads [longitude, latitude] coordinates from a CSV file in chunks. A header row is detected
+    automatically and is required if the columns are given by name.
+
+    Parameters
+    ----------
+    source : file
+        CSV file opened in text mode
+    chunk_size : int
+        Number of coordinates per chunk
+    lon_column : int or str
+        Index or header name of the longitude column
+    lat_column : int or str
+        Index or header name of the latitude column
+
+    Yields
+    ------
+    tuple
+        (longitudes, latitudes) lists of floats
+    """
+    reader = csv.reader(source)
+    lons, lats = [], []
+    columns = None
+
+    for row in reader:
+        if not row:
+            continue
+        if columns is None:
+            columns, is_header = _resolve_columns(row, lon_column, lat_column)
+            if is_header:
+                continue
+        lons.append(float(row[columns[0]]))
+        lats.append(float(row[columns[1]]))
+        if len(lons) == chunk_size:
+            yield lons, lats
+            lons, lats = [], []
+
+    if lons:
+        yield lons, lats
+
+
+def read_binary_coordinates(source, chunk_size):
+    """
+    Reads little-endian float64 [longitude, latitude] pairs from a binary file in chunks
+
+    Parameters
+    ----------
+    source : file
+        Binary file opened in 'rb' mode
+    chunk_size : int
+        Number of coordinates per chunk
+
+    Yields
+    ------
+    tuple
+        (longitudes, latitudes) as NumPy arrays if NumPy is installed, otherwise `array('d')`
+    """
+    while True:
+        data = source.read(chunk_size * 16)
+        if not data:
+            return
+        if len(data) % 16:
+            raise ValueError('Binary input must consist of float64 [longitude, latitude] pairs')
+
+        if coord_utils.HAS_NUMPY:
+            values = coord_utils.np.frombuffer(data, dtype='<f8')
+        else:
+            values = array('d')
+            extend_from_bytes(values, data)
+            if sys.byteorder != 'little':
+                values.byteswap()
+        yield values[0::2], values[1::2]
+
+
+def _resolve_columns(row, lon_column, lat_column):
+    """
+    Resolves the longitude and latitude column indices from the first CSV row
+
+    Parameters
+    ----------
+    row : list
+        First row of the CSV file
+    lon_column : int or str
+        Index or header name of the longitude column
+    lat_column : int or str
+        Index or header name of the latitude column
+
+    Returns
+    -------
+    tuple
+        ((lon index, lat index), whether the row is a header)
+    """
+    is_header = isinstance(lon_column, str) or isinstance(lat_column, str)
+    if not is_header:
+        try:
+            float(row[lon_column])
+            float(row[lat_column])
+        except ValueError:
+            is_header = True
+
+    columns = []
+    for column in (lon_column, lat_column):
+        if isinstance(column, str):
+            if column not in row:
+                raise ValueError('Column `{}` not found in CSV header'.format(column))
+            column = row.index(column)
+        columns.append(column)
+
+    return tuple(columns), is_header
+
+
+def _map_chunks(chunks, lattice, workers):
+    """
+    Computes the nearest indices of all chunks, in order, keeping at most two chunks per worker
+    in flight
+
+    Parameters
+    ----------
+    chunks : iterable
+        (longitudes, latitudes) chunks
+    lattice : tuple
+        (n_points, equatorial_radius, polar_radius)
+    workers : int
+        Number of worker processes
+
+    Yields
+    ------
+    numpy.ndarray or list
+        Nearest indices of each chunk
+    """
+    if workers == 1:
+        for chunk in chunks:
+            yield _nearest_indices_chunk((chunk, lattice))
+        return
+
+    pool = Pool(workers)
+    try:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(_nearest_indices_chunk, ((chunk, lattice),)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+
+
+def _nearest_indices_chunk(args):
+    """
+    Worker function computing the nearest indices of one chunk
+
+    Parameters
+    ----------
+    args : tuple
+        ((longitudes, latitudes), (n_points, equatorial_radius, polar_radius))
+    """
+    (lons, lats), (n_points, equatorial_radius, polar_radius) = args
+    return lookup.nearest_indices(lons, lats, n_points, equatorial_radius=equatorial_radius,
+                                  polar_radius=polar_radius)
+
+
+def _open_output(output_path, output_format):
+    """
+    Opens the output file, or wraps stdout if `output_path` is '-'
+
+    Parameters
+    ----------
+    output_path : str
+        Path to the output file
+    output_format : str
+        Format of the output file ('csv' | 'binary')
+    """
+    mode = 'wb' if output_format == 'binary' else 'w'
+    if output_path == '-':
+        stream = getattr(sys.stdout, 'buffer', sys.stdout) if mode == 'wb' else sys.stdout
+        return NonClosing(stream)
+
+    return open(output_path, mode)
+
+
+def _write_indices(target, indices, output_format):
+    """
+    Writes a chunk of indices
+
+    Parameters
+    ----------
+    target : file
+        Output file
+    indices : numpy.ndarray or list
+        Indices to be written
+    output_format : str
+        Format of the output file ('csv' | 'binary')
+    """
+    if output_format == 'csv':
+        if hasattr(indices, 'tolist'):
+            indices = indices.tolist()
+        target.write(''.join('{}\n'.format(i) for i in indices))
+    elif coord_utils.HAS_NUMPY:
+        target.write(coord_utils.np.asarray(indices, dtype='<i8').tobytes())
+    else:
+        target.write(struct.pack('<{}q'.format(len(indices)), *indices))
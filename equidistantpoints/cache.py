@@ -0,0 +1,189 @@
+"""Persistent on-disk cache of computed lattices, stored in the memory-mappable binary format"""
+from __future__ import division
+import hashlib
+import os
+import tempfile
+
+from . import storage
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = '.edp'
+DEFAULT_MAX_BYTES = 2 ** 30
+
+_replace = getattr(os, 'replace', os.rename)
+
+
+class LatticeCache(object):
+    """Directory of binary coordinate files (see `EquidistantPoints.write_to_binary`), one per
+       lattice and coordinate type. Entries are keyed by n_points, the radii, the rotation axis,
+       the precision and the format versions, and are memory-mapped on access, so loading a
+       cached lattice costs about as much as opening a file.
+
+       The total size of the entries is kept below `max_bytes` by evicting the least recently
+       used ones. Entries are written to a temporary file first and renamed into place, so
+       several processes can share a directory."""
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Parameters
+        ----------
+        directory : str
+            Directory holding the cached files (created if it does not exist)
+        max_bytes : int
+            Maximum total size of the cached files in bytes (default: 1 GiB). None disables
+            eviction.
+        """
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError('`max_bytes` must not be negative')
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, points, coord_type):
+        """
+        Parameters
+        ----------
+        points : EquidistantPoints
+            The lattice
+        coord_type : str
+            The coordinate type ('geodetic' | 'cartesian' | 'ecef')
+
+        Returns
+        -------
+        str
+            Path of the cache entry of the lattice's coordinates of the given type
+        """
+        key = repr((CACHE_VERSION, storage.BINARY_VERSION, points.n_points,
+                    float(points.equatorial_radius), float(points.polar_radius),
+                    [[float(value) for value in row] for row in points.rotation_axis],
+                    points.dtype))
+        digest = hashlib.sha1(key.encode('ascii')).hexdigest()[:20]
+        file_name = '{}-{}-{}{}'.format(coord_type, points.n_points, digest, CACHE_SUFFIX)
+
+        return os.path.join(self.directory, file_name)
+
+    def get(self, points, coord_type):
+        """
+        Maps the cached coordinates of a lattice into memory and marks them as recently used
+
+        Parameters
+        ----------
+        points : EquidistantPoints
+            The lattice
+        coord_type : str
+            The coordinate type ('geodetic' | 'cartesian' | 'ecef')
+
+        Returns
+        -------
+        numpy.ndarray or CoordinateArray
+            Read-only coordinates of the full lattice, or None if they are not cached
+        """
+        file_path = self.path(points, coord_type)
+        try:
+            header = storage.read_header(file_path)
+        except (IOError, OSError, ValueError):
+            return None
+        expected = ('binary', coord_type, points.n_points, 0, points.n_points,
+                    float(points.equatorial_radius), float(points.polar_radius), points.dtype)
+        found = tuple(header.get(name) for name in ('format', 'coord_type', 'n_points', 'start',
+                                                    'count', 'equatorial_radius', 'polar_radius',
+                                                    'dtype'))
+        size = header['offset'] + (storage.ITEM_SIZES[header['dtype']] * header['count'] *
+                                   header['width'])
+        if found != expected or os.path.getsize(file_path) != size:
+            return None
+
+        try:
+            os.utime(file_path, None)
+        except OSError:
+            pass
+        return storage.load_coordinates(file_path, mmap=True)
+
+    def put(self, points, coord_type, coordinates):
+        """
+        Stores the coordinates of a full lattice and evicts least recently used entries if the
+        cache exceeds `max_bytes`. Coordinates that are larger than `max_bytes` on their own
+        are not stored.
+
+        Parameters
+        ----------
+        points : EquidistantPoints
+            The lattice
+        coord_type : str
+            The coordinate type ('geodetic' | 'cartesian' | 'ecef')
+        coordinates : numpy.ndarray or CoordinateArray
+            Coordinates of all `points.n_points` points
+        """
+        if len(coordinates) != points.n_points:
+            raise ValueError('Only coordinates of the full lattice can be cached')
+
+        header = storage.binary_header(coord_type, points.n_points, 0, points.n_points,
+                                       points.equatorial_radius, points.polar_radius,
+                                       dtype=points.dtype)
+        size = len(header) + (storage.ITEM_SIZES[points.dtype] * coordinates.shape[0] *
+                              coordinates.shape[1])
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        file_descriptor, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(file_descriptor, 'wb') as target_file:
+                target_file.write(header)
+                storage.write_chunks(target_file, [coordinates], dtype=points.dtype)
+            _replace(temp_path, self.path(points, coord_type))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        self.evict()
+
+    def entries(self):
+        """
+        Returns
+        -------
+        list
+            (path, size in bytes, time of last use) of all cached files, least recently used
+            first
+        """
+        entries = []
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith(CACHE_SUFFIX):
+                continue
+            file_path = os.path.join(self.directory, file_name)
+            try:
+                status = os.stat(file_path)
+            except OSError:
+                continue
+            entries.append((file_path, status.st_size, status.st_mtime))
+
+        return sorted(entries, key=lambda entry: entry[2])
+
+    @property
+    def size(self):
+        """Total size of the cached files in bytes"""
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Removes the least recently used files until the cache fits into `max_bytes`"""
+        if self.max_bytes is None:
+            return
+
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for file_path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(file_path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        """Removes all cached files"""
+        for file_path, _, _ in self.entries():
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
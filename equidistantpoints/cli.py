@@ -1,12 +1,19 @@
 """Command-line usage of the package"""
+import errno
+import os
+import sys
 from argparse import ArgumentParser
 
 from . import EquidistantPoints
+from .assign import assign_file, INPUT_FORMATS, OUTPUT_FORMATS, DEFAULT_CHUNK_SIZE
+from .instrumentation import Stats
+from .regions import check_bbox
+from .storage import FILE_FORMATS, GEOJSON_TYPES, TEXT_FORMATS
 
 
-def parse_args():
+def parse_args(argv=None):
     """Command-line arguments parsing"""
-    parser = ArgumentParser()
+    parser = ArgumentParser(prog='edpoints')
     parser.add_argument(
         'n_points',
         help='Number of points to be generated',
@@ -16,8 +23,9 @@ def parse_args():
 
     parser.add_argument(
         '-f', '--file-name',
-        help='Path to a file for the result to be stored.',
-        type=str
+        help='Path to a file for the result to be stored (default: stream to stdout).',
+        type=str,
+        default='-'
     )
 
     parser.add_argument(
@@ -30,12 +38,68 @@ def parse_args():
         type=float,
         help='Specify a custom polar radius (default: WGS-84 standard)',
         default=6356752.3)
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        help='Number of processes generating the points (default: 1)',
+        default=1)
+    parser.add_argument(
+        '--format',
+        choices=TEXT_FORMATS + ('geojson',) + FILE_FORMATS,
+        help='Format of the output: CSV, TSV, newline-delimited JSON objects, GeoJSON, '
+             'little-endian floats with a 64-byte header (memory-mappable, see '
+             '`EquidistantPoints.load`) or NumPy .npy (default: csv)',
+        default='csv')
+    parser.add_argument(
+        '--dtype',
+        choices=('float64', 'float32'),
+        help='Precision of the written coordinates, computed in float64 either way. float32 '
+             'halves the size of binary output and moves points by less than 1 m (see '
+             '`coord_utils.FLOAT32_MAX_ERROR`) (default: float64)',
+        default='float64')
+    parser.add_argument(
+        '--precision',
+        type=int,
+        help='Number of decimal places of text output (default: full precision)')
+    parser.add_argument(
+        '--index',
+        action='store_true',
+        help='Indicates that CSV/TSV rows and JSON objects should start with the index of the '
+             'point')
+    parser.add_argument(
+        '--no-header',
+        action='store_true',
+        help='Indicates that no header row should be written to CSV/TSV output')
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Print the time, number of points and bytes of every stage (generation, '
+             'conversion, output) to stderr')
+
+    region_group = parser.add_mutually_exclusive_group()
+    region_group.add_argument(
+        '--lat-band',
+        nargs=2,
+        type=float,
+        metavar=('LAT_MIN', 'LAT_MAX'),
+        help='Only output the points within a latitude band, computing nothing else')
+    region_group.add_argument(
+        '--bbox',
+        nargs=4,
+        type=float,
+        metavar=('LON_MIN', 'LAT_MIN', 'LON_MAX', 'LAT_MAX'),
+        help='Only output the points within a bounding box (LON_MIN > LON_MAX crosses the '
+             'antimeridian), computing only those of its latitude band')
 
     type_group = parser.add_mutually_exclusive_group()
     type_group.add_argument(
         '-g', '--geojson',
-        action='store_true',
-        help='Indicates that the output should be stored in GeoJSON format (default: CSV)')
+        nargs='?',
+        const='multipoint',
+        choices=GEOJSON_TYPES,
+        help='Indicates that the output should be stored in GeoJSON format (default: CSV): one '
+             'MultiPoint geometry, a FeatureCollection of Point features carrying their index, '
+             'or newline-delimited features (GeoJSONSeq) (default: multipoint)')
     type_group.add_argument(
         '-c', '--cartesian',
         action='store_true',
@@ -49,30 +113,260 @@ def parse_args():
              '(default: geodetic)',
     )
 
-    args = parser.parse_args().__dict__
+    args = parser.parse_args(argv).__dict__
+
+    if args['geojson']:
+        args['format'] = 'geojson'
+    if args['format'] == 'geojson' and (args['cartesian'] or args['ecef']):
+        parser.error('Only geodetic coordinates can be stored as GeoJSON.')
+    if args['precision'] is not None and args['precision'] < 0:
+        parser.error('`--precision` must not be negative.')
+    if args['workers'] < 1:
+        parser.error('`--workers` must be a positive integer.')
+    if args['lat_band']:
+        args['bbox'] = [-180, args['lat_band'][0], 180, args['lat_band'][1]]
+    if args['bbox']:
+        try:
+            check_bbox(args['bbox'])
+        except ValueError as e:
+            parser.error(str(e))
+        if args['format'] == 'binary' and (args['bbox'][0], args['bbox'][2]) != (-180, 180):
+            parser.error('Binary output holds a contiguous index range, use `--format npy` or '
+                         '`--lat-band`.')
+
+    return args
+
+
+def parse_assign_args(argv=None):
+    """Command-line arguments parsing of the `assign` subcommand"""
+    parser = ArgumentParser(
+        prog='edpoints assign',
+        description='Assigns every coordinate of a file to the index of its nearest point')
+    parser.add_argument(
+        'n_points',
+        help='Number of generated points',
+        metavar='N',
+        type=int
+    )
+    parser.add_argument(
+        'input_file',
+        help='Path to the input file holding longitude/latitude coordinates',
+        type=str
+    )
+    parser.add_argument(
+        '-o', '--output-file',
+        help='Path to a file for the indices to be stored (default: stdout)',
+        type=str,
+        default='-'
+    )
+
+    parser.add_argument(
+        '-r', '--equatorial-radius',
+        type=float,
+        help='Specify a custom equatorial radius (default: WGS-84 standard)',
+        default=6378137.0)
+    parser.add_argument(
+        '-p', '--polar-radius',
+        type=float,
+        help='Specify a custom polar radius (default: WGS-84 standard)',
+        default=6356752.3)
+
+    parser.add_argument(
+        '--input-format',
+        choices=INPUT_FORMATS,
+        help='Format of the input file: CSV, or little-endian float64 longitude/latitude pairs '
+             '(default: csv)',
+        default='csv')
+    parser.add_argument(
+        '--output-format',
+        choices=OUTPUT_FORMATS,
+        help='Format of the output file: CSV, or little-endian int64 indices (default: csv)',
+        default='csv')
+    parser.add_argument(
+        '--lon-column',
+        help='Index or header name of the CSV longitude column (default: 0)',
+        default='0')
+    parser.add_argument(
+        '--lat-column',
+        help='Index or header name of the CSV latitude column (default: 1)',
+        default='1')
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        help='Number of worker processes (default: 1)',
+        default=1)
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        help='Number of coordinates read and processed at once (default: {})'.format(
+            DEFAULT_CHUNK_SIZE),
+        default=DEFAULT_CHUNK_SIZE)
+
+    args = parser.parse_args(argv).__dict__
+
+    for column in ('lon_column', 'lat_column'):
+        if args[column].isdigit():
+            args[column] = int(args[column])
+    if args['workers'] < 1 or args['chunk_size'] < 1:
+        parser.error('`--workers` and `--chunk-size` must be positive integers.')
+
+    return args
+
+
+def parse_serve_args(argv=None):
+    """Command-line arguments parsing of the `serve` subcommand"""
+    parser = ArgumentParser(
+        prog='edpoints serve',
+        description='Serves batched nearest-point and k-nearest-neighbor lookups over local HTTP '
+                    '(see `service.LookupService`)')
+    parser.add_argument(
+        'n_points',
+        help='Number of generated points (not needed with `--load`)',
+        metavar='N',
+        type=int,
+        nargs='?'
+    )
+    parser.add_argument(
+        '--load',
+        help='Path to a binary file of the full lattice (see `--format binary`) to be '
+             'memory-mapped instead of computing the points',
+        type=str)
+
+    parser.add_argument(
+        '-r', '--equatorial-radius',
+        type=float,
+        help='Specify a custom equatorial radius (default: WGS-84 standard)')
+    parser.add_argument(
+        '-p', '--polar-radius',
+        type=float,
+        help='Specify a custom polar radius (default: WGS-84 standard)')
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        help='Number of processes generating the points (default: 1)')
+    parser.add_argument(
+        '--dtype',
+        choices=('float64', 'float32'),
+        help='Precision of the coordinates held by the spatial index (default: float64)')
 
-    if args['geojson'] and not args['file_name']:
-        parser.error('If `-g`/`--geojson` is given, `-f`/`--file-name` must also be specified.')
+    parser.add_argument(
+        '--host',
+        help='Host to listen on (default: 127.0.0.1)',
+        default='127.0.0.1')
+    parser.add_argument(
+        '--port',
+        type=int,
+        help='TCP port to listen on (default: 8000)',
+        default=8000)
+    parser.add_argument(
+        '--unix-socket',
+        help='Path of a Unix socket to listen on instead of a TCP port',
+        metavar='PATH')
+
+    args = parser.parse_args(argv).__dict__
+
+    if (args['n_points'] is None) == (args['load'] is None):
+        parser.error('Either N or `--load` must be given.')
+    # A loaded file determines its lattice, radii and precision
+    generation_options = ('equatorial_radius', 'polar_radius', 'workers', 'dtype')
+    if args['load'] is not None and any(args[name] is not None for name in generation_options):
+        parser.error('`--load` cannot be combined with `-r`, `-p`, `-w` or `--dtype`.')
+    for name, default in zip(generation_options, (6378137.0, 6356752.3, 1, 'float64')):
+        if args[name] is None:
+            args[name] = default
+    if args['workers'] < 1:
+        parser.error('`--workers` must be a positive integer.')
 
     return args
 
 
-def cli_generate_points():
-    """Command-line entry function"""
-    args = parse_args()
+def main(argv=None):
+    """Command-line entry function, dispatching to the subcommands"""
+    argv = sys.argv[1:] if argv is None else argv
+
+    if argv and argv[0] == 'assign':
+        cli_assign(argv[1:])
+    elif argv and argv[0] == 'serve':
+        cli_serve(argv[1:])
+    else:
+        cli_generate_points(argv)
+
+
+def cli_assign(argv=None):
+    """Command-line function of the `assign` subcommand"""
+    args = parse_assign_args(argv)
     ed_points = EquidistantPoints(n_points=args['n_points'],
                                   equatorial_radius=args['equatorial_radius'],
                                   polar_radius=args['polar_radius'])
 
-    if args['file_name']:
-        if args['geojson']:
-            ed_points.write_geodetic_to_geojson(file_path=args['file_name'])
-        elif args['cartesian']:
-            ed_points.write_cartesian_to_csv(file_path=args['file_name'])
-        elif args['ecef']:
-            ed_points.write_ecef_to_csv(file_path=args['file_name'])
-        else:
-            ed_points.write_geodetic_to_csv(file_path=args['file_name'])
+    assign_file(ed_points, args['input_file'], args['output_file'],
+                input_format=args['input_format'], output_format=args['output_format'],
+                lon_column=args['lon_column'], lat_column=args['lat_column'],
+                workers=args['workers'], chunk_size=args['chunk_size'])
+
+
+def cli_serve(argv=None):
+    """Command-line function of the `serve` subcommand, serving until interrupted"""
+    from . import service
+
+    args = parse_serve_args(argv)
+    if service.asyncio is None:
+        sys.exit('edpoints serve: error: the lookup service requires Python 3.4+ (asyncio)')
+    if args['load']:
+        ed_points = EquidistantPoints.load(args['load'])
     else:
-        print(ed_points.cartesian if args['cartesian'] else ed_points.ecef
-              if args['ecef'] else ed_points.geodetic)
+        ed_points = EquidistantPoints(n_points=args['n_points'],
+                                      equatorial_radius=args['equatorial_radius'],
+                                      polar_radius=args['polar_radius'],
+                                      workers=args['workers'], dtype=args['dtype'])
+
+    lookup_service = service.LookupService(ed_points)
+    lookup_service.start(host=args['host'], port=args['port'], path=args['unix_socket'])
+    sys.stderr.write('Serving {} points on {}\n'.format(
+        ed_points.n_points, args['unix_socket'] or 'http://{}:{}'.format(*lookup_service.address)))
+    try:
+        lookup_service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        lookup_service.close()
+
+
+def cli_generate_points(argv=None):
+    """Command-line function generating points, streamed chunk by chunk to a file or stdout"""
+    args = parse_args(argv)
+    ed_points = EquidistantPoints(n_points=args['n_points'],
+                                  equatorial_radius=args['equatorial_radius'],
+                                  polar_radius=args['polar_radius'],
+                                  workers=args['workers'],
+                                  stats=Stats() if args['profile'] else None,
+                                  dtype=args['dtype'])
+    if args['bbox']:
+        ed_points = ed_points.region(args['bbox'])
+
+    file_path, file_format = args['file_name'], args['format']
+    coord_type = 'cartesian' if args['cartesian'] else 'ecef' if args['ecef'] else 'geodetic'
+
+    try:
+        if file_format == 'geojson':
+            ed_points.write_geodetic_to_geojson(file_path, geojson_type=args['geojson'] or
+                                                'multipoint', precision=args['precision'])
+        elif file_format == 'binary':
+            ed_points.write_to_binary(file_path, coord_type=coord_type)
+        elif file_format == 'npy':
+            ed_points.write_to_npy(file_path, coord_type=coord_type)
+        elif file_format == 'ndjson':
+            ed_points.write_to_ndjson(file_path, coord_type=coord_type,
+                                      precision=args['precision'], index=args['index'])
+        else:
+            write_to_csv = getattr(ed_points, 'write_{}_to_csv'.format(coord_type))
+            write_to_csv(file_path, header=not args['no_header'], precision=args['precision'],
+                         index=args['index'], delimiter='\t' if file_format == 'tsv' else ',')
+    except IOError as e:
+        if e.errno != errno.EPIPE:
+            raise
+        # The reading end of the pipe was closed (e.g. by `head`): stop quietly
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+    if ed_points.stats is not None:
+        sys.stderr.write(ed_points.stats.summary() + '\n')
@@ -0,0 +1,140 @@
+"""Compact coordinate storage used when NumPy is not available"""
+from array import array
+
+try:
+    INT64_TYPECODE = array('q').typecode
+except ValueError:  # Python 2, whose long is 64 bits wide on 64-bit Unix platforms
+    INT64_TYPECODE = 'l'
+
+
+class CoordinateArray(object):
+    """Rows of fixed-width float coordinates stored in one contiguous `array.array` buffer.
+
+       Mirrors the parts of the NumPy array interface used by this package (`len`, row indexing,
+       slicing, iteration, `shape`, `nbytes` and `tolist`). The underlying buffer is exposed as
+       `data` and supports the buffer protocol for zero-copy handoff (the old buffer interface on
+       Python 2, e.g. `buffer(coordinates.data)`). It may also be a read-only memoryview, e.g. of
+       a memory-mapped file."""
+    def __init__(self, width, data=None):
+        """
+        Parameters
+        ----------
+        width : int
+            Number of components per coordinate (3 for [x, y, z], 2 for [longitude, latitude])
+        data : array.array or memoryview
+            Flat buffer holding the coordinates row by row (default: empty float64 buffer)
+        """
+        if data is None:
+            data = array('d')
+        if len(data) % width:
+            raise ValueError('Length of `data` must be a multiple of `width`')
+
+        self.width = width
+        self.data = data
+
+    @classmethod
+    def from_rows(cls, rows, width, typecode='d'):
+        """
+        Packs an iterable of coordinates into a new CoordinateArray
+
+        Parameters
+        ----------
+        rows : iterable
+            Coordinates, each a sequence of `width` numbers
+        width : int
+            Number of components per coordinate
+        typecode : str
+            `array.array` type code of the buffer (default: 'd', float64)
+
+        Returns
+        -------
+        CoordinateArray
+        """
+        coordinates = cls(width, array(typecode))
+        coordinates.extend(rows)
+
+        return coordinates
+
+    def extend(self, rows):
+        """
+        Appends coordinates to the buffer
+
+        Parameters
+        ----------
+        rows : iterable
+            Coordinates, each a sequence of `width` numbers
+        """
+        for row in rows:
+            if len(row) != self.width:
+                raise IndexError('Coordinates must have {} components'.format(self.width))
+            self.data.extend(row)
+
+    @property
+    def shape(self):
+        """Tuple of (number of coordinates, components per coordinate)"""
+        return len(self), self.width
+
+    @property
+    def typecode(self):
+        """Type code of the buffer's items"""
+        return getattr(self.data, 'typecode', None) or self.data.format
+
+    @property
+    def nbytes(self):
+        """Size of the buffer in bytes"""
+        return len(self.data) * self.data.itemsize
+
+    def tolist(self):
+        """
+        Returns
+        -------
+        list
+            The coordinates as a list of lists
+        """
+        return [self[i] for i in range(len(self))]
+
+    def __len__(self):
+        return len(self.data) // self.width
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return CoordinateArray(self.width,
+                                       self.data[start * self.width:stop * self.width])
+            sliced = CoordinateArray(self.width, array(self.typecode))
+            sliced.extend(self[i] for i in range(start, stop, step))
+            return sliced
+
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError('Coordinate index out of range')
+
+        return self.data[index * self.width:(index + 1) * self.width].tolist()
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    if hasattr(memoryview, 'cast'):  # Python 3.3+
+        def __buffer__(self, flags):
+            """Buffer protocol support (Python 3.12+), shaped (n, width)"""
+            return memoryview(self.data).cast('B').cast(self.typecode, self.shape)
+
+    def __repr__(self):
+        return 'CoordinateArray({!r})'.format(self.tolist())
+
+
+def to_bytes(values):
+    """Raw bytes of an `array.array` (`tostring` on Python 2)"""
+    return values.tobytes() if hasattr(values, 'tobytes') else values.tostring()
+
+
+def extend_from_bytes(values, data):
+    """Appends the items held by raw bytes to an `array.array` (`fromstring` on Python 2)"""
+    if hasattr(values, 'frombytes'):
+        values.frombytes(data)
+    else:
+        values.fromstring(bytes(data))
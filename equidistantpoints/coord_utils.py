@@ -1,9 +1,26 @@
 """Various math helper functions"""
 from __future__ import division
-from math import sqrt, atan2, degrees, pi, cos, sin
+from math import sqrt, atan2, degrees, radians, pi, cos, sin
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, fall back to pure Python
+    np = None
 
-def generate_points(n_points):
+HAS_NUMPY = np is not None
+
+COORD_TYPES = ('cartesian', 'ecef', 'geodetic')
+COORD_WIDTHS = {'cartesian': 3, 'ecef': 3, 'geodetic': 2}
+ROTATION_AXIS = [[0, 0, 1], [0, 1, 0], [-1, 0, 0]]  # Taken from Gade (2010)
+DEFAULT_CHUNK_SIZE = 65536
+DTYPES = {'float64': 'd', 'float32': 'f'}  # Storage precision and its `array.array` type code
+# Largest distance in meters on the WGS-84 ellipsoid between a point and its coordinates rounded
+# to float32: at most half a unit in the last place (2**-25 for unit vectors, 2**-17 degrees of
+# longitude and 2**-18 degrees of latitude), times the largest radius of curvature
+FLOAT32_MAX_ERROR = {'cartesian': 0.34, 'ecef': 0.34, 'geodetic': 0.95}
+
+
+def generate_points(n_points, start=0, stop=None):
     """
     Generates a list of equidistant points on a perfect sphere in cartesian format
 
@@ -11,10 +28,16 @@ def generate_points(n_points):
     ----------
     n_points : int
         Number of points to generate
+    start : int
+        Index of the first point to be returned (default: 0)
+    stop : int
+        Index after the last point to be returned (default: `n_points`)
     """
+    start, stop = _check_index_range(n_points, start, stop)
     golden_angle = pi * (3 - sqrt(5))
-    theta = [golden_angle * i for i in range(0, n_points)]
-    z_vals = linspace(1 - 1.0 / n_points, 1.0 / n_points - 1, n_points)
+    z_first, z_step = _spiral_z_params(n_points)
+    theta = [golden_angle * i for i in range(start, stop)]
+    z_vals = [z_first + z_step * i for i in range(start, stop)]
     radius = [sqrt(1 - i * i) for i in z_vals]
     x_vals = [r * cos(t) for r, t in zip(radius, theta)]
     y_vals = [r * sin(t) for r, t in zip(radius, theta)]
@@ -23,6 +46,26 @@ def generate_points(n_points):
     return cartesian
 
 
+def points_at(n_points, indices):
+    """
+    Computes the cartesian coordinates of arbitrary point indices of the spiral generated by
+    `generate_points`, without generating any other point
+
+    Parameters
+    ----------
+    n_points : int
+        Number of points on the sphere
+    indices : iterable
+        Point indices within [0, n_points)
+
+    Returns
+    -------
+    list
+        List of cartesian [x, y, z] coordinates
+    """
+    return [generate_points(n_points, i, i + 1)[0] for i in indices]
+
+
 def cartesian_to_ecef(coordinates, equatorial_radius, polar_radius, rotation_axis):
     """
     Projects cartesian coordinates onto earth's ellipsoid. Results in ECEF coordinates
@@ -48,10 +91,15 @@ def cartesian_to_ecef(coordinates, equatorial_radius, polar_radius, rotation_axi
     list
         List of ECEF [x, y, z] coordinates
     """
+    return _cartesian_to_ecef(coordinates, equatorial_radius,
+                              eccentricity_squared(equatorial_radius, polar_radius), rotation_axis)
+
+
+def _cartesian_to_ecef(coordinates, equatorial_radius, e_squared, rotation_axis):
+    """`cartesian_to_ecef` with the squared eccentricity of the ellipsoid computed already"""
     ecef_coordinates = []
 
-    flattened = (equatorial_radius - polar_radius) / equatorial_radius
-    e_squared = flattened * 2 - flattened ** 2
+    ra_rev = [[row[i] for row in rotation_axis] for i in range(len(rotation_axis[0]))]
     for coord in coordinates:
         coord = [equatorial_radius * c for c in coord]
         coord = xyz_dot_matrix(coord, rotation_axis)
@@ -72,7 +120,6 @@ def cartesian_to_ecef(coordinates, equatorial_radius, polar_radius, rotation_axi
         xyz = [pre * coord[0],
                pre * k / (k + e_squared) * coord[1],
                pre * k / (k + e_squared) * coord[2]]
-        ra_rev = [[row[i] for row in rotation_axis] for i in range(len(rotation_axis[0]))]
         pt_dot = xyz_dot_matrix(xyz, ra_rev)
         pt_norm = sqrt(sum([a ** 2 for a in xyz]))
         unit_point = [p / pt_norm for p in pt_dot]
@@ -81,6 +128,25 @@ def cartesian_to_ecef(coordinates, equatorial_radius, polar_radius, rotation_axi
     return ecef_coordinates
 
 
+def eccentricity_squared(equatorial_radius, polar_radius):
+    """
+    Parameters
+    ----------
+    equatorial_radius : float
+        Earth's radius on the equator in meters
+    polar_radius : float
+        Earth's polar radius in meters
+
+    Returns
+    -------
+    float
+        Squared (first) eccentricity of the ellipsoid, 2f - f^2 with flattening f
+    """
+    flattened = (equatorial_radius - polar_radius) / equatorial_radius
+
+    return flattened * 2 - flattened ** 2
+
+
 def ecef_to_geodetic(coordinates, rotation_axis):
     """
     Converts ECEF [x, y, z] coordinates to geodetic [longitude, latitude] coordinates.
@@ -113,6 +179,293 @@ def ecef_to_geodetic(coordinates, rotation_axis):
     return geodetic_coordinates
 
 
+def geodetic_to_ecef(coordinates, rotation_axis):
+    """
+    Converts geodetic [longitude, latitude] coordinates to ECEF [x, y, z] coordinates (the unit
+    normals of the ellipsoid, as returned by `cartesian_to_ecef`). Inverse of `ecef_to_geodetic`.
+
+    Based on equation 3 in
+        Gade (2010) A Non-Singular Horizontal Position Representation
+
+    Parameters
+    ----------
+    coordinates : list
+        List of geodetic [longitude, latitude] coordinates
+    rotation_axis : list
+        Rotation axis in format [[?, ?, ?], [?, ?, ?], [?, ?, ?]]
+        see Gade (2010) for a detailed explanation
+
+    Returns
+    -------
+    list
+        List of ECEF [x, y, z] coordinates
+    """
+    ecef_coordinates = []
+
+    ra_rev = [[row[i] for row in rotation_axis] for i in range(len(rotation_axis[0]))]
+    for lon, lat in coordinates:
+        lon_rad, lat_rad = radians(lon), radians(lat)
+        cos_lat = cos(lat_rad)
+        coord_dot = [sin(lat_rad), cos_lat * sin(lon_rad), -cos_lat * cos(lon_rad)]
+        ecef_coordinates.append(xyz_dot_matrix(coord_dot, ra_rev))
+
+    return ecef_coordinates
+
+
+def ecef_to_cartesian(coordinates, equatorial_radius, polar_radius, rotation_axis):
+    """
+    Maps ECEF [x, y, z] coordinates (unit normals of the ellipsoid) back onto the unit sphere.
+    Inverse of `cartesian_to_ecef`: the point on the ellipsoid with the given normal (equation 22
+    in Gade (2010)) is moved along the normal onto the sphere with the equatorial radius, and
+    scaled to the unit sphere.
+
+    Parameters
+    ----------
+    coordinates : list
+        List of ECEF [x, y, z] coordinates
+    equatorial_radius : float
+        Earth's radius on the equator in meters
+    polar_radius : float
+        Earth's polar radius in meters
+    rotation_axis : list
+        Rotation axis in format [[?, ?, ?], [?, ?, ?], [?, ?, ?]]
+        see Gade (2010) for a detailed explanation
+
+    Returns
+    -------
+    list
+        List of cartesian [x, y, z] coordinates
+    """
+    cartesian_coordinates = []
+
+    e_squared = eccentricity_squared(equatorial_radius, polar_radius)
+    ra_rev = [[row[i] for row in rotation_axis] for i in range(len(rotation_axis[0]))]
+    for coord in coordinates:
+        normal = xyz_dot_matrix(coord, rotation_axis)
+        normal_radius = equatorial_radius / sqrt(1 - e_squared * normal[0] ** 2)
+        surface = [normal_radius * (1 - e_squared) * normal[0], normal_radius * normal[1],
+                   normal_radius * normal[2]]
+
+        # Height h along the normal at which the point lies on the sphere: |surface + h n| = a
+        p = sum(a * b for a, b in zip(surface, normal))
+        q = sum(a ** 2 for a in surface) - equatorial_radius ** 2
+        h = -q / (p + sqrt(p ** 2 - q))
+
+        point = [(a + h * b) / equatorial_radius for a, b in zip(surface, normal)]
+        cartesian_coordinates.append(xyz_dot_matrix(point, ra_rev))
+
+    return cartesian_coordinates
+
+
+def iter_points(n_points, chunk_size=DEFAULT_CHUNK_SIZE, coord_type='cartesian',
+                equatorial_radius=6378137.0, polar_radius=6356752.3, rotation_axis=ROTATION_AXIS,
+                start=0, stop=None):
+    """
+    Lazily generates equidistant points in chunks of at most `chunk_size` coordinates, so that
+    memory usage is bounded by the chunk size rather than by `n_points`. Point i only depends on
+    i and `n_points`, so the chunks are identical to the corresponding slices of
+    `generate_points` (and its conversions).
+
+    Parameters
+    ----------
+    n_points : int
+        Number of points on the sphere
+    chunk_size : int
+        Maximum number of coordinates per chunk
+    coord_type : str
+        The coordinate type to be generated ('geodetic' | 'cartesian' | 'ecef')
+    equatorial_radius : float
+        Earth's radius on the equator in meters (default taken from WGS-84 system)
+    polar_radius : float
+        Earth's polar radius in meters (default taken from WGS-84 system)
+    rotation_axis : list
+        Rotation axis in format [[?, ?, ?], [?, ?, ?], [?, ?, ?]]
+        see Gade (2010) for a detailed explanation
+    start : int
+        Index of the first point to be generated (default: 0)
+    stop : int
+        Index after the last point to be generated (default: `n_points`)
+
+    Yields
+    ------
+    numpy.ndarray or list
+        Coordinates of the chunk (NumPy array if NumPy is installed, otherwise list)
+    """
+    check_coord_type(coord_type)
+    if chunk_size < 1:
+        raise ValueError('`chunk_size` must be a positive integer.')
+    start, stop = _check_index_range(n_points, start, stop)
+
+    for chunk_start in range(start, stop, chunk_size):
+        chunk_stop = min(chunk_start + chunk_size, stop)
+        if HAS_NUMPY:
+            cartesian = generate_points_array(n_points, chunk_start, chunk_stop)
+        else:
+            cartesian = generate_points(n_points, chunk_start, chunk_stop)
+
+        yield convert_points(cartesian, 'cartesian', coord_type, equatorial_radius,
+                             polar_radius, rotation_axis)
+
+
+def iter_ellipsoid_points(n_points, radii, coord_types=('ecef', 'geodetic'),
+                          chunk_size=DEFAULT_CHUNK_SIZE, rotation_axis=ROTATION_AXIS, start=0,
+                          stop=None):
+    """
+    Counterpart of `iter_points` for several ellipsoids at once. The cartesian points do not
+    depend on the radii, so each chunk of them is generated once and projected onto every
+    ellipsoid, whose constants are also computed only once. The chunks are identical to those of
+    `iter_points` with the respective radii.
+
+    Parameters
+    ----------
+    n_points : int
+        Number of points on the sphere
+    radii : list
+        (equatorial_radius, polar_radius) pairs in meters, one per ellipsoid
+    coord_types : tuple
+        The coordinate types to be generated ('geodetic' | 'cartesian' | 'ecef')
+    chunk_size : int
+        Maximum number of coordinates per chunk
+    rotation_axis : list
+        Rotation axis in format [[?, ?, ?], [?, ?, ?], [?, ?, ?]]
+        see Gade (2010) for a detailed explanation
+    start : int
+        Index of the first point to be generated (default: 0)
+    stop : int
+        Index after the last point to be generated (default: `n_points`)
+
+    Yields
+    ------
+    list
+        One dict per ellipsoid, mapping each coordinate type to the coordinates of the chunk
+        (NumPy arrays if NumPy is installed, otherwise lists). Cartesian chunks are shared.
+    """
+    for coord_type in coord_types:
+        check_coord_type(coord_type)
+    if chunk_size < 1:
+        raise ValueError('`chunk_size` must be a positive integer.')
+    start, stop = _check_index_range(n_points, start, stop)
+    ellipsoids = [(equatorial_radius, eccentricity_squared(equatorial_radius, polar_radius))
+                  for equatorial_radius, polar_radius in radii]
+    projected = 'ecef' in coord_types or 'geodetic' in coord_types
+
+    for chunk_start in range(start, stop, chunk_size):
+        chunk_stop = min(chunk_start + chunk_size, stop)
+        if HAS_NUMPY:
+            cartesian = generate_points_array(n_points, chunk_start, chunk_stop)
+        else:
+            cartesian = generate_points(n_points, chunk_start, chunk_stop)
+
+        results = []
+        for equatorial_radius, e_squared in ellipsoids:
+            chunks = {}
+            if 'cartesian' in coord_types:
+                chunks['cartesian'] = cartesian
+            if projected:
+                if HAS_NUMPY:
+                    ecef = _cartesian_to_ecef_array(cartesian, equatorial_radius, e_squared,
+                                                    rotation_axis)
+                else:
+                    ecef = _cartesian_to_ecef(cartesian, equatorial_radius, e_squared,
+                                              rotation_axis)
+                if 'ecef' in coord_types:
+                    chunks['ecef'] = ecef
+                if 'geodetic' in coord_types:
+                    chunks['geodetic'] = convert_points(ecef, 'ecef', 'geodetic', None, None,
+                                                        rotation_axis)
+            results.append(chunks)
+        yield results
+
+
+def convert_points(coordinates, source_type, target_type, equatorial_radius, polar_radius,
+                   rotation_axis):
+    """
+    Converts coordinates along cartesian -> ECEF -> geodetic or back, using the NumPy functions
+    if NumPy is installed
+
+    Parameters
+    ----------
+    coordinates : list or numpy.ndarray
+        Coordinates of type `source_type`
+    source_type : str
+        The coordinate type of `coordinates` ('geodetic' | 'cartesian' | 'ecef')
+    target_type : str
+        The coordinate type to be converted to ('geodetic' | 'cartesian' | 'ecef')
+    equatorial_radius : float
+        Earth's radius on the equator in meters
+    polar_radius : float
+        Earth's polar radius in meters
+    rotation_axis : list
+        Rotation axis in format [[?, ?, ?], [?, ?, ?], [?, ?, ?]]
+        see Gade (2010) for a detailed explanation
+
+    Returns
+    -------
+    list or numpy.ndarray
+        Coordinates of type `target_type`
+    """
+    check_coord_type(source_type)
+    check_coord_type(target_type)
+
+    if COORD_TYPES.index(target_type) < COORD_TYPES.index(source_type):
+        if source_type == 'geodetic':
+            if HAS_NUMPY:
+                coordinates = geodetic_to_ecef_array(coordinates, rotation_axis)
+            else:
+                coordinates = geodetic_to_ecef(coordinates, rotation_axis)
+            source_type = 'ecef'
+        if source_type == 'ecef' and target_type == 'cartesian':
+            if HAS_NUMPY:
+                coordinates = ecef_to_cartesian_array(coordinates, equatorial_radius,
+                                                      polar_radius, rotation_axis)
+            else:
+                coordinates = ecef_to_cartesian(coordinates, equatorial_radius, polar_radius,
+                                                rotation_axis)
+        return coordinates
+
+    if source_type == 'cartesian' and target_type != 'cartesian':
+        if HAS_NUMPY:
+            coordinates = cartesian_to_ecef_array(coordinates, equatorial_radius, polar_radius,
+                                                  rotation_axis)
+        else:
+            coordinates = cartesian_to_ecef(coordinates, equatorial_radius, polar_radius,
+                                            rotation_axis)
+        source_type = 'ecef'
+    if source_type == 'ecef' and target_type == 'geodetic':
+        if HAS_NUMPY:
+            coordinates = ecef_to_geodetic_array(coordinates, rotation_axis)
+        else:
+            coordinates = ecef_to_geodetic(coordinates, rotation_axis)
+
+    return coordinates
+
+
+def check_coord_type(coord_type):
+    """
+    Raises a ValueError if `coord_type` is not a supported coordinate type
+
+    Parameters
+    ----------
+    coord_type : str
+        The coordinate type to be checked ('geodetic' | 'cartesian' | 'ecef')
+    """
+    if coord_type not in COORD_TYPES:
+        raise ValueError('Argument `coord_type` must be one of: `geodetic`, `cartesian, `ecef`')
+
+
+def check_dtype(dtype):
+    """
+    Raises a ValueError if `dtype` is not a supported storage precision
+
+    Parameters
+    ----------
+    dtype : str
+        The precision to be checked ('float64' | 'float32')
+    """
+    if dtype not in DTYPES:
+        raise ValueError('Argument `dtype` must be one of: `float64`, `float32`')
+
+
 def linspace(start, stop, n):
     """
     Generates evenly spaced values over an interval
@@ -173,3 +526,325 @@ def xyz_dot_matrix(coordinate, rotation_axis):
 
     return result
 
+
+def generate_points_array(n_points, start=0, stop=None):
+    """
+    NumPy counterpart of `generate_points`. Computes the golden-angle spiral as whole-array
+    operations.
+
+    Parameters
+    ----------
+    n_points : int
+        Number of points to generate
+    start : int
+        Index of the first point to be returned (default: 0)
+    stop : int
+        Index after the last point to be returned (default: `n_points`)
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (stop - start, 3) holding cartesian [x, y, z] coordinates
+    """
+    _require_numpy()
+    start, stop = _check_index_range(n_points, start, stop)
+
+    return points_at_array(n_points, np.arange(start, stop))
+
+
+def points_at_array(n_points, indices):
+    """
+    NumPy counterpart of `points_at`. Computes the cartesian coordinates of arbitrary point
+    indices of the golden-angle spiral used by `generate_points`, without generating any other
+    point.
+
+    Parameters
+    ----------
+    n_points : int
+        Number of points on the sphere
+    indices : array_like
+        Point indices within [0, n_points)
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (len(indices), 3) holding cartesian [x, y, z] coordinates
+    """
+    _require_numpy()
+    golden_angle = pi * (3 - sqrt(5))
+    z_first, z_step = _spiral_z_params(n_points)
+    indices = np.asarray(indices, dtype=np.float64).ravel()
+    theta = golden_angle * indices
+    z_vals = z_first + z_step * indices
+    radius = np.sqrt(1 - z_vals * z_vals)
+
+    cartesian = np.empty((len(indices), 3), dtype=np.float64)
+    np.multiply(radius, np.cos(theta), out=cartesian[:, 0])
+    np.multiply(radius, np.sin(theta), out=cartesian[:, 1])
+    cartesian[:, 2] = z_vals
+
+    return cartesian
+
+
+def cartesian_to_ecef_array(coordinates, equatorial_radius, polar_radius, rotation_axis):
+    """
+    NumPy counterpart of `cartesian_to_ecef`. Applies equation 23 in Gade (2010) to all
+    coordinates at once.
+
+    Parameters
+    ----------
+    coordinates : array_like
+        Array of shape (n, 3) holding cartesian [x, y, z] coordinates
+    equatorial_radius : float
+        Earth's radius on the equator in meters
+    polar_radius : float
+        Earth's polar radius in meters
+    rotation_axis : list
+        Rotation axis in format [[?, ?, ?], [?, ?, ?], [?, ?, ?]]
+        see Gade (2010) for a detailed explanation
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (n, 3) holding ECEF [x, y, z] coordinates
+    """
+    _require_numpy()
+    return _cartesian_to_ecef_array(_as_coordinate_array(coordinates, 3), equatorial_radius,
+                                    eccentricity_squared(equatorial_radius, polar_radius),
+                                    rotation_axis)
+
+
+def _cartesian_to_ecef_array(coordinates, equatorial_radius, e_squared, rotation_axis):
+    """`cartesian_to_ecef_array` with the squared eccentricity of the ellipsoid computed already"""
+    ra_rev = [[row[i] for row in rotation_axis] for i in range(len(rotation_axis[0]))]
+
+    coord = _dot_matrix_array(equatorial_radius * coordinates, rotation_axis)
+    rr_squared = coord[1] ** 2 + coord[2] ** 2
+    rr = np.sqrt(rr_squared)
+
+    p = rr_squared / equatorial_radius ** 2
+    q = (1 - e_squared) / equatorial_radius ** 2 * coord[0] ** 2
+    r = (p + q - e_squared ** 2) / 6
+    s = e_squared ** 2 * p * q / (4 * r ** 3)
+    t = (1 + s + np.sqrt(s * (2 + s))) ** (1 / 3)
+    u = r * (1 + t + 1.0 / t)
+    v = np.sqrt(u ** 2 + e_squared ** 2 * q)
+    w = e_squared * (u + v - q) / (2 * v)
+    k = np.sqrt(u + v + w ** 2) - w
+
+    pre = 1 / np.sqrt((k * rr / (k + e_squared)) ** 2 + coord[0] ** 2)
+    xyz = np.empty((len(coordinates), 3), dtype=np.float64)
+    xyz[:, 0] = pre * coord[0]
+    xyz[:, 1] = pre * k / (k + e_squared) * coord[1]
+    xyz[:, 2] = pre * k / (k + e_squared) * coord[2]
+    pt_dot = _dot_matrix_array(xyz, ra_rev)
+    pt_norm = np.sqrt(xyz[:, 0] ** 2 + xyz[:, 1] ** 2 + xyz[:, 2] ** 2)
+
+    return np.stack([c / pt_norm for c in pt_dot], axis=1)
+
+
+def ecef_to_geodetic_array(coordinates, rotation_axis):
+    """
+    NumPy counterpart of `ecef_to_geodetic`. Applies equation 5 and 6 in Gade (2010) to all
+    coordinates at once.
+
+    Parameters
+    ----------
+    coordinates : array_like
+        Array of shape (n, 3) holding ECEF [x, y, z] coordinates
+    rotation_axis : list
+        Rotation axis in format [[?, ?, ?], [?, ?, ?], [?, ?, ?]]
+        see Gade (2010) for a detailed explanation
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (n, 2) holding geodetic [longitude, latitude] coordinates
+    """
+    _require_numpy()
+    coordinates = _as_coordinate_array(coordinates, 3)
+
+    coord_dot = _dot_matrix_array(coordinates, rotation_axis)
+    geodetic = np.empty((len(coordinates), 2), dtype=np.float64)
+    np.degrees(np.arctan2(coord_dot[1], -coord_dot[2]), out=geodetic[:, 0])
+    eq_comp = np.sqrt(coord_dot[1] ** 2 + coord_dot[2] ** 2)
+    np.degrees(np.arctan2(coord_dot[0], eq_comp), out=geodetic[:, 1])
+
+    return geodetic
+
+
+def geodetic_to_ecef_array(coordinates, rotation_axis):
+    """
+    NumPy counterpart of `geodetic_to_ecef`
+
+    Parameters
+    ----------
+    coordinates : array_like
+        Array of shape (n, 2) holding geodetic [longitude, latitude] coordinates
+    rotation_axis : list
+        Rotation axis in format [[?, ?, ?], [?, ?, ?], [?, ?, ?]]
+        see Gade (2010) for a detailed explanation
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (n, 3) holding ECEF [x, y, z] coordinates
+    """
+    _require_numpy()
+    coordinates = _as_coordinate_array(coordinates, 2)
+    ra_rev = [[row[i] for row in rotation_axis] for i in range(len(rotation_axis[0]))]
+
+    lon_rad, lat_rad = np.radians(coordinates[:, 0]), np.radians(coordinates[:, 1])
+    cos_lat = np.cos(lat_rad)
+    coord_dot = np.stack([np.sin(lat_rad), cos_lat * np.sin(lon_rad),
+                          -cos_lat * np.cos(lon_rad)], axis=1)
+
+    return np.stack(_dot_matrix_array(coord_dot, ra_rev), axis=1)
+
+
+def ecef_to_cartesian_array(coordinates, equatorial_radius, polar_radius, rotation_axis):
+    """
+    NumPy counterpart of `ecef_to_cartesian`
+
+    Parameters
+    ----------
+    coordinates : array_like
+        Array of shape (n, 3) holding ECEF [x, y, z] coordinates
+    equatorial_radius : float
+        Earth's radius on the equator in meters
+    polar_radius : float
+        Earth's polar radius in meters
+    rotation_axis : list
+        Rotation axis in format [[?, ?, ?], [?, ?, ?], [?, ?, ?]]
+        see Gade (2010) for a detailed explanation
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (n, 3) holding cartesian [x, y, z] coordinates
+    """
+    _require_numpy()
+    coordinates = _as_coordinate_array(coordinates, 3)
+    e_squared = eccentricity_squared(equatorial_radius, polar_radius)
+    ra_rev = [[row[i] for row in rotation_axis] for i in range(len(rotation_axis[0]))]
+
+    normal = _dot_matrix_array(coordinates, rotation_axis)
+    normal_radius = equatorial_radius / np.sqrt(1 - e_squared * normal[0] ** 2)
+    surface = [normal_radius * (1 - e_squared) * normal[0], normal_radius * normal[1],
+               normal_radius * normal[2]]
+
+    p = surface[0] * normal[0] + surface[1] * normal[1] + surface[2] * normal[2]
+    q = surface[0] ** 2 + surface[1] ** 2 + surface[2] ** 2 - equatorial_radius ** 2
+    h = -q / (p + np.sqrt(p ** 2 - q))
+
+    point = np.stack([(a + h * b) / equatorial_radius for a, b in zip(surface, normal)], axis=1)
+    return np.stack(_dot_matrix_array(point, ra_rev), axis=1)
+
+
+def _spiral_z_params(n_points):
+    """
+    Returns the z value of the first spiral point and the step between consecutive points.
+    Point i lies at z = first + step * i, which equals `linspace(1 - 1 / n, 1 / n - 1, n)[i]`.
+
+    Parameters
+    ----------
+    n_points : int
+        Number of points on the sphere
+
+    Returns
+    -------
+    tuple
+        (first, step)
+    """
+    if n_points == 1:
+        return 1.0 / n_points - 1, 0.0
+
+    first, last = 1 - 1.0 / n_points, 1.0 / n_points - 1
+    return first, (last - first) / (n_points - 1)
+
+
+def _check_index_range(n_points, start, stop):
+    """
+    Validates a range of point indices
+
+    Parameters
+    ----------
+    n_points : int
+        Number of points on the sphere
+    start : int
+        Index of the first point
+    stop : int
+        Index after the last point (None for `n_points`)
+
+    Returns
+    -------
+    tuple
+        (start, stop)
+    """
+    if stop is None:
+        stop = n_points
+    if not 0 <= start <= stop <= n_points:
+        raise ValueError('Point indices must satisfy 0 <= start <= stop <= n_points')
+
+    return start, stop
+
+
+def _dot_matrix_array(coordinates, rotation_axis):
+    """
+    Column-wise counterpart of `xyz_dot_matrix`. The products are summed in the same order as
+    in the pure Python implementation.
+
+    Parameters
+    ----------
+    coordinates : numpy.ndarray
+        Array of shape (n, 3)
+    rotation_axis : list
+        Rotation axis in format [[?, ?, ?], [?, ?, ?], [?, ?, ?]]
+
+    Returns
+    -------
+    list
+        The three result columns, each a numpy.ndarray of length n
+    """
+    columns = [coordinates[:, j] for j in range(coordinates.shape[1])]
+    result = []
+
+    for i in range(len(columns)):
+        total = 0.0
+        for j in range(len(rotation_axis[0])):
+            total = total + columns[j] * rotation_axis[i][j]
+
+        result.append(total)
+
+    return result
+
+
+def _as_coordinate_array(coordinates, width):
+    """
+    Converts coordinates to a float64 array of shape (n, `width`)
+
+    Parameters
+    ----------
+    coordinates : array_like
+        Coordinates to be converted
+    width : int
+        Number of components per coordinate
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    try:
+        coordinates = np.asarray(coordinates, dtype=np.float64)
+    except ValueError as e:
+        raise TypeError(str(e))
+    if coordinates.ndim != 2 or coordinates.shape[1] != width:
+        raise IndexError('Coordinates must be of shape (n, {})'.format(width))
+
+    return coordinates
+
+
+def _require_numpy():
+    """Raises an ImportError if NumPy is not installed"""
+    if not HAS_NUMPY:
+        raise ImportError('NumPy is required for the array backend (`pip install numpy`)')
@@ -1,17 +1,55 @@
 """The main module where all the magic happens."""
 from __future__ import division
 
-import csv
-import json
+import numbers
+from array import array
+from contextlib import contextmanager
 
-from . import coord_utils
+from . import coord_utils, instrumentation, lookup, parallel, regions, relaxation, storage
+from .cache import LatticeCache
+from .coord_array import CoordinateArray, INT64_TYPECODE
+from .instrumentation import Stats
+from .neighbors import NeighborGraph
+from .spatial_index import SpatialIndex
+from .coord_utils import COORD_TYPES, COORD_WIDTHS, DEFAULT_CHUNK_SIZE, DTYPES
 
 
 class EquidistantPoints(object):
     """Generates (almost) equally distributed point coordinates on the globe in cartesian format
        and converts them to both ECEF (earth-centered-earth-fixed) and geodetic
-       (longitude/latitude) format."""
-    def __init__(self, n_points, equatorial_radius=6378137.0, polar_radius=6356752.3):
+       (longitude/latitude) format.
+
+       The coordinates are computed lazily on first access of `cartesian`, `ecef` or `geodetic`
+       and cached until they are released again with `release`. They are stored in contiguous
+       float64 buffers: NumPy arrays of shape (n, 3) / (n, 2) if NumPy is installed, otherwise
+       `CoordinateArray` instances. Use `to_list` to get plain lists.
+
+       Slicing (`points[a:b]`) returns an EquidistantPoints instance covering only that index
+       range of the same lattice. Its coordinates are computed independently of the rest, so
+       shards of very large lattices are cheap. Single points are available through
+       `point_at`.
+
+       `latitude_band` and `region` return the points within a latitude band or a
+       longitude/latitude bounding box, computing only the index range of the band, so that the
+       cost scales with the band's share of the globe rather than with `n_points`.
+
+       `relax` returns a copy whose points are moved towards more uniform nearest-neighbor
+       distances. Its points no longer lie on the spiral, so lookups, regions and binary files,
+       which rely on it, are not supported on the copy.
+
+       With a `cache.LatticeCache`, coordinates of the full lattice are stored on disk once
+       computed and memory-mapped from there by later instances with the same parameters.
+
+       With `dtype='float32'`, coordinates are still computed in float64, but cached and written
+       as float32, which halves memory and output size. Each coordinate is rounded once, which
+       moves a point by at most `coord_utils.FLOAT32_MAX_ERROR` meters on the WGS-84 ellipsoid
+       (0.34 for cartesian and ECEF, 0.95 for geodetic coordinates). Cached float32 coordinates
+       are therefore not converted into other types, which are computed from scratch instead.
+
+       With `stats`, the time, points and memory of every stage (generation, projection,
+       conversion, caching and output) are recorded, see `instrumentation.Stats`."""
+    def __init__(self, n_points, equatorial_radius=6378137.0, polar_radius=6356752.3, workers=1,
+                 cache=None, stats=None, dtype='float64'):
         """
         Parameters
         ----------
@@ -21,105 +59,961 @@ class EquidistantPoints(object):
             Earth's radius on the equator in meters (default taken from WGS-84 system)
         polar_radius : float
             Earth's polar radius in meters (default taken from WGS-84 system)
+        workers : int
+            Number of processes computing coordinates (see `parallel.compute_points`). With 1,
+            everything is computed in the calling process.
+        cache : LatticeCache
+            On-disk cache to load coordinates from and store computed coordinates in (default:
+            no caching)
+        stats : Stats
+            Records the time spent in each stage, shared with slices of this instance (default:
+            no instrumentation)
+        dtype : str
+            Precision in which coordinates are cached and written ('float64' | 'float32')
         """
+        if not isinstance(n_points, numbers.Integral):
+            raise TypeError('`n_points` must be an integer')
         if n_points <= 2:
             raise ValueError('`n_points` must be larger than 2')
+        if not isinstance(equatorial_radius, numbers.Real) or \
+                not isinstance(polar_radius, numbers.Real):
+            raise TypeError('`equatorial_radius` and `polar_radius` must be numbers')
+        if not isinstance(workers, numbers.Integral):
+            raise TypeError('`workers` must be an integer')
+        if workers < 1:
+            raise ValueError('`workers` must be a positive integer')
+        if cache is not None and not isinstance(cache, LatticeCache):
+            raise TypeError('`cache` must be a LatticeCache')
+        if stats is not None and not isinstance(stats, Stats):
+            raise TypeError('`stats` must be a Stats instance')
+        coord_utils.check_dtype(dtype)
+
+        self.n_points = n_points
+        self.equatorial_radius = equatorial_radius
+        self.polar_radius = polar_radius
+        self.workers = workers
+        self.cache = cache
+        self.stats = stats
+        self.dtype = dtype
+        self.rotation_axis = coord_utils.ROTATION_AXIS
+        self.__start, self.__stop = 0, n_points
+        self.__selection = None
+        self.__relaxed = None
+        self.__coordinates = {}
+        self.spatial_index = None
+        self.relaxation = None
+
+    @classmethod
+    def for_ellipsoids(cls, n_points, radii, coord_types=('ecef', 'geodetic')):
+        """
+        Computes the same lattice on several ellipsoids in one pass: the cartesian points are
+        generated only once and projected onto every ellipsoid (see
+        `coord_utils.iter_ellipsoid_points`). The results are identical to those of separate
+        instances.
+
+        Parameters
+        ----------
+        n_points : int
+            Number of points to be generated
+        radii : list
+            (equatorial_radius, polar_radius) pairs in meters, one per ellipsoid
+        coord_types : tuple
+            The coordinate types to be computed and cached ('geodetic' | 'cartesian' | 'ecef').
+            Cartesian coordinates are shared by all instances.
+
+        Returns
+        -------
+        list
+            One EquidistantPoints instance per ellipsoid, in the order of `radii`
+        """
+        if not radii:
+            raise ValueError('`radii` must hold at least one (equatorial, polar) radius pair')
+        for coord_type in coord_types:
+            coord_utils.check_coord_type(coord_type)
+
+        all_points = [cls(n_points, equatorial_radius=equatorial_radius,
+                          polar_radius=polar_radius) for equatorial_radius, polar_radius in radii]
+        shared = dict((coord_type, cls.__allocate(coord_type, n_points))
+                      for coord_type in coord_types if coord_type == 'cartesian')
+        coordinates = [dict((coord_type, cls.__allocate(coord_type, n_points))
+                            for coord_type in coord_types if coord_type != 'cartesian')
+                       for _ in all_points]
+
+        chunks = coord_utils.iter_ellipsoid_points(n_points, radii, coord_types=coord_types,
+                                                   chunk_size=DEFAULT_CHUNK_SIZE)
+        for i, results in enumerate(chunks):
+            for target, chunk in zip([shared] + coordinates, results[:1] + results):
+                for coord_type, values in target.items():
+                    cls.__store(values, i * DEFAULT_CHUNK_SIZE, chunk[coord_type])
+
+        for points, computed in zip(all_points, coordinates):
+            points.__coordinates.update(shared)
+            points.__coordinates.update(computed)
+
+        return all_points
+
+    def __len__(self):
+        if self.__selection is not None:
+            return len(self.__selection)
+        return self.__stop - self.__start
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError('EquidistantPoints only supports slicing, use `point_at` to access '
+                            'single points')
+
+        start, stop, step = index.indices(len(self))
+        if step != 1:
+            raise ValueError('Only contiguous slices are supported')
+        stop = max(start, stop)
+
+        sliced = self.__copy()
+        if self.__selection is None:
+            sliced.__start, sliced.__stop = self.__start + start, self.__start + stop
+        else:
+            sliced.__start, sliced.__stop = self.__start, self.__stop
+            sliced.__selection = self.__selection[start:stop]
+        if self.__relaxed is not None:
+            sliced.__relaxed = self.__relaxed[start:stop]
+            sliced.relaxation = self.relaxation
+        sliced.__coordinates = dict((coord_type, coordinates[start:stop])
+                                    for coord_type, coordinates in self.__coordinates.items())
+
+        return sliced
+
+    @property
+    def indices(self):
+        """
+        Indices of the covered points within the full lattice of `n_points` points: a range, or
+        a sorted array of indices for instances returned by `region`
+        """
+        if self.__selection is not None:
+            return self.__selection
+        return range(self.__start, self.__stop)
+
+    @property
+    def cartesian(self):
+        """Cartesian [x, y, z] coordinates on the unit sphere"""
+        return self.__get('cartesian')
+
+    @property
+    def ecef(self):
+        """ECEF [x, y, z] coordinates (earth-centered-earth-fixed)"""
+        return self.__get('ecef')
+
+    @property
+    def geodetic(self):
+        """Geodetic [longitude, latitude] coordinates"""
+        return self.__get('geodetic')
+
+    def to_list(self, coord_type):
+        """
+        Returns coordinates as a list of lists
+
+        Parameters
+        ----------
+        coord_type : str
+            The coordinate type to be returned ('geodetic' | 'cartesian' | 'ecef')
+
+        Returns
+        -------
+        list
+        """
+        coord_utils.check_coord_type(coord_type)
+
+        return self.__get(coord_type).tolist()
+
+    def point_at(self, index, coord_type='geodetic'):
+        """
+        Returns a single point, computed in closed form without generating any other point
+        (unless the coordinates are cached already)
+
+        Parameters
+        ----------
+        index : int
+            Index of the point (negative values count from the end)
+        coord_type : str
+            The coordinate type to be returned ('geodetic' | 'cartesian' | 'ecef')
+
+        Returns
+        -------
+        list
+            The coordinate of the point
+        """
+        coord_utils.check_coord_type(coord_type)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Point index out of range')
+
+        if coord_type in self.__coordinates:
+            return [float(c) for c in self.__coordinates[coord_type][index]]
+
+        if self.__relaxed is not None:
+            source_type, source = 'ecef', self.__relaxed[index:index + 1]
+        else:
+            index = (self.__start + index if self.__selection is None
+                     else int(self.__selection[index]))
+            source_type = 'cartesian'
+            source = coord_utils.generate_points(self.n_points, index, index + 1)
+        coordinates = coord_utils.convert_points(source, source_type, coord_type,
+                                                 equatorial_radius=self.equatorial_radius,
+                                                 polar_radius=self.polar_radius,
+                                                 rotation_axis=self.rotation_axis)
+        return [float(c) for c in self.__to_dtype(coordinates, coord_type)[0]]
+
+    def latitude_band(self, lat_min, lat_max):
+        """
+        Returns the points whose geodetic latitude lies within [lat_min, lat_max]. The band is a
+        contiguous index range found in constant time (see `regions.latitude_index_range`), so
+        the result is a slice of this instance.
+
+        Parameters
+        ----------
+        lat_min : float
+            Southern bound in degrees
+        lat_max : float
+            Northern bound in degrees
+
+        Returns
+        -------
+        EquidistantPoints
+        """
+        return self.region((-180, lat_min, 180, lat_max))
+
+    def region(self, bbox):
+        """
+        Returns the points within a longitude/latitude bounding box. Only the index range of the
+        box's latitude band is visited and filtered by longitude without computing any
+        coordinates (see `regions.region_indices`). The coordinates of the remaining points are
+        computed lazily, like those of any other instance.
+
+        Unless the box spans all longitudes, the covered indices are not contiguous: `indices` is
+        a sorted array, coordinates are computed in a single process and cannot be written with
+        `write_to_binary`.
+
+        Parameters
+        ----------
+        bbox : tuple
+            (lon_min, lat_min, lon_max, lat_max) in degrees. Boxes crossing the antimeridian have
+            lon_min > lon_max.
+
+        Returns
+        -------
+        EquidistantPoints
+        """
+        self.__check_unrelaxed('Regions')
+        lon_min, lat_min, lon_max, lat_max = regions.check_bbox(bbox)
+        if self.__selection is None and (lon_min, lon_max) == (-180, 180):
+            start, stop = regions.latitude_index_range(self.n_points, lat_min, lat_max,
+                                                       equatorial_radius=self.equatorial_radius,
+                                                       polar_radius=self.polar_radius)
+            return self[max(start - self.__start, 0):max(stop - self.__start, 0)]
+
+        indices = regions.region_indices(self.n_points, bbox,
+                                         equatorial_radius=self.equatorial_radius,
+                                         polar_radius=self.polar_radius, start=self.__start,
+                                         stop=self.__stop)
+        if self.__selection is not None:
+            if coord_utils.HAS_NUMPY:
+                indices = coord_utils.np.intersect1d(self.__selection, indices,
+                                                     assume_unique=True)
+            else:
+                selected = set(indices)
+                indices = array(INT64_TYPECODE, [i for i in self.__selection if i in selected])
 
-        rotation_axis = [[0, 0, 1], [0, 1, 0], [-1, 0, 0]]  # Taken from Gade (2010)
+        subset = self.__copy()
+        subset.__start, subset.__stop = self.__start, self.__stop
+        subset.__selection = indices
+        return subset
 
-        self.cartesian = coord_utils.generate_points(n_points=n_points)
-        self.ecef = coord_utils.cartesian_to_ecef(coordinates=self.cartesian,
-                                                  equatorial_radius=equatorial_radius,
-                                                  polar_radius=polar_radius,
-                                                  rotation_axis=rotation_axis)
-        self.geodetic = coord_utils.ecef_to_geodetic(coordinates=self.ecef,
-                                                     rotation_axis=rotation_axis)
+    def nearest_index(self, lon, lat):
+        """
+        Finds the index of the point nearest to a geodetic coordinate (by great-circle distance
+        on this instance's ellipsoid). Runs in constant time, see `lookup.nearest_index`.
+
+        Parameters
+        ----------
+        lon : float
+            Longitude in degrees
+        lat : float
+            Latitude in degrees
 
-    def __write_to_csv(self, file_path, coord_type, header=None):
+        Returns
+        -------
+        int
+            Index of the nearest point
         """
-        Write coordinates to CSV
+        self.__check_full_lattice('Nearest-point lookups')
+        self.__check_unrelaxed('Nearest-point lookups')
+        return lookup.nearest_index(lon, lat, self.n_points,
+                                    equatorial_radius=self.equatorial_radius,
+                                    polar_radius=self.polar_radius)
+
+    def nearest_indices(self, lons, lats):
+        """
+        Batched counterpart of `nearest_index`, vectorized with NumPy if it is installed. Use
+        `assign.assign_file` to assign large files across several processes.
+
+        Parameters
+        ----------
+        lons : array_like
+            Longitudes in degrees
+        lats : array_like
+            Latitudes in degrees
+
+        Returns
+        -------
+        numpy.ndarray or list
+            Indices of the nearest points
+        """
+        self.__check_full_lattice('Nearest-point lookups')
+        self.__check_unrelaxed('Nearest-point lookups')
+        return lookup.nearest_indices(lons, lats, self.n_points,
+                                      equatorial_radius=self.equatorial_radius,
+                                      polar_radius=self.polar_radius)
+
+    def nearest(self, lon, lat, coord_type='geodetic'):
+        """
+        Returns the point nearest to a geodetic coordinate
+
+        Parameters
+        ----------
+        lon : float
+            Longitude in degrees
+        lat : float
+            Latitude in degrees
+        coord_type : str
+            The coordinate type to be returned ('geodetic' | 'cartesian' | 'ecef')
+
+        Returns
+        -------
+        list
+            The coordinate of the nearest point
+        """
+        return self.point_at(self.nearest_index(lon, lat), coord_type=coord_type)
+
+    def build_index(self, band_size=None):
+        """
+        Builds a spatial index for k-nearest-neighbor and radius queries (see `SpatialIndex`),
+        or returns the one built before. The index is kept as `spatial_index`.
+
+        Parameters
+        ----------
+        band_size : int
+            Number of points per latitude band (default: 2 * sqrt(n_points))
+
+        Returns
+        -------
+        SpatialIndex
+        """
+        self.__check_full_lattice('Spatial indexes')
+        self.__check_unrelaxed('Spatial indexes')
+        if self.spatial_index is None:
+            self.spatial_index = SpatialIndex(self, band_size=band_size)
+
+        return self.spatial_index
+
+    def neighbor_graph(self, k=6, symmetric=False):
+        """
+        Builds the k-nearest-neighbor adjacency graph of the points (see `NeighborGraph.build`)
+
+        Parameters
+        ----------
+        k : int
+            Number of nearest neighbors per point
+        symmetric : bool
+            Whether to add the reverse of every edge
+
+        Returns
+        -------
+        NeighborGraph
+        """
+        self.__check_full_lattice('Neighbor graphs')
+
+        return NeighborGraph.build(self, k=k, symmetric=symmetric)
+
+    def relax(self, target_deviation=None, max_iterations=20, max_seconds=None, k=6, step=0.2):
+        """
+        Returns a copy of the points moved towards more uniform nearest-neighbor distances by
+        neighbor-local repulsion, starting from the lattice (see `relaxation.relax`, which
+        requires NumPy). The copy's `relaxation` attribute reports how much the uniformity
+        improved against the time spent (see `relaxation.RelaxationReport`).
+
+        Parameters
+        ----------
+        target_deviation : float
+            Largest relative deviation of a nearest-neighbor distance from their mean at which
+            to stop, e.g. 0.03 for 3% (default: run all iterations)
+        max_iterations : int
+            Maximum number of relaxation steps
+        max_seconds : float
+            Time budget in seconds (default: unlimited)
+        k : int
+            Number of neighbors each point is repelled from
+        step : float
+            Fraction of the overlap with the rest length by which points are moved per iteration
+
+        Returns
+        -------
+        EquidistantPoints
+            The relaxed points, whose ECEF coordinates are cached
+        """
+        coord_utils._require_numpy()
+        self.__check_full_lattice('Relaxations')
+        # Computed beforehand, so that the 'relax' stage only covers the relaxation itself
+        self.__get('cartesian')
+        self.__get('ecef')
+        with self.__stage('relax') as step_stats:
+            ecef, report = relaxation.relax(self, target_deviation=target_deviation,
+                                            max_iterations=max_iterations,
+                                            max_seconds=max_seconds, k=k, step=step)
+            step_stats.update(points=len(ecef), payload_bytes=instrumentation.payload_bytes(
+                'ecef', len(ecef), self.dtype))
+
+        relaxed = self.__copy()
+        relaxed.__relaxed = ecef
+        relaxed.__coordinates['ecef'] = relaxed.__to_dtype(ecef, 'ecef')
+        relaxed.relaxation = report
+        return relaxed
+
+    def iter_points(self, coord_type='geodetic', chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Yields coordinates in chunks of at most `chunk_size` points, with memory usage bounded by
+        the chunk size. Cached coordinates are sliced, anything else is computed chunk by chunk
+        without being cached.
+
+        Parameters
+        ----------
+        coord_type : str
+            The coordinate type to be generated ('geodetic' | 'cartesian' | 'ecef')
+        chunk_size : int
+            Maximum number of coordinates per chunk
+
+        Yields
+        ------
+        numpy.ndarray or CoordinateArray
+        """
+        coord_utils.check_coord_type(coord_type)
+        if chunk_size < 1:
+            raise ValueError('`chunk_size` must be a positive integer.')
+
+        for chunk in self.__iter_chunks(coord_type, chunk_size):
+            if isinstance(chunk, list):
+                chunk = CoordinateArray.from_rows(chunk, width=COORD_WIDTHS[coord_type])
+            yield chunk
+
+    def release(self, *coord_types):
+        """
+        Drops cached coordinates to free memory. They are recomputed on next access.
+
+        Parameters
+        ----------
+        coord_types : str
+            The coordinate types to be released ('geodetic' | 'cartesian' | 'ecef'). Releases
+            all of them if none are given.
+        """
+        for coord_type in coord_types or COORD_TYPES:
+            coord_utils.check_coord_type(coord_type)
+            self.__coordinates.pop(coord_type, None)
+
+    def __copy(self):
+        """New instance of the same lattice, sharing the cache and stats of this one"""
+        return EquidistantPoints(self.n_points, equatorial_radius=self.equatorial_radius,
+                                 polar_radius=self.polar_radius, workers=self.workers,
+                                 cache=self.cache, stats=self.stats, dtype=self.dtype)
+
+    def __chunk_indices(self, offset, count):
+        """Lattice indices of `count` covered points, starting at the `offset`-th of them"""
+        if self.__selection is not None:
+            return self.__selection[offset:offset + count]
+        return range(self.__start + offset, self.__start + offset + count)
+
+    def __check_full_lattice(self, operation):
+        """Raises a ValueError if this instance only covers a slice of the lattice"""
+        if len(self) != self.n_points:
+            raise ValueError('{} are only supported on the full lattice'.format(operation))
+
+    def __check_unrelaxed(self, operation):
+        """Raises a ValueError if the points were moved off the lattice by `relax`"""
+        if self.__relaxed is not None:
+            raise ValueError('{} are not supported on relaxed points'.format(operation))
+
+    def __on_lattice(self):
+        """Whether the covered points are a contiguous index range of the unrelaxed lattice"""
+        return self.__selection is None and self.__relaxed is None
+
+    def __get(self, coord_type):
+        """
+        Returns the cached coordinates of the given type, computing them first if needed. With
+        an on-disk `cache`, they are mapped from there instead, or stored there once computed
+        for the full lattice.
+
+        Parameters
+        ----------
+        coord_type : str
+            The coordinate type ('geodetic' | 'cartesian' | 'ecef')
+        """
+        if coord_type in self.__coordinates:
+            return self.__coordinates[coord_type]
+
+        coordinates = None
+        if self.cache is not None and self.__on_lattice():
+            with self.__stage('cache_load') as step:
+                coordinates = self.cache.get(self, coord_type)
+                if coordinates is not None:
+                    coordinates = coordinates[self.__start:self.__stop]
+                    step.update(points=len(self), payload_bytes=coordinates.nbytes)
+        if coordinates is None:
+            coordinates = self.__compute(coord_type)
+            if self.cache is not None and self.__on_lattice() and len(self) == self.n_points:
+                with self.__stage('cache_store') as step:
+                    self.cache.put(self, coord_type, coordinates)
+                    step.update(points=len(self), payload_bytes=coordinates.nbytes)
+        self.__coordinates[coord_type] = coordinates
+
+        return self.__coordinates[coord_type]
+
+    @staticmethod
+    def __allocate(coord_type, count):
+        """Empty coordinate buffer for `count` coordinates of the given type, filled by `__store`"""
+        if coord_utils.HAS_NUMPY:
+            return coord_utils.np.empty((count, COORD_WIDTHS[coord_type]))
+
+        return CoordinateArray(COORD_WIDTHS[coord_type])
+
+    @staticmethod
+    def __store(coordinates, offset, chunk):
+        """Writes a chunk into a buffer of `__allocate`, where chunks are stored in order"""
+        if coord_utils.HAS_NUMPY:
+            coordinates[offset:offset + len(chunk)] = chunk
+        else:
+            coordinates.extend(chunk)
+
+    def __compute(self, coord_type):
+        """
+        Computes coordinates of the given type chunk by chunk. Intermediate representations are
+        only reused if they are cached already, otherwise they are discarded after each chunk.
+        With multiple `workers`, the index range is generated in parallel instead.
+
+        Parameters
+        ----------
+        coord_type : str
+            The coordinate type ('geodetic' | 'cartesian' | 'ecef')
+        """
+        if self.workers > 1 and self.__on_lattice():
+            with self.__stage(coord_type) as step:
+                coordinates = parallel.compute_points(self.n_points, coord_type, self.workers,
+                                                      equatorial_radius=self.equatorial_radius,
+                                                      polar_radius=self.polar_radius,
+                                                      rotation_axis=self.rotation_axis,
+                                                      start=self.__start, stop=self.__stop,
+                                                      dtype=self.dtype)
+                step.update(points=len(coordinates), payload_bytes=coordinates.nbytes)
+            return coordinates
+
+        chunks = self.__iter_chunks(coord_type, DEFAULT_CHUNK_SIZE)
+
+        if coord_utils.HAS_NUMPY:
+            coordinates = coord_utils.np.empty((len(self), COORD_WIDTHS[coord_type]),
+                                               dtype=self.dtype)
+            offset = 0
+            for chunk in chunks:
+                coordinates[offset:offset + len(chunk)] = chunk
+                offset += len(chunk)
+            return coordinates
+
+        coordinates = CoordinateArray(COORD_WIDTHS[coord_type], array(DTYPES[self.dtype]))
+        for chunk in chunks:
+            coordinates.extend(chunk)
+        return coordinates
+
+    def __iter_chunks(self, coord_type, chunk_size):
+        """
+        Yields coordinates of the given type in chunks of the precision of `dtype`, slicing
+        cached coordinates or rounding those computed by `__iter_float64_chunks`
+
+        Parameters
+        ----------
+        coord_type : str
+            The coordinate type ('geodetic' | 'cartesian' | 'ecef')
+        chunk_size : int
+            Maximum number of coordinates per chunk
+        """
+        if coord_type in self.__coordinates:
+            coordinates = self.__coordinates[coord_type]
+            for start in range(0, len(self), chunk_size):
+                yield coordinates[start:start + chunk_size]
+            return
+
+        for chunk in self.__iter_float64_chunks(coord_type, chunk_size):
+            yield self.__to_dtype(chunk, coord_type)
+
+    def __iter_float64_chunks(self, coord_type, chunk_size):
+        """
+        Yields float64 coordinates of the given type in chunks, converting chunks of the nearest
+        cached (or generated) representation. Cached float32 coordinates are not used, so that
+        every coordinate is only rounded once.
+
+        Parameters
+        ----------
+        coord_type : str
+            The coordinate type ('geodetic' | 'cartesian' | 'ecef')
+        chunk_size : int
+            Maximum number of coordinates per chunk
+        """
+        if coord_type in self.__coordinates and self.dtype == 'float64':
+            coordinates = self.__coordinates[coord_type]
+            for start in range(0, len(self), chunk_size):
+                yield coordinates[start:start + chunk_size]
+            return
+
+        if self.__relaxed is not None and coord_type != 'geodetic':
+            for start in range(0, len(self), chunk_size):
+                chunk = self.__relaxed[start:start + chunk_size]
+                if coord_type == 'cartesian':
+                    with self.__stage('cartesian') as step:
+                        chunk = coord_utils.convert_points(
+                            chunk, 'ecef', 'cartesian', equatorial_radius=self.equatorial_radius,
+                            polar_radius=self.polar_radius, rotation_axis=self.rotation_axis)
+                        step.update(points=len(chunk), payload_bytes=instrumentation.payload_bytes(
+                            'cartesian', len(chunk), self.dtype))
+                yield chunk
+            return
+
+        if coord_type == 'cartesian':
+            if self.__selection is None:
+                chunks = coord_utils.iter_points(self.n_points, chunk_size=chunk_size,
+                                                 start=self.__start, stop=self.__stop)
+            else:
+                points_at = (coord_utils.points_at_array if coord_utils.HAS_NUMPY
+                             else coord_utils.points_at)
+                chunks = (points_at(self.n_points, self.__selection[start:start + chunk_size])
+                          for start in range(0, len(self), chunk_size))
+            if self.stats is not None:
+                chunks = self.stats.iter_stage('cartesian', chunks, 'cartesian', self.dtype)
+            for chunk in chunks:
+                yield chunk
+            return
+
+        source_type = COORD_TYPES[COORD_TYPES.index(coord_type) - 1]
+        for chunk in self.__iter_float64_chunks(source_type, chunk_size):
+            with self.__stage(coord_type) as step:
+                chunk = coord_utils.convert_points(chunk, source_type, coord_type,
+                                                   equatorial_radius=self.equatorial_radius,
+                                                   polar_radius=self.polar_radius,
+                                                   rotation_axis=self.rotation_axis)
+                step.update(points=len(chunk), payload_bytes=instrumentation.payload_bytes(
+                    coord_type, len(chunk), self.dtype))
+            yield chunk
+
+    def __to_dtype(self, coordinates, coord_type):
+        """Rounds float64 coordinates of the given type to the precision of `dtype`"""
+        if self.dtype == 'float64':
+            return coordinates
+        if coord_utils.HAS_NUMPY:
+            return coord_utils.np.asarray(coordinates, dtype=self.dtype)
+
+        return CoordinateArray.from_rows(coordinates, COORD_WIDTHS[coord_type],
+                                         typecode=DTYPES[self.dtype])
+
+    def __write_to_csv(self, file_path, coord_type, header=None, precision=None, index=False,
+                       delimiter=','):
+        """
+        Write coordinates to CSV, formatting and writing them chunk by chunk. Rows end with CRLF
+        as written by the `csv` module, or with LF for other delimiters (e.g. TSV).
 
         Parameters
         ----------
         file_path : str
-            Path to which the CSV should be written
+            Path to which the CSV should be written ('-' for stdout), compressed if it ends with
+            `.gz`, `.bz2` or `.xz`
         coord_type : str
             The coordinate type to be written ('geodetic' | 'cartesian' | 'ecef')
         header : list
             The header row to be written
+        precision : int
+            Number of decimal places (default: full precision)
+        index : bool
+            Indicates if each row shall start with the point's index
+        delimiter : str
+            Column delimiter
         """
-        if coord_type == 'geodetic':
-            coordinates = self.geodetic
-        elif coord_type == 'cartesian':
-            coordinates = self.cartesian
-        elif coord_type == 'ecef':
-            coordinates = self.ecef
-        else:
-            raise ValueError('Argument `coord_type` must be one of: `geodetic`, `cartesian, `ecef`')
+        coord_utils.check_coord_type(coord_type)
+        line_terminator = '\r\n' if delimiter == ',' else '\n'
 
-        with open(file_path, 'w') as target_file:
-            writer = csv.writer(target_file)
+        with self.__open_output(file_path) as target_file:
             if header:
-                writer.writerow(header)
-            for coordinate in coordinates:
-                writer.writerow(coordinate)
+                target_file.write((delimiter.join((['index'] if index else []) + header) +
+                                   line_terminator).encode('ascii'))
+            offset = 0
+            for chunk in self.__iter_output_chunks(coord_type):
+                rows = storage.format_rows(chunk, precision=precision,
+                                           indices=self.__chunk_indices(offset, len(chunk))
+                                           if index else None,
+                                           delimiter=delimiter, line_terminator=line_terminator,
+                                           dtype=self.dtype)
+                target_file.write(rows.encode('ascii'))
+                offset += len(chunk)
 
-    def write_geodetic_to_csv(self, file_path, header=True):
+    def write_geodetic_to_csv(self, file_path, header=True, precision=None, index=False,
+                              delimiter=','):
         """
         Write geodetic coordinates to CSV
 
         Parameters
         ----------
         file_path : str
-            Path to the output file
+            Path to the output file ('-' for stdout), compressed if it ends with `.gz`, `.bz2`
+            or `.xz`
         header : bool
             Indicates if a header row shall be written
+        precision : int
+            Number of decimal places (default: full precision)
+        index : bool
+            Indicates if each row shall start with the point's index
+        delimiter : str
+            Column delimiter, e.g. '\\t' for TSV
         """
         if header:
             header = ['longitude', 'latitude']
 
-        self.__write_to_csv(file_path=file_path, coord_type='geodetic', header=header)
+        self.__write_to_csv(file_path=file_path, coord_type='geodetic', header=header,
+                            precision=precision, index=index, delimiter=delimiter)
 
-    def write_cartesian_to_csv(self, file_path, header=True):
+    def write_cartesian_to_csv(self, file_path, header=True, precision=None, index=False,
+                               delimiter=','):
         """
         Write cartesian coordinates to CSV
 
         Parameters
         ----------
         file_path : str
-            Path to the output file
+            Path to the output file ('-' for stdout), compressed if it ends with `.gz`, `.bz2`
+            or `.xz`
         header : bool
             Indicates if a header row shall be written
+        precision : int
+            Number of decimal places (default: full precision)
+        index : bool
+            Indicates if each row shall start with the point's index
+        delimiter : str
+            Column delimiter, e.g. '\\t' for TSV
         """
         if header:
             header = ['x', 'y', 'z']
 
-        self.__write_to_csv(file_path=file_path, coord_type='cartesian', header=header)
+        self.__write_to_csv(file_path=file_path, coord_type='cartesian', header=header,
+                            precision=precision, index=index, delimiter=delimiter)
 
-    def write_ecef_to_csv(self, file_path, header=True):
+    def write_ecef_to_csv(self, file_path, header=True, precision=None, index=False,
+                          delimiter=','):
         """
         Write ECEF coordinates to CSV
 
         Parameters
         ----------
         file_path : str
-            Path to the output file
+            Path to the output file ('-' for stdout), compressed if it ends with `.gz`, `.bz2`
+            or `.xz`
         header : bool
             Indicates if a header row shall be written
+        precision : int
+            Number of decimal places (default: full precision)
+        index : bool
+            Indicates if each row shall start with the point's index
+        delimiter : str
+            Column delimiter, e.g. '\\t' for TSV
         """
         if header:
             header = ['x', 'y', 'z']
 
-        self.__write_to_csv(file_path=file_path, coord_type='ecef', header=header)
+        self.__write_to_csv(file_path=file_path, coord_type='ecef', header=header,
+                            precision=precision, index=index, delimiter=delimiter)
 
-    def write_geodetic_to_geojson(self, file_path):
+    def write_geodetic_to_geojson(self, file_path, geojson_type='multipoint', precision=None):
         """
-        Write geodetic coordinates to GeoJSON
+        Write geodetic coordinates to GeoJSON, chunk by chunk
 
         Parameters
         ----------
         file_path : str
-            Path to the output file
+            Path to the output file ('-' for stdout), compressed if it ends with `.gz`, `.bz2`
+            or `.xz`
+        geojson_type : str
+            'multipoint' for a single MultiPoint geometry, 'features' for a FeatureCollection of
+            Point features carrying the point's index as property `index`, or 'seq' for the
+            same features in newline-delimited GeoJSON (GeoJSONSeq)
+        precision : int
+            Number of decimal places (default: full precision)
+        """
+        parts = storage.iter_geojson(self.__iter_output_chunks('geodetic'),
+                                     geojson_type=geojson_type, start_index=self.__start,
+                                     precision=precision, indices=self.__selection,
+                                     dtype=self.dtype)
+        with self.__open_output(file_path) as target_file:
+            for part in parts:
+                target_file.write(part.encode('ascii'))
+
+    def write_to_ndjson(self, file_path, coord_type='geodetic', precision=None, index=False):
         """
-        with open(file_path, 'w') as target_file:
-            json.dump({'type': 'MultiPoint', 'coordinates': self.geodetic}, target_file)
+        Write coordinates as newline-delimited JSON objects, e.g.
+        `{"index": 0, "longitude": 0.0, "latitude": 87.45}`
+
+        Parameters
+        ----------
+        file_path : str
+            Path to the output file ('-' for stdout), compressed if it ends with `.gz`, `.bz2`
+            or `.xz`
+        coord_type : str
+            The coordinate type to be written ('geodetic' | 'cartesian' | 'ecef')
+        precision : int
+            Number of decimal places (default: full precision)
+        index : bool
+            Indicates if each object shall hold the point's index
+        """
+        coord_utils.check_coord_type(coord_type)
+        names = ['longitude', 'latitude'] if coord_type == 'geodetic' else ['x', 'y', 'z']
+
+        with self.__open_output(file_path) as target_file:
+            offset = 0
+            for chunk in self.__iter_output_chunks(coord_type):
+                rows = storage.format_ndjson(chunk, names, precision=precision,
+                                             indices=self.__chunk_indices(offset, len(chunk))
+                                             if index else None, dtype=self.dtype)
+                target_file.write(rows.encode('ascii'))
+                offset += len(chunk)
+
+    def write_to_binary(self, file_path, coord_type='geodetic'):
+        """
+        Write coordinates as little-endian floats of the precision of `dtype` after a 64-byte
+        header holding the lattice parameters (see `storage.binary_header`). The file can be
+        memory-mapped by `load`.
+
+        Parameters
+        ----------
+        file_path : str
+            Path to the output file ('-' for stdout)
+        coord_type : str
+            The coordinate type to be written ('geodetic' | 'cartesian' | 'ecef')
+        """
+        coord_utils.check_coord_type(coord_type)
+        if self.__selection is not None:
+            raise ValueError('Binary files hold a contiguous index range, use `write_to_npy` for '
+                             'bounding boxes')
+        self.__check_unrelaxed('Binary files of the lattice')
+        header = storage.binary_header(coord_type, self.n_points, self.__start, len(self),
+                                       self.equatorial_radius, self.polar_radius,
+                                       dtype=self.dtype)
+        self.__write_binary(file_path, coord_type, header)
+
+    def write_to_npy(self, file_path, coord_type='geodetic'):
+        """
+        Write coordinates to a NumPy `.npy` file holding a float64 (or float32, see `dtype`)
+        array of shape (n, 3) or (n, 2), which can be memory-mapped by
+        `numpy.load(file_path, mmap_mode='r')`
+
+        Parameters
+        ----------
+        file_path : str
+            Path to the output file ('-' for stdout)
+        coord_type : str
+            The coordinate type to be written ('geodetic' | 'cartesian' | 'ecef')
+        """
+        coord_utils.check_coord_type(coord_type)
+        header = storage.npy_header(len(self), COORD_WIDTHS[coord_type], dtype=self.dtype)
+        self.__write_binary(file_path, coord_type, header)
+
+    @classmethod
+    def load(cls, file_path, mmap=True):
+        """
+        Loads points written by `write_to_binary`. The file is memory-mapped without copying
+        and serves as the cache of its coordinate type, other types are computed as usual.
+
+        Parameters
+        ----------
+        file_path : str
+            Path to the binary file
+        mmap : bool
+            Map the file into memory (read-only) instead of reading it
+
+        Returns
+        -------
+        EquidistantPoints
+            Instance covering the index range stored in the file
+        """
+        header = storage.read_header(file_path)
+        if header['format'] != 'binary':
+            raise ValueError('Only files written by `write_to_binary` hold the lattice '
+                             'parameters, use `storage.load_coordinates` for .npy files')
+
+        points = cls(header['n_points'], equatorial_radius=header['equatorial_radius'],
+                     polar_radius=header['polar_radius'], dtype=header['dtype'])
+        points.__start, points.__stop = header['start'], header['start'] + header['count']
+        points.__coordinates[header['coord_type']] = storage.load_coordinates(file_path,
+                                                                              mmap=mmap)
+
+        return points
+
+    def __write_binary(self, file_path, coord_type, header):
+        """
+        Write a header followed by the coordinates as little-endian floats of the precision of
+        `dtype`, chunk by chunk
+
+        Parameters
+        ----------
+        file_path : str
+            Path to the output file ('-' for stdout)
+        coord_type : str
+            The coordinate type to be written ('geodetic' | 'cartesian' | 'ecef')
+        header : bytes
+            The file header
+        """
+        with self.__open_output(file_path) as target_file:
+            target_file.write(header)
+            storage.write_chunks(target_file, self.__iter_output_chunks(coord_type),
+                                 dtype=self.dtype)
+
+    def __stage(self, name):
+        """Context manager recording a step of a stage in `stats`, if instrumented"""
+        if self.stats is None:
+            return instrumentation.NULL_STAGE
+
+        return self.stats.stage(name)
+
+    @contextmanager
+    def __open_output(self, file_path):
+        """
+        Opens an output file (see `storage.open_output`) and records the output as 'write'
+        stage in `stats`, if instrumented
+
+        Parameters
+        ----------
+        file_path : str
+            Path to the output file ('-' for stdout)
+        """
+        if self.stats is None:
+            with storage.open_output(file_path) as target_file:
+                yield target_file
+            return
+
+        with self.stats.stage('write') as step:
+            with storage.open_output(file_path) as target_file:
+                counter = instrumentation.CountingWriter(target_file)
+                yield counter
+            step.update(points=len(self), payload_bytes=counter.n_bytes)
+
+    def __iter_output_chunks(self, coord_type):
+        """
+        Yields coordinates to be written in chunks. Uncached coordinates are streamed without
+        being cached, unless several `workers` compute (and cache) them first.
+
+        Parameters
+        ----------
+        coord_type : str
+            The coordinate type ('geodetic' | 'cartesian' | 'ecef')
+        """
+        if self.workers > 1:
+            self.__get(coord_type)
+
+        return self.__iter_chunks(coord_type, DEFAULT_CHUNK_SIZE)
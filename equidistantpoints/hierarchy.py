@@ -0,0 +1,252 @@
+"""Multi-resolution hierarchy of lattices with parent/child mappings between their levels"""
+from __future__ import division
+import numbers
+from array import array
+
+from . import coord_utils, lookup
+from .coord_array import INT64_TYPECODE
+from .edpoints import EquidistantPoints
+
+CHUNK_SIZE = 65536
+
+
+class Hierarchy(object):
+    """Lattices of increasing resolution on the same ellipsoid, e.g. 1k, 10k, 100k and 1M points.
+
+       Every point of a level is assigned to its nearest point of the next coarser level, its
+       parent. The parents are found in constant time per point by inverting the spiral (see
+       `lookup.nearest_index`) when the hierarchy is built, and stored as one compact integer
+       array per level (int32 as long as the coarser level has fewer than 2**31 points).
+       Ancestors and descendants follow these arrays, so no nearest-point search is needed at
+       query time. The ECEF coordinates of all but the finest level are computed and cached on
+       the way.
+
+       Ancestors are defined through the chain of parents: the ancestor two levels up is the
+       parent of the parent, which is not necessarily the nearest point of that level. Every
+       point therefore has exactly one ancestor per coarser level, and the descendants of the
+       points of a level partition every finer level."""
+    def __init__(self, n_points, equatorial_radius=6378137.0, polar_radius=6356752.3, workers=1,
+                 cache=None, stats=None):
+        """
+        Parameters
+        ----------
+        n_points : list
+            Number of points of every level, strictly increasing from the coarsest level
+        equatorial_radius : float
+            Earth's radius on the equator in meters (default taken from WGS-84 system)
+        polar_radius : float
+            Earth's polar radius in meters (default taken from WGS-84 system)
+        workers : int
+            Number of processes computing the coordinates of each level
+        cache : LatticeCache
+            On-disk cache of the levels' coordinates (default: no caching)
+        stats : Stats
+            Records the time spent in each stage of the levels (default: no instrumentation)
+        """
+        if not n_points:
+            raise ValueError('`n_points` must hold at least one level')
+        if not all(isinstance(n, numbers.Integral) for n in n_points):
+            raise TypeError('`n_points` must hold integers')
+        if any(coarse >= fine for coarse, fine in zip(n_points, n_points[1:])):
+            raise ValueError('`n_points` must be strictly increasing')
+
+        self.levels = [EquidistantPoints(n, equatorial_radius=equatorial_radius,
+                                         polar_radius=polar_radius, workers=workers,
+                                         cache=cache, stats=stats) for n in n_points]
+        self.parents = [None] + [self.__find_parents(coarse, fine)
+                                 for coarse, fine in zip(self.levels, self.levels[1:])]
+        self.__children = [None] * len(self.levels)
+
+    def __len__(self):
+        return len(self.levels)
+
+    @property
+    def n_points(self):
+        """Number of points of every level"""
+        return [points.n_points for points in self.levels]
+
+    def ancestors(self, level, indices, target_level=0):
+        """
+        Finds the ancestors of points at a coarser level
+
+        Parameters
+        ----------
+        level : int
+            Level of the points
+        indices : array_like
+            Indices of the points within their level
+        target_level : int
+            Level of the ancestors (default: the coarsest level)
+
+        Returns
+        -------
+        numpy.ndarray or list
+            Index of each point's ancestor within `target_level` (int64 NumPy array if NumPy is
+            installed, otherwise list)
+        """
+        self.__check_levels(target_level, level)
+        if coord_utils.HAS_NUMPY:
+            indices = coord_utils.np.asarray(indices, dtype=coord_utils.np.int64).ravel()
+            self.__check_indices(level, indices)
+            for parents in self.parents[target_level + 1:level + 1][::-1]:
+                indices = parents[indices].astype(coord_utils.np.int64)
+            return indices
+
+        indices = [int(i) for i in indices]
+        self.__check_indices(level, indices)
+        for parents in self.parents[target_level + 1:level + 1][::-1]:
+            indices = [parents[i] for i in indices]
+        return indices
+
+    def children(self, level, index):
+        """
+        Parameters
+        ----------
+        level : int
+            Level of the point (must not be the finest level)
+        index : int
+            Index of the point within its level
+
+        Returns
+        -------
+        numpy.ndarray or array.array
+            Sorted indices of the point's children within the next finer level
+        """
+        self.__check_levels(level, level + 1)
+        self.__check_indices(level, [index])
+        indptr, children = self.__child_table(level)
+
+        return children[indptr[index]:indptr[index + 1]]
+
+    def descendants(self, level, indices, target_level=None):
+        """
+        Finds the descendants of points at a finer level
+
+        Parameters
+        ----------
+        level : int
+            Level of the points
+        indices : array_like
+            Indices of the points within their level
+        target_level : int
+            Level of the descendants (default: the finest level)
+
+        Returns
+        -------
+        list
+            Sorted indices of each point's descendants within `target_level`, one NumPy array
+            (or list, without NumPy) per point
+        """
+        target_level = len(self.levels) - 1 if target_level is None else target_level
+        self.__check_levels(level, target_level)
+
+        if not coord_utils.HAS_NUMPY:
+            indices = [int(i) for i in indices]
+            self.__check_indices(level, indices)
+            groups = [[i] for i in indices]
+            for current in range(level, target_level):
+                indptr, children = self.__child_table(current)
+                groups = [[j for i in group for j in children[indptr[i]:indptr[i + 1]]]
+                          for group in groups]
+            return [sorted(group) for group in groups]
+
+        np = coord_utils.np
+        indices = np.asarray(indices, dtype=np.int64).ravel()
+        self.__check_indices(level, indices)
+        n_queries = len(indices)
+        owners = np.arange(n_queries)
+        for current in range(level, target_level):
+            indptr, children = self.__child_table(current)
+            starts = indptr[indices]
+            counts = indptr[indices + 1] - starts
+            owners = np.repeat(owners, counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            indices = children[np.repeat(starts, counts) + offsets]
+
+        bounds = np.searchsorted(owners, np.arange(n_queries + 1))
+        return [np.sort(indices[start:stop]) for start, stop in zip(bounds, bounds[1:])]
+
+    def __find_parents(self, coarse, fine):
+        """
+        Index of the nearest point of the `coarse` level for every point of the `fine` one.
+        The fine points lie on the unit sphere already, so the spiral is inverted at their
+        cartesian coordinates (see `lookup`) and the candidates are ranked by the distance of
+        their normal vectors, taken from the coarse level's ECEF coordinates.
+        """
+        coarse_ecef = coarse.ecef
+        if coord_utils.HAS_NUMPY:
+            np = coord_utils.np
+            parents = np.empty(fine.n_points, dtype=np.int32 if coarse.n_points < 2 ** 31
+                               else np.int64)
+            for start in range(0, fine.n_points, CHUNK_SIZE):
+                cartesian = coord_utils.generate_points_array(
+                    fine.n_points, start, min(start + CHUNK_SIZE, fine.n_points))
+                candidates = lookup._candidate_indices_array(cartesian, coarse.n_points)
+                valid = candidates < coarse.n_points
+                ecef = self.__to_ecef(cartesian, fine)
+                distances = ((coarse_ecef[np.where(valid, candidates, 0)] -
+                              ecef[:, np.newaxis, :]) ** 2).sum(axis=2)
+                distances[~valid] = np.inf
+                parents[start:start + len(cartesian)] = candidates[
+                    np.arange(len(candidates)), distances.argmin(axis=1)]
+            return parents
+
+        parents = array('i' if coarse.n_points < 2 ** 31 else INT64_TYPECODE)
+        for start in range(0, fine.n_points, CHUNK_SIZE):
+            cartesian = coord_utils.generate_points(fine.n_points, start,
+                                                    min(start + CHUNK_SIZE, fine.n_points))
+            for point, normal in zip(cartesian, self.__to_ecef(cartesian, fine)):
+                candidates = sorted(lookup._candidate_indices(point, coarse.n_points))
+                distances = [sum((a - b) ** 2 for a, b in zip(coarse_ecef[i], normal))
+                             for i in candidates]
+                parents.append(candidates[distances.index(min(distances))])
+        return parents
+
+    @staticmethod
+    def __to_ecef(cartesian, points):
+        """ECEF coordinates of cartesian coordinates on the ellipsoid of `points`"""
+        return coord_utils.convert_points(cartesian, 'cartesian', 'ecef',
+                                          equatorial_radius=points.equatorial_radius,
+                                          polar_radius=points.polar_radius,
+                                          rotation_axis=points.rotation_axis)
+
+    def __child_table(self, level):
+        """
+        Children of all points of a level in compressed sparse row format, built on first use:
+        the children of point i are `children[indptr[i]:indptr[i + 1]]`
+        """
+        if self.__children[level] is None:
+            parents, n_points = self.parents[level + 1], self.levels[level].n_points
+            if coord_utils.HAS_NUMPY:
+                np = coord_utils.np
+                children = np.argsort(parents, kind='stable').astype(np.int64)
+                indptr = np.zeros(n_points + 1, dtype=np.int64)
+                np.cumsum(np.bincount(parents, minlength=n_points), out=indptr[1:])
+            else:
+                groups = [[] for _ in range(n_points)]
+                for child, parent in enumerate(parents):
+                    groups[parent].append(child)
+                indptr, children = array(INT64_TYPECODE, [0]), array(INT64_TYPECODE)
+                for group in groups:
+                    children.extend(group)
+                    indptr.append(len(children))
+            self.__children[level] = (indptr, children)
+
+        return self.__children[level]
+
+    def __check_levels(self, coarse_level, fine_level):
+        """Raises a ValueError unless 0 <= coarse_level <= fine_level < number of levels"""
+        if not 0 <= coarse_level <= fine_level < len(self.levels):
+            raise ValueError('Levels must be within [0, {}), the coarser one first'.format(
+                len(self.levels)))
+
+    def __check_indices(self, level, indices):
+        """Raises an IndexError if any point index is out of range of the level"""
+        if not len(indices):
+            return
+        if hasattr(indices, 'min'):
+            low, high = indices.min(), indices.max()
+        else:
+            low, high = min(indices), max(indices)
+        if low < 0 or high >= self.levels[level].n_points:
+            raise IndexError('Point index out of range')
@@ -0,0 +1,240 @@
+"""Optional per-stage timing of point generation, conversion and output"""
+from __future__ import division
+import time
+from collections import OrderedDict
+from array import array
+from contextlib import contextmanager
+
+from .coord_utils import COORD_WIDTHS, DTYPES
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+STAGES = ('cartesian', 'ecef', 'relax', 'geodetic', 'cache_load', 'cache_store', 'write')
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+
+def payload_bytes(coord_type, count, dtype='float64'):
+    """Size of `count` coordinates of the given type in the precision of `dtype`"""
+    return COORD_WIDTHS[coord_type] * count * array(DTYPES[dtype]).itemsize
+
+
+def _traced_memory():
+    """Bytes currently allocated according to `tracemalloc`, None if it is not tracing"""
+    if tracemalloc is None or not tracemalloc.is_tracing():
+        return None
+
+    return tracemalloc.get_traced_memory()[0]
+
+
+def _difference(end, start):
+    """Difference of two `_traced_memory` values, None unless both were measured"""
+    if end is None or start is None:
+        return None
+
+    return end - start
+
+
+class Stats(object):
+    """Wall time, number of points and memory recorded per stage of `EquidistantPoints`:
+
+       - 'cartesian': generation of the spiral on the unit sphere
+       - 'ecef': projection onto the ellipsoid
+       - 'geodetic': conversion to longitude/latitude
+       - 'cache_load' / 'cache_store': mapping from and writing to a `LatticeCache`
+       - 'write': output of the writers, excluding the stages above that produce the written
+         coordinates
+
+       Allocated bytes are measured with `tracemalloc`: the memory allocated by a stage and
+       still in use at its end, e.g. its output, which is negative if a stage frees more than it
+       allocates. They are only recorded while `tracemalloc` is tracing, and are None otherwise
+       (and on Python 2). Payload bytes are the size of the coordinates produced by a stage in
+       the precision of the points (`payload_bytes`), and the size of the (uncompressed) output
+       of writers. Times and allocated bytes are exclusive: a stage running inside another one
+       is only counted once. With several `workers`, the whole computation of a coordinate type
+       is recorded as the stage of that type.
+
+       Hooks are called with (stage, seconds, points, payload_bytes, allocated_bytes) after
+       every recorded step, e.g. once per chunk, and can be used for progress reports or to
+       forward metrics."""
+    def __init__(self, hooks=None):
+        """
+        Parameters
+        ----------
+        hooks : list
+            Callables to be called after every recorded step
+        """
+        self.hooks = list(hooks or [])
+        self.stages = OrderedDict()
+        self.__nested = []
+
+    def add_hook(self, hook):
+        """
+        Parameters
+        ----------
+        hook : callable
+            Called with (stage, seconds, points, payload_bytes, allocated_bytes) after every
+            recorded step
+        """
+        self.hooks.append(hook)
+
+    def reset(self):
+        """Drops all recorded stages"""
+        self.stages.clear()
+
+    @property
+    def total_seconds(self):
+        """Sum of the times of all stages"""
+        return sum(stage['seconds'] for stage in self.stages.values())
+
+    def record(self, stage, seconds, points=0, n_payload_bytes=0, allocated_bytes=None):
+        """
+        Adds a step to the totals of a stage and passes it to the hooks
+
+        Parameters
+        ----------
+        stage : str
+            Name of the stage
+        seconds : float
+            Wall time of the step
+        points : int
+            Number of points processed by the step
+        n_payload_bytes : int
+            Payload bytes produced or written by the step
+        allocated_bytes : int
+            Bytes allocated by the step and still in use at its end, if measured
+        """
+        self.__finish(stage, seconds, seconds, points, n_payload_bytes, allocated_bytes,
+                      allocated_bytes)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Context manager measuring a step of a stage. The yielded dict can be updated with the
+        'points' and 'payload_bytes' of the step. Time spent and memory allocated in stages
+        opened within the context are not counted.
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage
+        """
+        step = {'points': 0, 'payload_bytes': 0}
+        self.__nested.append([0.0, 0])
+        memory = _traced_memory()
+        start = _timer()
+        try:
+            yield step
+        finally:
+            elapsed = _timer() - start
+            allocated = _difference(_traced_memory(), memory)
+            nested_seconds, nested_allocated = self.__nested.pop()
+            self.__finish(name, elapsed - nested_seconds, elapsed, step['points'],
+                          step['payload_bytes'], _difference(allocated, nested_allocated),
+                          allocated)
+
+    def iter_stage(self, name, chunks, coord_type, dtype='float64'):
+        """
+        Yields the chunks of an iterable, recording the time spent producing each of them
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage
+        chunks : iterable
+            Chunks of coordinates
+        coord_type : str
+            The coordinate type of the chunks ('geodetic' | 'cartesian' | 'ecef')
+        dtype : str
+            The precision in which the coordinates are stored ('float64' | 'float32')
+        """
+        iterator = iter(chunks)
+        while True:
+            memory = _traced_memory()
+            start = _timer()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            elapsed = _timer() - start
+            allocated = _difference(_traced_memory(), memory)
+            self.__finish(name, elapsed, elapsed, len(chunk),
+                          payload_bytes(coord_type, len(chunk), dtype), allocated, allocated)
+            yield chunk
+
+    def summary(self):
+        """
+        Returns
+        -------
+        str
+            Table of the recorded stages and their totals, where allocated memory that was not
+            measured is shown as '-'
+        """
+        columns = ('stage', 'seconds', 'points', 'payload MiB', 'allocated MiB', 'steps')
+        lines = ['{:<12}{:>10}{:>12}{:>14}{:>16}{:>8}'.format(*columns)]
+        names = sorted(self.stages, key=lambda name: STAGES.index(name) if name in STAGES
+                       else len(STAGES))
+        for name in names:
+            stage = self.stages[name]
+            allocated = stage['allocated_bytes']
+            allocated = '-' if allocated is None else '{:.1f}'.format(allocated / 2 ** 20)
+            lines.append('{:<12}{:>10.3f}{:>12}{:>14.1f}{:>16}{:>8}'.format(
+                name, stage['seconds'], stage['points'], stage['payload_bytes'] / 2 ** 20,
+                allocated, stage['steps']))
+        lines.append('{:<12}{:>10.3f}'.format('total', self.total_seconds))
+
+        return '\n'.join(lines)
+
+    def __finish(self, name, seconds, elapsed, points, n_payload_bytes, allocated,
+                 total_allocated):
+        """
+        Records a step that took `elapsed` seconds and allocated `total_allocated` bytes,
+        `seconds` and `allocated` of them in the stage itself
+        """
+        if self.__nested:
+            self.__nested[-1][0] += elapsed
+            if total_allocated is not None:
+                self.__nested[-1][1] += total_allocated
+
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = {'seconds': 0.0, 'points': 0, 'payload_bytes': 0,
+                                         'allocated_bytes': None, 'steps': 0}
+        stage['seconds'] += seconds
+        stage['points'] += points
+        stage['payload_bytes'] += n_payload_bytes
+        if allocated is not None:
+            stage['allocated_bytes'] = (stage['allocated_bytes'] or 0) + allocated
+        stage['steps'] += 1
+
+        for hook in self.hooks:
+            hook(name, seconds, points, n_payload_bytes, allocated)
+
+
+class CountingWriter(object):
+    """Wraps a binary output stream, counting the bytes written to it"""
+    def __init__(self, stream):
+        self.stream = stream
+        self.n_bytes = 0
+
+    def write(self, data):
+        self.n_bytes += len(data)
+        return self.stream.write(data)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class _NullStage(object):
+    """Stand-in for `Stats.stage` when no stats are recorded"""
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, *args):
+        return False
+
+
+NULL_STAGE = _NullStage()
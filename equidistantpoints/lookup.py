@@ -0,0 +1,332 @@
+"""Nearest-point lookups by inverting the spherical Fibonacci mapping"""
+from __future__ import division
+from math import sqrt, atan2, radians, pi, cos, sin, log, floor
+
+from . import coord_utils
+
+PHI = (1 + sqrt(5)) / 2
+CANDIDATE_OFFSETS = (-1, 0, 1, 2)
+BATCH_SIZE = 4096
+
+
+def nearest_index(lon, lat, n_points, equatorial_radius=6378137.0, polar_radius=6356752.3):
+    """
+    Finds the index of the generated point nearest to a geodetic coordinate in O(1), regardless
+    of `n_points`.
+
+    The coordinate is mapped back onto the unit sphere the points are generated on, where the
+    spherical Fibonacci mapping is inverted analytically (Keinert et al. 2015) to obtain a few
+    candidate indices around it. The candidates are then ranked by their great-circle distance
+    to the coordinate on the ellipsoid.
+
+    The result is exact up to about 1e11 points. Beyond that, the float64 longitudes computed by
+    `coord_utils.generate_points` are no longer precise enough to resolve the point spacing.
+
+    Based on
+        Keinert et al. (2015) Spherical Fibonacci Mapping
+
+    Parameters
+    ----------
+    lon : float
+        Longitude in degrees
+    lat : float
+        Latitude in degrees
+    n_points : int
+        Number of generated points
+    equatorial_radius : float
+        Earth's radius on the equator in meters (default taken from WGS-84 system)
+    polar_radius : float
+        Earth's polar radius in meters (default taken from WGS-84 system)
+
+    Returns
+    -------
+    int
+        Index of the nearest point
+    """
+    if not -90 <= lat <= 90:
+        raise ValueError('`lat` must be within [-90, 90]')
+
+    n_vector = _geodetic_to_n_vector(lon, lat)
+    candidates = sorted(_candidate_indices(_geodetic_to_sphere(lon, lat, equatorial_radius,
+                                                               polar_radius), n_points))
+    cartesian = []
+    for i in candidates:
+        cartesian.extend(coord_utils.generate_points(n_points, i, i + 1))
+    ecef = coord_utils.cartesian_to_ecef(cartesian, equatorial_radius, polar_radius,
+                                         coord_utils.ROTATION_AXIS)
+
+    distances = [sum((a - b) ** 2 for a, b in zip(coord, n_vector)) for coord in ecef]
+    return candidates[distances.index(min(distances))]
+
+
+def nearest_indices(lons, lats, n_points, equatorial_radius=6378137.0, polar_radius=6356752.3):
+    """
+    Batched counterpart of `nearest_index`. Vectorized with NumPy if it is installed.
+
+    Parameters
+    ----------
+    lons : array_like
+        Longitudes in degrees
+    lats : array_like
+        Latitudes in degrees
+    n_points : int
+        Number of generated points
+    equatorial_radius : float
+        Earth's radius on the equator in meters (default taken from WGS-84 system)
+    polar_radius : float
+        Earth's polar radius in meters (default taken from WGS-84 system)
+
+    Returns
+    -------
+    numpy.ndarray or list
+        Indices of the nearest points (int64 NumPy array if NumPy is installed, otherwise list)
+    """
+    if len(lons) != len(lats):
+        raise ValueError('`lons` and `lats` must have the same length')
+
+    if not coord_utils.HAS_NUMPY:
+        return [nearest_index(lon, lat, n_points, equatorial_radius=equatorial_radius,
+                              polar_radius=polar_radius) for lon, lat in zip(lons, lats)]
+
+    np = coord_utils.np
+    lons = np.asarray(lons, dtype=np.float64).ravel()
+    lats = np.asarray(lats, dtype=np.float64).ravel()
+    if not np.all((lats >= -90) & (lats <= 90)):
+        raise ValueError('`lat` must be within [-90, 90]')
+
+    indices = np.empty(len(lons), dtype=np.int64)
+    for start in range(0, len(lons), BATCH_SIZE):
+        stop = start + BATCH_SIZE
+        indices[start:stop] = _nearest_indices_array(lons[start:stop], lats[start:stop],
+                                                     n_points, equatorial_radius, polar_radius)
+
+    return indices
+
+
+def _nearest_indices_array(lons, lats, n_points, equatorial_radius, polar_radius):
+    """
+    NumPy implementation of `nearest_indices` for one batch
+
+    Parameters
+    ----------
+    lons : numpy.ndarray
+        Longitudes in degrees
+    lats : numpy.ndarray
+        Latitudes in degrees
+    n_points : int
+        Number of generated points
+    equatorial_radius : float
+        Earth's radius on the equator in meters
+    polar_radius : float
+        Earth's polar radius in meters
+
+    Returns
+    -------
+    numpy.ndarray
+        Indices of the nearest points
+    """
+    np = coord_utils.np
+    candidates = _candidate_indices_array(
+        _geodetic_to_sphere_array(lons, lats, equatorial_radius, polar_radius), n_points)
+    valid = candidates < n_points
+    ecef = coord_utils.cartesian_to_ecef_array(
+        coord_utils.points_at_array(n_points, np.where(valid, candidates, 0)),
+        equatorial_radius, polar_radius, coord_utils.ROTATION_AXIS).reshape(
+            candidates.shape + (3,))
+
+    lon_rad, lat_rad = np.radians(lons), np.radians(lats)
+    n_vector = np.stack([np.cos(lat_rad) * np.cos(lon_rad), np.cos(lat_rad) * np.sin(lon_rad),
+                         np.sin(lat_rad)], axis=1)
+    distances = ((ecef - n_vector[:, np.newaxis, :]) ** 2).sum(axis=2)
+    distances[~valid] = np.inf
+
+    return candidates[np.arange(len(candidates)), distances.argmin(axis=1)]
+
+
+def _candidate_indices(point, n_points):
+    """
+    Inverts the spherical Fibonacci mapping. Locates the cell of the local Fibonacci lattice
+    basis containing `point` and returns the indices of the surrounding lattice points.
+
+    Parameters
+    ----------
+    point : tuple
+        Cartesian [x, y, z] coordinate on the unit sphere
+    n_points : int
+        Number of generated points
+
+    Returns
+    -------
+    set
+        Candidate indices
+    """
+    # `generate_points` turns by the golden angle 2 * pi * (2 - PHI), which is the mirror image
+    # of the 2 * pi * (PHI - 1) steps in Keinert et al. (2015)
+    angle = -atan2(point[1], point[0])
+    z = point[2]
+
+    zone = max(2, floor(log(max(n_points * pi * sqrt(5) * (1 - z * z), 1e-300)) /
+                        log(PHI * PHI)))
+    fib = PHI ** zone / sqrt(5)
+    f0, f1 = int(round(fib)), int(round(fib * PHI))
+
+    b00 = 2 * pi * _frac((f0 + 1) * (PHI - 1)) - 2 * pi * (PHI - 1)
+    b01 = 2 * pi * _frac((f1 + 1) * (PHI - 1)) - 2 * pi * (PHI - 1)
+    b10 = -2 * f0 / n_points
+    b11 = -2 * f1 / n_points
+    det = b00 * b11 - b01 * b10
+    dz = z - (1 - 1 / n_points)
+    c0 = int(floor((b11 * angle - b01 * dz) / det))
+    c1 = int(floor((b00 * dz - b10 * angle) / det))
+
+    candidates = set()
+    for u in CANDIDATE_OFFSETS:
+        for v in CANDIDATE_OFFSETS:
+            i = f0 * (c0 + u) + f1 * (c1 + v)
+            if 0 <= i < n_points:
+                candidates.add(i)
+
+    return candidates
+
+
+def _candidate_indices_array(points, n_points):
+    """
+    NumPy counterpart of `_candidate_indices`
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        Array of shape (m, 3) holding cartesian [x, y, z] coordinates on the unit sphere
+    n_points : int
+        Number of generated points
+
+    Returns
+    -------
+    numpy.ndarray
+        Sorted candidate indices of shape (m, 16). Invalid candidates are set to `n_points`.
+    """
+    np = coord_utils.np
+    angle = -np.arctan2(points[:, 1], points[:, 0])
+    z = points[:, 2]
+
+    zone = np.maximum(2, np.floor(np.log(np.maximum(n_points * pi * sqrt(5) * (1 - z * z),
+                                                    1e-300)) / log(PHI * PHI)))
+    fib = PHI ** zone / sqrt(5)
+    f0, f1 = np.round(fib), np.round(fib * PHI)
+
+    b00 = 2 * pi * _frac_array((f0 + 1) * (PHI - 1)) - 2 * pi * (PHI - 1)
+    b01 = 2 * pi * _frac_array((f1 + 1) * (PHI - 1)) - 2 * pi * (PHI - 1)
+    b10 = -2 * f0 / n_points
+    b11 = -2 * f1 / n_points
+    det = b00 * b11 - b01 * b10
+    dz = z - (1 - 1 / n_points)
+    c0 = np.floor((b11 * angle - b01 * dz) / det)
+    c1 = np.floor((b00 * dz - b10 * angle) / det)
+
+    offsets = np.array([(u, v) for u in CANDIDATE_OFFSETS for v in CANDIDATE_OFFSETS],
+                       dtype=np.float64)
+    candidates = (f0[:, np.newaxis] * (c0[:, np.newaxis] + offsets[:, 0]) +
+                  f1[:, np.newaxis] * (c1[:, np.newaxis] + offsets[:, 1])).astype(np.int64)
+    candidates[(candidates < 0) | (candidates >= n_points)] = n_points
+    candidates.sort(axis=1)
+
+    return candidates
+
+
+def _geodetic_to_sphere(lon, lat, equatorial_radius, polar_radius):
+    """
+    Inverse of the projection in `coord_utils.cartesian_to_ecef`: finds the point on the sphere
+    with the equatorial radius whose geodetic latitude on the ellipsoid is `lat`, and scales it to
+    the unit sphere. Scalar shortcut of `coord_utils.geodetic_to_ecef` and `ecef_to_cartesian`
+    for the default rotation axis, as single lookups are dominated by call overhead.
+
+    Parameters
+    ----------
+    lon : float
+        Longitude in degrees
+    lat : float
+        Latitude in degrees
+    equatorial_radius : float
+        Earth's radius on the equator in meters
+    polar_radius : float
+        Earth's polar radius in meters
+
+    Returns
+    -------
+    tuple
+        Cartesian [x, y, z] coordinate on the unit sphere
+    """
+    flattened = (equatorial_radius - polar_radius) / equatorial_radius
+    e_squared = flattened * 2 - flattened ** 2
+    lon_rad, lat_rad = radians(lon), radians(lat)
+    sin_lat, cos_lat = sin(lat_rad), cos(lat_rad)
+
+    # Point on the ellipsoid, moved along its normal by the height h that puts it on the sphere
+    normal_radius = equatorial_radius / sqrt(1 - e_squared * sin_lat ** 2)
+    rr = normal_radius * cos_lat
+    zz = normal_radius * (1 - e_squared) * sin_lat
+    p = rr * cos_lat + zz * sin_lat
+    q = rr ** 2 + zz ** 2 - equatorial_radius ** 2
+    h = -q / (p + sqrt(p ** 2 - q))
+
+    rr = (rr + h * cos_lat) / equatorial_radius
+    return rr * cos(lon_rad), rr * sin(lon_rad), (zz + h * sin_lat) / equatorial_radius
+
+
+def _geodetic_to_sphere_array(lons, lats, equatorial_radius, polar_radius):
+    """
+    NumPy counterpart of `_geodetic_to_sphere`
+
+    Parameters
+    ----------
+    lons : numpy.ndarray
+        Longitudes in degrees
+    lats : numpy.ndarray
+        Latitudes in degrees
+    equatorial_radius : float
+        Earth's radius on the equator in meters
+    polar_radius : float
+        Earth's polar radius in meters
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (m, 3) holding cartesian [x, y, z] coordinates on the unit sphere
+    """
+    np = coord_utils.np
+    n_vectors = coord_utils.geodetic_to_ecef_array(np.stack([lons, lats], axis=1),
+                                                   coord_utils.ROTATION_AXIS)
+
+    return coord_utils.ecef_to_cartesian_array(n_vectors, equatorial_radius, polar_radius,
+                                               coord_utils.ROTATION_AXIS)
+
+
+def _geodetic_to_n_vector(lon, lat):
+    """
+    Converts a geodetic coordinate to its n-vector (the ellipsoid's unit normal), which is the
+    format of the coordinates returned by `coord_utils.cartesian_to_ecef`
+
+    Parameters
+    ----------
+    lon : float
+        Longitude in degrees
+    lat : float
+        Latitude in degrees
+
+    Returns
+    -------
+    tuple
+        ECEF [x, y, z] unit vector
+    """
+    lon_rad, lat_rad = radians(lon), radians(lat)
+    return cos(lat_rad) * cos(lon_rad), cos(lat_rad) * sin(lon_rad), sin(lat_rad)
+
+
+def _frac(x):
+    """Fractional part of `x`"""
+    return x - floor(x)
+
+
+def _frac_array(x):
+    """Fractional part of the values in `x`"""
+    return x - coord_utils.np.floor(x)
@@ -0,0 +1,278 @@
+"""Quality metrics of the generated points, computed in near-linear time"""
+from __future__ import division
+from array import array
+from math import sqrt, asin, atan2
+
+from . import coord_utils
+from .neighbors import NeighborGraph
+
+CELL_NEIGHBORS = 8
+CHUNK_SIZE = 8192
+
+
+def nearest_neighbor_distances(points):
+    """
+    Great-circle distance of every point to its nearest neighbor, found through the neighbor
+    graph (see `NeighborGraph.build`) in O(n_points)
+
+    Parameters
+    ----------
+    points : EquidistantPoints
+        The generated points (must cover the full lattice)
+
+    Returns
+    -------
+    numpy.ndarray or array.array
+        Distances in meters, on a sphere with the ellipsoid's mean radius (as in `SpatialIndex`)
+    """
+    graph = NeighborGraph.build(points, k=1)
+    unit_vectors = points.ecef
+    mean_radius = _mean_radius(points)
+
+    if coord_utils.HAS_NUMPY:
+        np = coord_utils.np
+        chords = np.sqrt(((unit_vectors - unit_vectors[graph.indices]) ** 2).sum(axis=1))
+        return 2 * mean_radius * np.arcsin(np.minimum(chords / 2, 1.0))
+
+    distances = array('d')
+    for point, neighbor in zip(unit_vectors, graph.indices):
+        chord = sqrt(sum((a - b) ** 2 for a, b in zip(point, unit_vectors[neighbor])))
+        distances.append(2 * mean_radius * asin(min(chord / 2, 1.0)))
+    return distances
+
+
+def nearest_neighbor_stats(points):
+    """
+    Summarizes the nearest-neighbor distances of the points
+
+    Parameters
+    ----------
+    points : EquidistantPoints
+        The generated points (must cover the full lattice)
+
+    Returns
+    -------
+    dict
+        'min', 'max' and 'mean' distance in meters, 'spread' ((max - min) / mean),
+        'percentage_deviation': the smaller of the deviations of the minimum and the maximum
+        from the mean, relative to the mean, and 'max_deviation': the larger of them
+    """
+    stats = _summarize(nearest_neighbor_distances(points))
+    deviations = (stats['mean'] - stats['min'], stats['max'] - stats['mean'])
+    stats['percentage_deviation'] = min(deviations) / stats['mean']
+    stats['max_deviation'] = max(deviations) / stats['mean']
+
+    return stats
+
+
+def cell_areas(points):
+    """
+    Area of the spherical Voronoi cell of every point, i.e. of the region that is closer to the
+    point than to any other point. Each cell is bounded by the perpendicular bisectors between
+    the point and its nearest neighbors (taken from the neighbor graph), which are intersected in
+    the point's gnomonic projection, so the cost is O(n_points).
+
+    Parameters
+    ----------
+    points : EquidistantPoints
+        The generated points (must cover the full lattice, with more than `CELL_NEIGHBORS`
+        points)
+
+    Returns
+    -------
+    numpy.ndarray or array.array
+        Areas in square meters, on a sphere with the ellipsoid's mean radius
+    """
+    if points.n_points <= CELL_NEIGHBORS:
+        raise ValueError('Cell areas require more than {} points'.format(CELL_NEIGHBORS))
+
+    graph = NeighborGraph.build(points, k=CELL_NEIGHBORS)
+    scale = _mean_radius(points) ** 2
+
+    if coord_utils.HAS_NUMPY:
+        areas = coord_utils.np.empty(points.n_points)
+        neighbors = graph.indices.reshape(-1, CELL_NEIGHBORS)
+        for start in range(0, points.n_points, CHUNK_SIZE):
+            stop = min(start + CHUNK_SIZE, points.n_points)
+            areas[start:stop] = _cell_areas_array(points.ecef, start, stop,
+                                                  neighbors[start:stop]) * scale
+        return areas
+
+    unit_vectors = points.ecef
+    areas = array('d')
+    for i in range(points.n_points):
+        neighbors = graph.neighbors(i)
+        areas.append(_cell_area(unit_vectors[i], [unit_vectors[j] for j in neighbors]) * scale)
+    return areas
+
+
+def cell_area_stats(points):
+    """
+    Summarizes the Voronoi cell areas of the points
+
+    Parameters
+    ----------
+    points : EquidistantPoints
+        The generated points (must cover the full lattice)
+
+    Returns
+    -------
+    dict
+        'min', 'max' and 'mean' area in square meters and 'spread' ((max - min) / mean)
+    """
+    return _summarize(cell_areas(points))
+
+
+def _summarize(values):
+    """Minimum, maximum, mean and relative spread of a sequence of positive values"""
+    if coord_utils.HAS_NUMPY:
+        v_min, v_max, v_mean = float(values.min()), float(values.max()), float(values.mean())
+    else:
+        v_min, v_max, v_mean = min(values), max(values), sum(values) / len(values)
+
+    return {'min': v_min, 'max': v_max, 'mean': v_mean, 'spread': (v_max - v_min) / v_mean}
+
+
+def _mean_radius(points):
+    """Mean radius (2 * equatorial + polar) / 3 of the points' ellipsoid"""
+    return (2 * points.equatorial_radius + points.polar_radius) / 3
+
+
+def _tangent_basis(point):
+    """Two orthonormal vectors spanning the tangent plane of a unit vector"""
+    axis = [1.0, 0.0, 0.0] if abs(point[0]) < 0.9 else [0.0, 1.0, 0.0]
+    e1 = _cross(point, axis)
+    norm = sqrt(sum(c * c for c in e1))
+    e1 = [c / norm for c in e1]
+
+    return e1, _cross(point, e1)
+
+
+def _cross(a, b):
+    """Cross product of two 3D vectors"""
+    return [a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0]]
+
+
+def _dot(a, b):
+    """Dot product of two 3D vectors"""
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def _cell_area(point, neighbors):
+    """
+    Pure Python implementation of the Voronoi cell area of `cell_areas`
+
+    Parameters
+    ----------
+    point : list
+        Unit vector of the point
+    neighbors : list
+        Unit vectors of its nearest neighbors
+
+    Returns
+    -------
+    float
+        Area of the cell on the unit sphere
+    """
+    e1, e2 = _tangent_basis(point)
+    # Bisector between the point and neighbor q in gnomonic coordinates: u * a + v * b <= c
+    lines = [(_dot(e1, q), _dot(e2, q), 1 - _dot(point, q)) for q in neighbors]
+
+    vertices = []
+    for i, (a1, b1, c1) in enumerate(lines):
+        for a2, b2, c2 in lines[i + 1:]:
+            det = a1 * b2 - a2 * b1
+            if abs(det) < 1e-300:
+                continue
+            u, v = (c1 * b2 - c2 * b1) / det, (a1 * c2 - a2 * c1) / det
+            tolerance = 1e-9 * (abs(u) + abs(v) + max(c1, c2))
+            if all(u * a + v * b <= c + tolerance for a, b, c in lines):
+                vertices.append((atan2(v, u), u, v))
+    vertices.sort()
+
+    corners = []
+    for _, u, v in vertices:
+        corner = [p + u * a + v * b for p, a, b in zip(point, e1, e2)]
+        norm = sqrt(_dot(corner, corner))
+        corners.append([c / norm for c in corner])
+
+    area = 0.0
+    for i, corner in enumerate(corners):
+        area += _triangle_area(point, corner, corners[(i + 1) % len(corners)])
+    return area
+
+
+def _triangle_area(a, b, c):
+    """Area of a spherical triangle of unit vectors (Van Oosterom and Strackee)"""
+    return 2 * atan2(abs(_dot(a, _cross(b, c))), 1 + _dot(a, b) + _dot(b, c) + _dot(c, a))
+
+
+def _cell_areas_array(unit_vectors, start, stop, neighbors):
+    """
+    NumPy implementation of the Voronoi cell areas of `cell_areas`
+
+    Parameters
+    ----------
+    unit_vectors : numpy.ndarray
+        Unit vectors (ECEF coordinates) of all points
+    start : int
+        Index of the first point of the chunk
+    stop : int
+        Index after the last point of the chunk
+    neighbors : numpy.ndarray
+        Indices of the nearest neighbors of the chunk's points, of shape (stop - start, k)
+
+    Returns
+    -------
+    numpy.ndarray
+        Areas of the cells on the unit sphere
+    """
+    np = coord_utils.np
+    points = unit_vectors[start:stop]
+    axes = np.where((np.abs(points[:, 0]) < 0.9)[:, np.newaxis], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0])
+    e1 = np.cross(points, axes)
+    e1 /= np.sqrt((e1 ** 2).sum(axis=1))[:, np.newaxis]
+    e2 = np.cross(points, e1)
+
+    q = unit_vectors[neighbors]
+    a = (q * e1[:, np.newaxis, :]).sum(axis=2)
+    b = (q * e2[:, np.newaxis, :]).sum(axis=2)
+    c = 1 - (q * points[:, np.newaxis, :]).sum(axis=2)
+
+    first, second = np.triu_indices(neighbors.shape[1], 1)
+    a1, b1, c1, a2, b2, c2 = a[:, first], b[:, first], c[:, first], a[:, second], b[:, second], \
+        c[:, second]
+    det = a1 * b2 - a2 * b1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        u = (c1 * b2 - c2 * b1) / det
+        v = (a1 * c2 - a2 * c1) / det
+    tolerance = 1e-9 * (np.abs(u) + np.abs(v) + np.maximum(c1, c2))
+    with np.errstate(invalid='ignore'):
+        inside = ((u[:, :, np.newaxis] * a[:, np.newaxis, :] +
+                   v[:, :, np.newaxis] * b[:, np.newaxis, :]) <=
+                  c[:, np.newaxis, :] + tolerance[:, :, np.newaxis]).all(axis=2)
+    inside &= np.isfinite(u) & np.isfinite(v)
+
+    # Sort the cell's vertices by angle, moving all other intersections to the end
+    angles = np.where(inside, np.arctan2(v, u), np.inf)
+    order = np.argsort(angles, axis=1)
+    u, v = np.take_along_axis(u, order, axis=1), np.take_along_axis(v, order, axis=1)
+    n_vertices = inside.sum(axis=1)
+
+    with np.errstate(invalid='ignore'):
+        corners = (points[:, np.newaxis, :] + u[:, :, np.newaxis] * e1[:, np.newaxis, :] +
+                   v[:, :, np.newaxis] * e2[:, np.newaxis, :])
+        corners /= np.sqrt((corners ** 2).sum(axis=2))[:, :, np.newaxis]
+
+    positions = np.arange(corners.shape[1])
+    following = (positions + 1) % np.maximum(n_vertices, 1)[:, np.newaxis]
+    next_corners = np.take_along_axis(corners, following[:, :, np.newaxis], axis=1)
+
+    pa = points[:, np.newaxis, :]
+    triple = np.abs((pa * np.cross(corners, next_corners)).sum(axis=2))
+    denominator = (1 + (pa * corners).sum(axis=2) + (corners * next_corners).sum(axis=2) +
+                   (next_corners * pa).sum(axis=2))
+    with np.errstate(invalid='ignore'):
+        triangles = 2 * np.arctan2(triple, denominator)
+
+    return np.where(positions < n_vertices[:, np.newaxis], triangles, 0).sum(axis=1)
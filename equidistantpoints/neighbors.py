@@ -0,0 +1,392 @@
+"""Neighbor adjacency graph of the generated points"""
+from __future__ import division
+import struct
+import sys
+from array import array
+from math import sqrt, pi, log, floor, ceil
+
+from . import coord_utils
+from .coord_array import INT64_TYPECODE, extend_from_bytes, to_bytes
+from .lookup import PHI
+
+GRAPH_MAGIC = b'EDPG'
+GRAPH_VERSION = 1
+GRAPH_HEADER = struct.Struct('<4sIQQI')
+CHUNK_SIZE = 8192
+RELAXED_CANDIDATES = 12  # Candidates per relaxed point beyond k (see `_relaxed_knn_array`)
+
+
+class NeighborGraph(object):
+    """k-nearest-neighbor adjacency of the generated points in compressed sparse row (CSR)
+       format: the neighbors of point i are `indices[indptr[i]:indptr[i + 1]]`."""
+    def __init__(self, indptr, indices, k=0):
+        """
+        Parameters
+        ----------
+        indptr : array_like
+            Row offsets into `indices`, of length n_points + 1
+        indices : array_like
+            Neighbor indices of all points, row by row
+        k : int
+            Number of nearest neighbors per point the graph was built with (0 if symmetric)
+        """
+        if len(indptr) < 1 or indptr[-1] != len(indices):
+            raise ValueError('`indptr` must end with the number of `indices`')
+
+        self.indptr = indptr
+        self.indices = indices
+        self.k = k
+
+    @classmethod
+    def build(cls, points, k=6, symmetric=False):
+        """
+        Builds the k-nearest-neighbor graph in O(n_points * k).
+
+        In a Fibonacci lattice, the neighbors of point i are found at index offsets that are
+        small integer combinations of the two Fibonacci numbers of the point's zone (see
+        `lookup`). Only those candidates are compared (by great-circle distance on the
+        ellipsoid), instead of all pairs of points. Relaxed points (see
+        `EquidistantPoints.relax`) are no longer on the spiral, their neighbors are searched
+        among those of their lattice positions and verified (see `_relaxed_knn_array`).
+
+        Parameters
+        ----------
+        points : EquidistantPoints
+            The generated points (must cover the full lattice). Their ECEF coordinates are
+            computed and cached if needed.
+        k : int
+            Number of nearest neighbors per point
+        symmetric : bool
+            Whether to add the reverse of every edge, so that j is a neighbor of i whenever i
+            is a neighbor of j
+
+        Returns
+        -------
+        NeighborGraph
+        """
+        n_points = points.n_points
+        if len(points) != n_points:
+            raise ValueError('Neighbor graphs are only supported on the full lattice')
+        if not 1 <= k < n_points:
+            raise ValueError('`k` must be within [1, n_points)')
+
+        if getattr(points, 'relaxation', None) is not None:
+            indices = _relaxed_knn_array(points, k)
+            indptr = coord_utils.np.arange(0, n_points * k + 1, k, dtype=coord_utils.np.int64)
+        elif coord_utils.HAS_NUMPY:
+            indices = _knn_array(points.ecef, points.cartesian[:, 2], k)
+            indptr = coord_utils.np.arange(0, n_points * k + 1, k, dtype=coord_utils.np.int64)
+        else:
+            indices = _knn(points.ecef, points.cartesian, k)
+            indptr = array(INT64_TYPECODE, range(0, n_points * k + 1, k))
+        graph = cls(indptr, indices, k=k)
+
+        return graph.symmetrized() if symmetric else graph
+
+    @property
+    def n_points(self):
+        """Number of points"""
+        return len(self.indptr) - 1
+
+    @property
+    def nnz(self):
+        """Number of edges"""
+        return len(self.indices)
+
+    def neighbors(self, index):
+        """
+        Parameters
+        ----------
+        index : int
+            Index of a point
+
+        Returns
+        -------
+        numpy.ndarray or array.array
+            Indices of the point's neighbors (sorted by distance for k-nearest-neighbor graphs)
+        """
+        return self.indices[self.indptr[index]:self.indptr[index + 1]]
+
+    def symmetrized(self):
+        """
+        Returns
+        -------
+        NeighborGraph
+            Graph that also contains the reverse of every edge, with sorted rows
+        """
+        n = self.n_points
+        if coord_utils.HAS_NUMPY:
+            np = coord_utils.np
+            rows = np.repeat(np.arange(n, dtype=np.int64), np.diff(self.indptr))
+            cols = np.asarray(self.indices, dtype=np.int64)
+            edges = np.unique(np.concatenate([rows * n + cols, cols * n + rows]))
+            indptr = np.searchsorted(edges // n, np.arange(n + 1)).astype(np.int64)
+            return NeighborGraph(indptr, edges % n)
+
+        adjacency = [set() for _ in range(n)]
+        for i in range(n):
+            for j in self.neighbors(i):
+                adjacency[i].add(j)
+                adjacency[j].add(i)
+        indptr, indices = array(INT64_TYPECODE, [0]), array(INT64_TYPECODE)
+        for neighbors in adjacency:
+            indices.extend(sorted(neighbors))
+            indptr.append(len(indices))
+        return NeighborGraph(indptr, indices)
+
+    def save(self, file_path):
+        """
+        Writes the graph to a binary file: a header (magic `EDPG`, format version, n_points,
+        number of edges, k) followed by `indptr` and `indices` as little-endian int64
+
+        Parameters
+        ----------
+        file_path : str
+            Path to the output file, e.g. next to the point file
+        """
+        with open(file_path, 'wb') as target_file:
+            target_file.write(GRAPH_HEADER.pack(GRAPH_MAGIC, GRAPH_VERSION, self.n_points,
+                                                self.nnz, self.k))
+            for values in (self.indptr, self.indices):
+                _write_int64(target_file, values)
+
+    @classmethod
+    def load(cls, file_path, mmap=False):
+        """
+        Reads a graph written by `save`
+
+        Parameters
+        ----------
+        file_path : str
+            Path to the graph file
+        mmap : bool
+            Map the arrays into memory instead of reading them (requires NumPy)
+
+        Returns
+        -------
+        NeighborGraph
+        """
+        with open(file_path, 'rb') as source_file:
+            magic, version, n_points, nnz, k = GRAPH_HEADER.unpack(
+                source_file.read(GRAPH_HEADER.size))
+            if magic != GRAPH_MAGIC or version != GRAPH_VERSION:
+                raise ValueError('`{}` is not a neighbor graph file'.format(file_path))
+
+            if mmap:
+                np = coord_utils.np
+                if np is None:
+                    raise ImportError('NumPy is required to memory-map graph files')
+                offset = GRAPH_HEADER.size
+                indptr = np.memmap(file_path, dtype='<i8', mode='r', offset=offset,
+                                   shape=(n_points + 1,))
+                indices = np.memmap(file_path, dtype='<i8', mode='r',
+                                    offset=offset + 8 * (n_points + 1), shape=(nnz,))
+            else:
+                indptr = _read_int64(source_file, n_points + 1)
+                indices = _read_int64(source_file, nnz)
+
+        return cls(indptr, indices, k=k)
+
+
+def _candidate_offsets(zone, k):
+    """
+    Index offsets at which the nearest neighbors of a point in the given zone are found: small
+    combinations of the zone's (and the next zone's) Fibonacci numbers, plus a window of
+    consecutive indices covering the poles
+
+    Parameters
+    ----------
+    zone : int
+        Zone of the point, as in `lookup._candidate_indices`
+    k : int
+        Number of nearest neighbors
+
+    Returns
+    -------
+    list
+        Sorted non-zero offsets
+    """
+    reach = int(ceil(sqrt(k / 3))) + 1
+    offsets = set(range(-2 * k, 2 * k + 1))
+    for zone_offset in (0, 1):
+        f0 = int(round(PHI ** (zone + zone_offset) / sqrt(5)))
+        f1 = int(round(PHI ** (zone + zone_offset + 1) / sqrt(5)))
+        for a in range(-reach, reach + 1):
+            for b in range(-reach, reach + 1):
+                offsets.add(a * f0 + b * f1)
+    offsets.discard(0)
+
+    return sorted(offsets)
+
+
+def _zone(z, n_points):
+    """Zone of a point at height z, as in `lookup._candidate_indices`"""
+    return int(max(2, floor(log(max(n_points * pi * sqrt(5) * (1 - z * z), 1e-300)) /
+                            log(PHI * PHI))))
+
+
+def _knn(ecef, cartesian, k):
+    """
+    Pure Python implementation of the k-nearest-neighbor search of `NeighborGraph.build`
+
+    Parameters
+    ----------
+    ecef : CoordinateArray
+        ECEF coordinates of all points
+    cartesian : CoordinateArray
+        Cartesian coordinates of all points
+    k : int
+        Number of nearest neighbors
+
+    Returns
+    -------
+    array.array
+        Neighbor indices, k per point
+    """
+    n_points = len(ecef)
+    offsets = {}
+    indices = array(INT64_TYPECODE)
+
+    for i in range(n_points):
+        zone = _zone(cartesian[i][2], n_points)
+        if zone not in offsets:
+            offsets[zone] = _candidate_offsets(zone, k)
+        point = ecef[i]
+        candidates = []
+        for offset in offsets[zone]:
+            j = i + offset
+            if 0 <= j < n_points:
+                candidates.append((sum((a - b) ** 2 for a, b in zip(ecef[j], point)), j))
+        candidates.sort()
+        indices.extend(j for _, j in candidates[:k])
+
+    return indices
+
+
+def _knn_array(ecef, z_vals, k):
+    """
+    NumPy implementation of the k-nearest-neighbor search of `NeighborGraph.build`
+
+    Parameters
+    ----------
+    ecef : numpy.ndarray
+        ECEF coordinates of all points
+    z_vals : numpy.ndarray
+        Cartesian z coordinates of all points
+    k : int
+        Number of nearest neighbors
+
+    Returns
+    -------
+    numpy.ndarray
+        Neighbor indices, k per point
+    """
+    np = coord_utils.np
+    n_points = len(ecef)
+    zones = np.maximum(2, np.floor(np.log(np.maximum(n_points * pi * sqrt(5) * (1 - z_vals ** 2),
+                                                     1e-300)) / log(PHI * PHI))).astype(np.int64)
+    neighbors = np.empty((n_points, k), dtype=np.int64)
+
+    for zone in np.unique(zones):
+        offsets = np.array(_candidate_offsets(int(zone), k), dtype=np.int64)
+        rows = np.nonzero(zones == zone)[0]
+        for start in range(0, len(rows), CHUNK_SIZE):
+            chunk = rows[start:start + CHUNK_SIZE]
+            candidates = chunk[:, np.newaxis] + offsets
+            valid = (candidates >= 0) & (candidates < n_points)
+            candidates = np.where(valid, candidates, 0)
+            distances = ((ecef[candidates] - ecef[chunk][:, np.newaxis, :]) ** 2).sum(axis=2)
+            distances[~valid] = np.inf
+            nearest = np.argsort(distances, axis=1, kind='stable')[:, :k]
+            neighbors[chunk] = np.take_along_axis(candidates, nearest, axis=1)
+
+    return neighbors.ravel()
+
+
+def _relaxed_knn_array(points, k):
+    """
+    Exact k-nearest-neighbor search among relaxed points, which are off the spiral.
+
+    The candidates of every point are the k + `RELAXED_CANDIDATES` nearest neighbors of its
+    position on the lattice. Any other point is at least as far from that position as the
+    farthest candidate, so it is farther from the relaxed point than this distance minus twice
+    the largest displacement of a point by the relaxation. Rows whose k-th nearest candidate
+    is within that bound are therefore exact, the remaining ones are searched among all points.
+
+    Parameters
+    ----------
+    points : EquidistantPoints
+        Relaxed points (must cover the full lattice)
+    k : int
+        Number of nearest neighbors
+
+    Returns
+    -------
+    numpy.ndarray
+        Neighbor indices, k per point
+    """
+    np = coord_utils.np
+    n_points = points.n_points
+    unit_vectors = np.asarray(points.ecef, dtype=np.float64)
+    cartesian = coord_utils.generate_points_array(n_points)
+    lattice = coord_utils.cartesian_to_ecef_array(cartesian, points.equatorial_radius,
+                                                  points.polar_radius, points.rotation_axis)
+    n_candidates = min(k + RELAXED_CANDIDATES, n_points - 1)
+    candidates = _knn_array(lattice, cartesian[:, 2], n_candidates).reshape(-1, n_candidates)
+    displacement = np.sqrt(((unit_vectors - lattice) ** 2).sum(axis=1)).max()
+
+    neighbors = np.empty((n_points, k), dtype=np.int64)
+    unverified = []
+    for start in range(0, n_points, CHUNK_SIZE):
+        stop = min(start + CHUNK_SIZE, n_points)
+        rows = candidates[start:stop]
+        chords = np.sqrt(((unit_vectors[rows] - unit_vectors[start:stop, np.newaxis, :]) ** 2)
+                         .sum(axis=2))
+        nearest = np.argsort(chords, axis=1, kind='stable')[:, :k]
+        neighbors[start:stop] = np.take_along_axis(rows, nearest, axis=1)
+        if n_candidates < n_points - 1:
+            kth = np.take_along_axis(chords, nearest[:, -1:], axis=1)[:, 0]
+            bound = np.sqrt(((lattice[rows[:, -1]] - lattice[start:stop]) ** 2).sum(axis=1))
+            unverified.append(start + np.nonzero(kth > bound - 2 * displacement)[0])
+
+    for i in (np.concatenate(unverified) if unverified else []):
+        chords = ((unit_vectors - unit_vectors[i]) ** 2).sum(axis=1)
+        chords[i] = np.inf
+        nearest = np.argpartition(chords, k - 1)[:k]
+        neighbors[i] = nearest[np.lexsort((nearest, chords[nearest]))]
+
+    return neighbors.ravel()
+
+
+def _write_int64(target_file, values):
+    """Writes integers as little-endian int64"""
+    if coord_utils.HAS_NUMPY:
+        target_file.write(coord_utils.np.asarray(values, dtype='<i8').tobytes())
+        return
+
+    values = array(INT64_TYPECODE, values)
+    if values.itemsize != 8:  # Python 2 with 32-bit longs
+        target_file.write(struct.pack('<{}q'.format(len(values)), *values))
+        return
+    if sys.byteorder != 'little':
+        values.byteswap()
+    target_file.write(to_bytes(values))
+
+
+def _read_int64(source_file, count):
+    """Reads `count` little-endian int64 integers"""
+    data = source_file.read(8 * count)
+    if len(data) != 8 * count:
+        raise ValueError('Unexpected end of graph file')
+
+    if coord_utils.HAS_NUMPY:
+        return coord_utils.np.frombuffer(data, dtype='<i8').astype(coord_utils.np.int64)
+
+    values = array(INT64_TYPECODE)
+    if values.itemsize != 8:  # Python 2 with 32-bit longs
+        values.extend(struct.unpack('<{}q'.format(count), data))
+        return values
+    extend_from_bytes(values, data)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
@@ -0,0 +1,115 @@
+"""Multi-process generation of coordinates into shared memory"""
+from __future__ import division
+from array import array
+from ctypes import string_at
+from multiprocessing import Pool
+from multiprocessing.sharedctypes import RawArray
+
+from . import coord_utils
+from .coord_array import CoordinateArray, extend_from_bytes
+from .coord_utils import COORD_WIDTHS, DEFAULT_CHUNK_SIZE, DTYPES, ROTATION_AXIS
+
+MAX_TASK_SIZE = 16 * DEFAULT_CHUNK_SIZE
+
+_shared = {}
+
+
+def compute_points(n_points, coord_type, workers, equatorial_radius=6378137.0,
+                   polar_radius=6356752.3, rotation_axis=ROTATION_AXIS, start=0, stop=None,
+                   dtype='float64'):
+    """
+    Generates the coordinates of an index range of the lattice with a pool of `workers`
+    processes. The range is split into tasks of at most `MAX_TASK_SIZE` points, whose results
+    are computed in float64 and written directly into a shared buffer of the given precision.
+    Point i only depends on i and `n_points` (see `coord_utils.iter_points`), so the result is
+    identical to serial generation.
+
+    Parameters
+    ----------
+    n_points : int
+        Number of points on the sphere
+    coord_type : str
+        The coordinate type to be generated ('geodetic' | 'cartesian' | 'ecef')
+    workers : int
+        Number of worker processes
+    equatorial_radius : float
+        Earth's radius on the equator in meters (default taken from WGS-84 system)
+    polar_radius : float
+        Earth's polar radius in meters (default taken from WGS-84 system)
+    rotation_axis : list
+        Rotation axis in format [[?, ?, ?], [?, ?, ?], [?, ?, ?]]
+    start : int
+        Index of the first point to be generated (default: 0)
+    stop : int
+        Index after the last point to be generated (default: `n_points`)
+    dtype : str
+        Precision of the buffer ('float64' | 'float32')
+
+    Returns
+    -------
+    numpy.ndarray or CoordinateArray
+        The coordinates, of shape (stop - start, width). The NumPy array is a view of the shared
+        buffer, the CoordinateArray a copy of it.
+    """
+    coord_utils.check_coord_type(coord_type)
+    if workers < 1:
+        raise ValueError('`workers` must be a positive integer.')
+    coord_utils.check_dtype(dtype)
+    start, stop = coord_utils._check_index_range(n_points, start, stop)
+
+    width, typecode = COORD_WIDTHS[coord_type], DTYPES[dtype]
+    buffer = RawArray(typecode, max(1, (stop - start) * width))
+    task_size = max(1, min(MAX_TASK_SIZE, -(-(stop - start) // workers)))
+    lattice = (n_points, coord_type, equatorial_radius, polar_radius, rotation_axis)
+    tasks = [(lattice, task_start, min(task_start + task_size, stop), task_start - start)
+             for task_start in range(start, stop, task_size)]
+
+    pool = Pool(workers, initializer=_init_worker, initargs=(buffer, width, dtype))
+    try:
+        pool.map(_compute_task, tasks, chunksize=1)
+    finally:
+        pool.terminate()
+
+    if coord_utils.HAS_NUMPY:
+        return coord_utils.np.frombuffer(buffer, dtype=dtype,
+                                         count=(stop - start) * width).reshape(-1, width)
+
+    data = array(typecode)
+    extend_from_bytes(data, string_at(buffer, (stop - start) * width * data.itemsize))
+    return CoordinateArray(width, data)
+
+
+def _init_worker(buffer, width, dtype):
+    """Pool initializer making the shared buffer available to the worker process"""
+    _shared['buffer'] = buffer
+    _shared['width'] = width
+    _shared['dtype'] = dtype
+
+
+def _compute_task(task):
+    """
+    Worker function generating one index range into the shared buffer
+
+    Parameters
+    ----------
+    task : tuple
+        ((n_points, coord_type, equatorial_radius, polar_radius, rotation_axis), start, stop,
+        offset of the first point within the buffer)
+    """
+    lattice, start, stop, offset = task
+    n_points, coord_type, equatorial_radius, polar_radius, rotation_axis = lattice
+    buffer, width = _shared['buffer'], _shared['width']
+    if coord_utils.HAS_NUMPY:
+        target = coord_utils.np.frombuffer(buffer, dtype=_shared['dtype']).reshape(-1, width)
+
+    chunks = coord_utils.iter_points(n_points, DEFAULT_CHUNK_SIZE, coord_type,
+                                     equatorial_radius=equatorial_radius,
+                                     polar_radius=polar_radius, rotation_axis=rotation_axis,
+                                     start=start, stop=stop)
+    for chunk in chunks:
+        if coord_utils.HAS_NUMPY:
+            target[offset:offset + len(chunk)] = chunk
+        else:
+            buffer[offset * width:(offset + len(chunk)) * width] = \
+                [value for coord in chunk for value in coord]
+        offset += len(chunk)
@@ -0,0 +1,169 @@
+"""Regional subsets of the lattice: latitude bands and longitude/latitude bounding boxes"""
+from __future__ import division
+from array import array
+from math import sqrt, radians, pi, ceil, floor
+
+from . import coord_utils, lookup
+from .coord_array import INT64_TYPECODE
+
+
+def latitude_index_range(n_points, lat_min, lat_max, equatorial_radius=6378137.0,
+                         polar_radius=6356752.3):
+    """
+    Finds the range of indices of the points whose geodetic latitude lies within
+    [lat_min, lat_max], without generating any other point.
+
+    The spiral's z coordinate decreases monotonically with the point index and the projection
+    onto the ellipsoid preserves the order of latitudes, so a latitude band is a contiguous
+    index range. Its ends are found by mapping the latitudes back onto the unit sphere and
+    inverting z = first + step * i. As the inversion is subject to rounding, the points at both
+    ends are then checked against their computed latitude.
+
+    Parameters
+    ----------
+    n_points : int
+        Number of generated points
+    lat_min : float
+        Southern bound in degrees
+    lat_max : float
+        Northern bound in degrees
+    equatorial_radius : float
+        Earth's radius on the equator in meters (default taken from WGS-84 system)
+    polar_radius : float
+        Earth's polar radius in meters (default taken from WGS-84 system)
+
+    Returns
+    -------
+    tuple
+        (start, stop) of the index range
+    """
+    check_bbox((-180, lat_min, 180, lat_max))
+    radii = (equatorial_radius, polar_radius)
+
+    start = _clamp(_index_at(lat_max, n_points, radii, ceil), n_points)
+    stop = _clamp(_index_at(lat_min, n_points, radii, floor) + 1, n_points)
+    while start > 0 and _latitude_at(start - 1, n_points, radii) <= lat_max:
+        start -= 1
+    while start < n_points and _latitude_at(start, n_points, radii) > lat_max:
+        start += 1
+    while stop < n_points and _latitude_at(stop, n_points, radii) >= lat_min:
+        stop += 1
+    while stop > start and _latitude_at(stop - 1, n_points, radii) < lat_min:
+        stop -= 1
+
+    return start, max(start, stop)
+
+
+def region_indices(n_points, bbox, equatorial_radius=6378137.0, polar_radius=6356752.3,
+                   start=0, stop=None, chunk_size=coord_utils.DEFAULT_CHUNK_SIZE):
+    """
+    Finds the indices of the points within a longitude/latitude bounding box. Only the index
+    range of the box's latitude band is visited (see `latitude_index_range`), so the cost scales
+    with the share of the globe covered by the band rather than with `n_points`.
+
+    The longitude of point i is its spiral angle golden_angle * i, which is not changed by the
+    projection onto the ellipsoid. The points of the band are therefore filtered by longitude
+    without computing their coordinates.
+
+    Parameters
+    ----------
+    n_points : int
+        Number of generated points
+    bbox : tuple
+        (lon_min, lat_min, lon_max, lat_max) in degrees. Boxes crossing the antimeridian have
+        lon_min > lon_max.
+    equatorial_radius : float
+        Earth's radius on the equator in meters (default taken from WGS-84 system)
+    polar_radius : float
+        Earth's polar radius in meters (default taken from WGS-84 system)
+    start : int
+        Index of the first point to be considered (default: 0)
+    stop : int
+        Index after the last point to be considered (default: `n_points`)
+    chunk_size : int
+        Number of points filtered at once
+
+    Returns
+    -------
+    numpy.ndarray or array.array
+        Sorted indices of the points (int64 NumPy array if NumPy is installed)
+    """
+    lon_min, lat_min, lon_max, lat_max = check_bbox(bbox)
+    start, stop = coord_utils._check_index_range(n_points, start, stop)
+    band_start, band_stop = latitude_index_range(n_points, lat_min, lat_max,
+                                                 equatorial_radius=equatorial_radius,
+                                                 polar_radius=polar_radius)
+    start, stop = max(start, band_start), min(stop, band_stop)
+    golden_angle = pi * (3 - sqrt(5))
+    lon_min, lon_max = radians(lon_min), radians(lon_max)
+    crosses_antimeridian = lon_min > lon_max
+
+    if not coord_utils.HAS_NUMPY:
+        indices = array(INT64_TYPECODE)
+        for i in range(start, stop):
+            lon = (golden_angle * i + pi) % (2 * pi) - pi
+            if crosses_antimeridian:
+                inside = lon >= lon_min or lon <= lon_max
+            else:
+                inside = lon_min <= lon <= lon_max
+            if inside:
+                indices.append(i)
+        return indices
+
+    np = coord_utils.np
+    chunks = [np.empty(0, dtype=np.int64)]
+    for chunk_start in range(start, stop, chunk_size):
+        indices = np.arange(chunk_start, min(chunk_start + chunk_size, stop))
+        lons = np.remainder(golden_angle * indices + pi, 2 * pi) - pi
+        if crosses_antimeridian:
+            chunks.append(indices[(lons >= lon_min) | (lons <= lon_max)])
+        else:
+            chunks.append(indices[(lons >= lon_min) & (lons <= lon_max)])
+
+    return np.concatenate(chunks)
+
+
+def check_bbox(bbox):
+    """
+    Validates a longitude/latitude bounding box
+
+    Parameters
+    ----------
+    bbox : tuple
+        (lon_min, lat_min, lon_max, lat_max) in degrees
+
+    Returns
+    -------
+    tuple
+        The bounding box as floats
+    """
+    if len(bbox) != 4:
+        raise ValueError('The bounding box must hold (lon_min, lat_min, lon_max, lat_max)')
+    lon_min, lat_min, lon_max, lat_max = [float(value) for value in bbox]
+    if not (-180 <= lon_min <= 180 and -180 <= lon_max <= 180):
+        raise ValueError('Longitudes must be within [-180, 180]')
+    if not -90 <= lat_min <= lat_max <= 90:
+        raise ValueError('Latitudes must be within [-90, 90], with `lat_min` <= `lat_max`')
+
+    return lon_min, lat_min, lon_max, lat_max
+
+
+def _index_at(lat, n_points, radii, rounding):
+    """Rounded (fractional) index at which the spiral passes a geodetic latitude"""
+    z_first, z_step = coord_utils._spiral_z_params(n_points)
+    z = lookup._geodetic_to_sphere(0, lat, radii[0], radii[1])[2]
+
+    return int(rounding((z - z_first) / z_step))
+
+
+def _latitude_at(index, n_points, radii):
+    """Geodetic latitude of a single point, as computed by `EquidistantPoints.point_at`"""
+    cartesian = coord_utils.generate_points(n_points, index, index + 1)
+
+    return coord_utils.convert_points(cartesian, 'cartesian', 'geodetic', radii[0], radii[1],
+                                      coord_utils.ROTATION_AXIS)[0][1]
+
+
+def _clamp(index, n_points):
+    """Limits an index to [0, n_points]"""
+    return min(max(index, 0), n_points)
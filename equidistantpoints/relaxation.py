@@ -0,0 +1,197 @@
+"""Optional relaxation of the generated points towards more uniform nearest-neighbor distances"""
+from __future__ import division
+import time
+
+from . import coord_utils
+from .neighbors import NeighborGraph
+
+CHUNK_SIZE = 8192
+REST_LENGTH = 1.03
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+
+class RelaxationReport(object):
+    """Outcome of `relax`: the nearest-neighbor deviation of every iteration and the time spent.
+
+       The deviation is the largest relative deviation of a nearest-neighbor distance from their
+       mean, max(mean - min, max - mean) / mean (the 'max_deviation' of
+       `metrics.nearest_neighbor_stats`).
+       `history` holds one (iteration, seconds, deviation) tuple per evaluated state, starting
+       with the unrelaxed lattice at iteration 0, so that the improvement can be weighed against
+       the time it took. The relaxed points are those of the `best_iteration`."""
+    def __init__(self, history, best_iteration, setup_seconds):
+        """
+        Parameters
+        ----------
+        history : list
+            (iteration, seconds, deviation) of every evaluated state
+        best_iteration : int
+            Iteration of the state with the lowest deviation
+        setup_seconds : float
+            Time spent building the neighbor graph, included in the seconds of `history`
+        """
+        self.history = history
+        self.best_iteration = best_iteration
+        self.setup_seconds = setup_seconds
+
+    @property
+    def initial_deviation(self):
+        """Deviation of the unrelaxed lattice"""
+        return self.history[0][2]
+
+    @property
+    def final_deviation(self):
+        """Deviation of the relaxed points"""
+        return self.history[self.best_iteration][2]
+
+    @property
+    def improvement(self):
+        """Relative reduction of the deviation, between 0 and 1"""
+        return 1 - self.final_deviation / self.initial_deviation
+
+    @property
+    def iterations(self):
+        """Number of relaxation steps taken"""
+        return self.history[-1][0]
+
+    @property
+    def seconds(self):
+        """Total time spent, including the neighbor graph"""
+        return self.history[-1][1]
+
+    def summary(self):
+        """
+        Returns
+        -------
+        str
+            Table of the deviation against the time spent, one row per iteration
+        """
+        lines = ['{:>9}{:>10}{:>11}'.format('iteration', 'seconds', 'deviation')]
+        for iteration, seconds, deviation in self.history:
+            lines.append('{:>9}{:>10.3f}{:>10.3f}%{}'.format(
+                iteration, seconds, 100 * deviation,
+                ' *' if iteration == self.best_iteration else ''))
+        lines.append('deviation {:.3f}% -> {:.3f}% ({:.1f}% lower) in {:.3f} s'.format(
+            100 * self.initial_deviation, 100 * self.final_deviation, 100 * self.improvement,
+            self.seconds))
+
+        return '\n'.join(lines)
+
+
+def relax(points, target_deviation=None, max_iterations=20, max_seconds=None, k=6, step=0.2):
+    """
+    Relaxes the points by neighbor-local repulsion, starting from the Fibonacci lattice.
+
+    The points are moved as unit normal vectors of the ellipsoid (ECEF coordinates), which is
+    where `metrics.nearest_neighbor_stats` measures them. Every point is pushed away from those
+    of its k nearest neighbors that are closer than slightly more than the mean nearest-neighbor
+    distance, along the tangent plane, and renormalized. The neighbors are taken from the
+    neighbor graph (see `NeighborGraph.build`), built once in O(n_points * k), as the points
+    move by a fraction of their spacing. Each iteration is a vectorized O(n_points * k) pass.
+
+    Relaxation stops once the deviation reaches `target_deviation`, after `max_iterations` or
+    once `max_seconds` have elapsed, whichever comes first. The state with the lowest deviation
+    is returned, so the result is never worse than the lattice.
+
+    Parameters
+    ----------
+    points : EquidistantPoints
+        The generated points (must cover the full lattice). Their ECEF coordinates are computed
+        if needed.
+    target_deviation : float
+        Deviation at which to stop, e.g. 0.03 for 3% (default: run all iterations)
+    max_iterations : int
+        Maximum number of relaxation steps
+    max_seconds : float
+        Time budget, checked after every iteration (default: unlimited)
+    k : int
+        Number of neighbors each point is repelled from
+    step : float
+        Fraction of the overlap with the rest length by which points are moved per iteration
+
+    Returns
+    -------
+    tuple
+        (ecef, report): the relaxed ECEF coordinates as a NumPy array of shape (n, 3) and a
+        `RelaxationReport`
+    """
+    coord_utils._require_numpy()
+    if len(points) != points.n_points:
+        raise ValueError('Relaxation is only supported on the full lattice')
+    if max_iterations < 0:
+        raise ValueError('`max_iterations` must not be negative')
+    if not 0 < step <= 1:
+        raise ValueError('`step` must be within (0, 1]')
+
+    np = coord_utils.np
+    start = _timer()
+    neighbors = NeighborGraph.build(points, k=k).indices.reshape(-1, k)
+    unit_vectors = np.array(points.ecef, dtype=np.float64)
+    setup_seconds = _timer() - start
+
+    history, best = [], (None, 0, None)
+    for iteration in range(max_iterations + 1):
+        nearest = _nearest_chords(unit_vectors, neighbors)
+        distances = 2 * np.arcsin(np.minimum(nearest / 2, 1.0))
+        mean = distances.mean()
+        deviation = float(max(mean - distances.min(), distances.max() - mean) / mean)
+        history.append((iteration, _timer() - start, deviation))
+        if best[0] is None or deviation < best[0]:
+            best = (deviation, iteration, unit_vectors)
+
+        if target_deviation is not None and deviation <= target_deviation or \
+                iteration == max_iterations or \
+                max_seconds is not None and _timer() - start >= max_seconds:
+            break
+        unit_vectors = _repel(unit_vectors, neighbors, REST_LENGTH * nearest.mean(), step)
+
+    return best[2], RelaxationReport(history, best[1], setup_seconds)
+
+
+def _nearest_chords(unit_vectors, neighbors):
+    """Chord length from every point to the nearest of its neighbors"""
+    np = coord_utils.np
+    nearest = np.empty(len(unit_vectors))
+    for start in range(0, len(unit_vectors), CHUNK_SIZE):
+        stop = start + CHUNK_SIZE
+        differences = unit_vectors[start:stop, np.newaxis, :] - unit_vectors[neighbors[start:stop]]
+        nearest[start:stop] = np.sqrt((differences ** 2).sum(axis=2).min(axis=1))
+
+    return nearest
+
+
+def _repel(unit_vectors, neighbors, rest_length, step):
+    """
+    One relaxation step: moves every point away from its neighbors closer than `rest_length`
+
+    Parameters
+    ----------
+    unit_vectors : numpy.ndarray
+        Unit vectors of all points
+    neighbors : numpy.ndarray
+        Neighbor indices of all points, of shape (n, k)
+    rest_length : float
+        Chord length below which neighbors repel each other
+    step : float
+        Fraction of the overlap by which points are moved
+
+    Returns
+    -------
+    numpy.ndarray
+        The moved unit vectors
+    """
+    np = coord_utils.np
+    moved = np.empty_like(unit_vectors)
+    for start in range(0, len(unit_vectors), CHUNK_SIZE):
+        stop = start + CHUNK_SIZE
+        points = unit_vectors[start:stop]
+        differences = points[:, np.newaxis, :] - unit_vectors[neighbors[start:stop]]
+        chords = np.sqrt((differences ** 2).sum(axis=2))
+        overlap = np.maximum(rest_length / np.maximum(chords, 1e-300) - 1, 0)
+        force = (differences * overlap[:, :, np.newaxis]).sum(axis=1)
+        force -= (force * points).sum(axis=1)[:, np.newaxis] * points
+        moved[start:stop] = points + step * force
+    moved /= np.sqrt((moved ** 2).sum(axis=1))[:, np.newaxis]
+
+    return moved
@@ -0,0 +1,336 @@
+"""Local lookup service answering batched nearest-point and k-nearest-neighbor requests over HTTP,
+on a TCP port or a Unix socket"""
+from __future__ import division
+import json
+import math
+import numbers
+from collections import OrderedDict, deque
+
+try:
+    import asyncio
+except ImportError:  # Python 2
+    asyncio = None
+
+MAX_HEADER_SIZE = 2 ** 16
+MAX_BODY_SIZE = 2 ** 24
+ROUTES = {'/nearest': 'POST', '/knn': 'POST', '/info': 'GET'}
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class LookupService(object):
+    """Serves nearest-point and k-nearest-neighbor lookups of one lattice to local clients.
+
+       The lattice and its spatial index are built (or loaded) once. Clients send HTTP/1.1
+       requests with JSON bodies, over keep-alive connections to a TCP port or a Unix socket:
+
+       - `POST /nearest` with `{"points": [[lon, lat], ...]}` returns `{"indices": [...]}`
+       - `POST /knn` with `{"points": [[lon, lat], ...], "k": 8}` returns
+         `{"indices": [[...], ...], "distances": [[...], ...]}` (meters, sorted by distance)
+       - `GET /info` returns the lattice parameters and the number of queries and batches
+
+       Concurrent requests are batched: every request adds its queries to a pending batch,
+       which is answered once per iteration of the event loop, after all requests that arrived
+       together were parsed. Nearest-point lookups of a batch take a single vectorized call
+       (see `lookup.nearest_indices`), k-nearest-neighbor queries one `SpatialIndex.knn` call
+       per k. The batch is flushed with `loop.call_soon` rather than a timer, so batching adds
+       no latency. Requires asyncio (Python 3.4+)."""
+    def __init__(self, points, loop=None):
+        """
+        Parameters
+        ----------
+        points : EquidistantPoints
+            The full lattice. Its spatial index is built (see `EquidistantPoints.build_index`)
+            unless built before.
+        loop : asyncio.AbstractEventLoop
+            Event loop running the service (default: a new event loop)
+        """
+        if asyncio is None:
+            raise ImportError('The lookup service requires asyncio (Python 3.4+)')
+
+        self.points = points
+        self.index = points.build_index()
+        self.loop = loop or asyncio.new_event_loop()
+        self.server = None
+        self.queries = 0
+        self.batches = 0
+        self.__pending = []
+
+    def start(self, host='127.0.0.1', port=8000, path=None):
+        """
+        Starts listening, without serving requests until the loop runs (see `serve_forever`)
+
+        Parameters
+        ----------
+        host : str
+            Host to listen on (default: localhost only)
+        port : int
+            TCP port to listen on (0 picks a free one, see `address`)
+        path : str
+            Path of a Unix socket to listen on instead of a TCP port
+        """
+        if path is not None:
+            server = self.loop.create_unix_server(lambda: _HTTPProtocol(self), path)
+        else:
+            server = self.loop.create_server(lambda: _HTTPProtocol(self), host, port)
+        self.server = self.loop.run_until_complete(server)
+
+    @property
+    def address(self):
+        """(host, port) of the TCP socket, or path of the Unix socket, the service listens on"""
+        if self.server is None:
+            return None
+        name = self.server.sockets[0].getsockname()
+        return name if isinstance(name, str) else tuple(name[:2])
+
+    def serve_forever(self):
+        """Runs the event loop until `stop` is called"""
+        self.loop.run_forever()
+
+    def stop(self):
+        """Stops `serve_forever`, safe to call from any thread"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def close(self):
+        """Closes the listening socket and the event loop (after `serve_forever` returned)"""
+        if self.server is not None:
+            self.server.close()
+            self.loop.run_until_complete(self.server.wait_closed())
+            self.server = None
+        self.loop.close()
+
+    def submit(self, kind, queries, k, callback):
+        """
+        Adds queries to the pending batch, which is answered on the next iteration of the loop
+
+        Parameters
+        ----------
+        kind : str
+            'nearest' or 'knn'
+        queries : list
+            Geodetic [longitude, latitude] coordinates in degrees
+        k : int
+            Number of neighbors of k-nearest-neighbor queries
+        callback : callable
+            Called with the result, or with the exception if the batch failed. Nearest-point
+            results are lists of indices, k-nearest-neighbor results (indices, distances).
+        """
+        if not self.__pending:
+            self.loop.call_soon(self.__flush)
+        self.__pending.append((kind, k, queries, callback))
+
+    def __flush(self):
+        """Answers the pending batch, one lookup per kind of query (and k)"""
+        pending, self.__pending = self.__pending, []
+        self.batches += 1
+
+        groups = OrderedDict()
+        for kind, k, queries, callback in pending:
+            groups.setdefault((kind, k), []).append((queries, callback))
+        for (kind, k), requests in groups.items():
+            queries = [query for request_queries, _ in requests for query in request_queries]
+            self.queries += len(queries)
+            try:
+                results = self.__lookup(kind, queries, k)
+            except Exception as e:
+                for _, callback in requests:
+                    callback(e)
+                continue
+
+            offset = 0
+            for request_queries, callback in requests:
+                stop = offset + len(request_queries)
+                if kind == 'nearest':
+                    callback(results[offset:stop])
+                else:
+                    callback((results[0][offset:stop], results[1][offset:stop]))
+                offset = stop
+
+    def __lookup(self, kind, queries, k):
+        """Answers the queries of a batch, as lists (see `submit`)"""
+        if kind == 'nearest':
+            indices = self.points.nearest_indices([lon for lon, _ in queries],
+                                                  [lat for _, lat in queries])
+            return _to_list(indices)
+
+        indices, distances = self.index.knn(queries, k)
+        return _to_list(indices), _to_list(distances)
+
+    def info(self):
+        """
+        Returns
+        -------
+        dict
+            The lattice parameters and the number of queries and batches answered so far
+        """
+        return {'n_points': self.points.n_points,
+                'equatorial_radius': self.points.equatorial_radius,
+                'polar_radius': self.points.polar_radius,
+                'queries': self.queries, 'batches': self.batches}
+
+
+def parse_query(body, n_points, with_k=False):
+    """
+    Parses and validates the JSON body of a lookup request
+
+    Parameters
+    ----------
+    body : bytes
+        `{"points": [[lon, lat], ...]}`, plus `"k"` for k-nearest-neighbor requests
+    n_points : int
+        Number of points of the lattice, the largest valid k
+    with_k : bool
+        Whether the request must hold k
+
+    Returns
+    -------
+    tuple
+        (queries as a list of [lon, lat] floats, k or None)
+    """
+    try:
+        data = json.loads(body.decode('utf-8'))
+    except (UnicodeDecodeError, ValueError):
+        raise ValueError('The request body must be a JSON object')
+    if not isinstance(data, dict) or not isinstance(data.get('points'), list):
+        raise ValueError('The request body must hold a list of [lon, lat] `points`')
+
+    queries = []
+    for point in data['points']:
+        if not isinstance(point, list) or len(point) != 2 or \
+                not all(_is_number(value) for value in point):
+            raise ValueError('Points must be [lon, lat] pairs of finite numbers')
+        lon, lat = float(point[0]), float(point[1])
+        if not -90 <= lat <= 90:
+            raise ValueError('Latitudes must be within [-90, 90]')
+        queries.append([lon, lat])
+
+    k = data.get('k')
+    if with_k and (not _is_number(k) or k != int(k) or not 1 <= k <= n_points):
+        raise ValueError('`k` must be an integer within [1, {}]'.format(n_points))
+
+    return queries, int(k) if with_k else None
+
+
+def _is_number(value):
+    """Whether a parsed JSON value is a finite number (booleans excluded)"""
+    return isinstance(value, numbers.Real) and not isinstance(value, bool) and \
+        not math.isinf(value) and not math.isnan(value)
+
+
+def _to_list(values):
+    """Plain list of a NumPy array or a list"""
+    return values.tolist() if hasattr(values, 'tolist') else list(values)
+
+
+class _HTTPProtocol(asyncio.Protocol if asyncio is not None else object):
+    """Minimal HTTP/1.1 connection: parses requests as they arrive, submits their queries
+       to the service and writes the responses in request order (so pipelining works)"""
+    def __init__(self, service):
+        self.service = service
+        self.transport = None
+        self.buffer = bytearray()
+        self.responses = deque()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self.transport = None
+
+    def data_received(self, data):
+        self.buffer.extend(data)
+        while self.transport is not None:
+            request = self.__next_request()
+            if request is None:
+                break
+            self.__handle(*request)
+
+    def __next_request(self):
+        """Removes the next complete request from the buffer, if any"""
+        header_end = self.buffer.find(b'\r\n\r\n')
+        if header_end < 0:
+            if len(self.buffer) > MAX_HEADER_SIZE:
+                self.__reject(413, 'Request header too large')
+            return None
+
+        lines = bytes(self.buffer[:header_end]).decode('latin1').split('\r\n')
+        parts = lines[0].split()
+        headers = dict((name.strip().lower(), value.strip()) for name, _, value in
+                       (line.partition(':') for line in lines[1:]))
+        if len(parts) != 3 or 'transfer-encoding' in headers:
+            self.__reject(400, 'Malformed request or unsupported transfer encoding')
+            return None
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_BODY_SIZE:
+            self.__reject(413 if length > 0 else 400, 'Invalid request body length')
+            return None
+
+        body_start = header_end + 4
+        if len(self.buffer) < body_start + length:
+            return None
+        body = bytes(self.buffer[body_start:body_start + length])
+        del self.buffer[:body_start + length]
+
+        method, target, version = parts
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else \
+            connection == 'keep-alive'
+        return method, target.split('?', 1)[0], body, keep_alive
+
+    def __handle(self, method, path, body, keep_alive):
+        """Answers a request, or submits its queries to the service"""
+        slot = [None, keep_alive]
+        self.responses.append(slot)
+
+        if path not in ROUTES:
+            self.__complete(slot, 404, {'error': 'Unknown path `{}`'.format(path)})
+            return
+        if method != ROUTES[path]:
+            self.__complete(slot, 405, {'error': 'Use {} {}'.format(ROUTES[path], path)})
+            return
+        if path == '/info':
+            self.__complete(slot, 200, self.service.info())
+            return
+
+        kind = path[1:]
+        try:
+            queries, k = parse_query(body, self.service.points.n_points, kind == 'knn')
+        except ValueError as e:
+            self.__complete(slot, 400, {'error': str(e)})
+            return
+
+        def answer(result):
+            if isinstance(result, Exception):
+                self.__complete(slot, 500, {'error': str(result)})
+            elif kind == 'nearest':
+                self.__complete(slot, 200, {'indices': result})
+            else:
+                self.__complete(slot, 200, {'indices': result[0], 'distances': result[1]})
+        self.service.submit(kind, queries, k, answer)
+
+    def __complete(self, slot, status, payload):
+        """Fills in a response and writes all responses that are complete, in order"""
+        body = json.dumps(payload).encode('utf-8')
+        slot[0] = ('HTTP/1.1 {} {}\r\nContent-Type: application/json\r\n'
+                   'Content-Length: {}\r\n{}\r\n'.format(
+                       status, REASONS[status], len(body),
+                       '' if slot[1] else 'Connection: close\r\n').encode('latin1') + body)
+
+        while self.responses and self.responses[0][0] is not None:
+            response, keep_alive = self.responses.popleft()
+            if self.transport is None:
+                continue
+            self.transport.write(response)
+            if not keep_alive:
+                self.transport.close()
+                self.transport = None
+
+    def __reject(self, status, message):
+        """Answers a malformed request and closes the connection"""
+        del self.buffer[:]
+        slot = [None, False]
+        self.responses.append(slot)
+        self.__complete(slot, status, {'error': message})
@@ -0,0 +1,247 @@
+"""Spatial index over generated points for k-nearest-neighbor and radius queries"""
+from __future__ import division
+from array import array
+from bisect import bisect_left, bisect_right
+from math import sqrt, asin, atan2, radians, pi, cos, sin, floor, ceil, degrees
+
+from . import coord_utils, lookup
+from .coord_array import INT64_TYPECODE
+
+EPSILON = 1e-12
+
+
+class SpatialIndex(object):
+    """Latitude-band index over the unit normal vectors (ECEF coordinates) of generated points.
+
+       The spiral's z coordinate decreases monotonically with the point index, so every latitude
+       band is a contiguous index range that is found analytically. Within each band the points
+       are sorted by longitude. A query for all points within a great-circle radius therefore
+       only visits the bands overlapping the radius, and binary-searches their longitude window.
+
+       Distances are great-circle distances between the points' geodetic coordinates, on a
+       sphere with the ellipsoid's mean radius (2 * equatorial + polar) / 3."""
+    def __init__(self, points, band_size=None):
+        """
+        Parameters
+        ----------
+        points : EquidistantPoints
+            The generated points (must cover the full lattice). Their ECEF coordinates are
+            computed and cached if needed.
+        band_size : int
+            Number of points per latitude band (default: 2 * sqrt(n_points))
+        """
+        if len(points) != points.n_points:
+            raise ValueError('Spatial indexes are only supported on the full lattice')
+
+        self.n_points = points.n_points
+        self.equatorial_radius = points.equatorial_radius
+        self.polar_radius = points.polar_radius
+        self.mean_radius = (2 * points.equatorial_radius + points.polar_radius) / 3
+        self.band_size = band_size or max(1, int(2 * sqrt(self.n_points)))
+        self.unit_vectors = points.ecef
+
+        if coord_utils.HAS_NUMPY:
+            np = coord_utils.np
+            lons = np.arctan2(self.unit_vectors[:, 1], self.unit_vectors[:, 0])
+            bands = np.arange(self.n_points) // self.band_size
+            self.order = np.lexsort((lons, bands))
+            self.sorted_lons = lons[self.order]
+        else:
+            lons = [atan2(y, x) for x, y, _ in self.unit_vectors]
+            self.order = array(INT64_TYPECODE)
+            for start in range(0, self.n_points, self.band_size):
+                stop = min(start + self.band_size, self.n_points)
+                self.order.extend(sorted(range(start, stop), key=lons.__getitem__))
+            self.sorted_lons = array('d', [lons[i] for i in self.order])
+
+    def knn(self, queries, k):
+        """
+        Finds the k nearest points of each query coordinate
+
+        Parameters
+        ----------
+        queries : iterable
+            Geodetic [longitude, latitude] coordinates in degrees
+        k : int
+            Number of neighbors
+
+        Returns
+        -------
+        tuple
+            (indices, distances in meters), each of shape (len(queries), k) and sorted by
+            distance. NumPy arrays if NumPy is installed, otherwise lists of lists.
+        """
+        if not 1 <= k <= self.n_points:
+            raise ValueError('`k` must be within [1, n_points]')
+
+        all_indices, all_distances = [], []
+        for lon, lat in queries:
+            angle = 2 * sqrt(k / self.n_points)
+            while True:
+                indices, angles = self.__within(lon, lat, angle)
+                if len(indices) >= k or angle >= pi:
+                    break
+                angle *= 2
+            all_indices.append(indices[:k])
+            all_distances.append(self.__to_meters(angles[:k]))
+
+        if coord_utils.HAS_NUMPY:
+            np = coord_utils.np
+            return (np.array(all_indices, dtype=np.int64).reshape(-1, k),
+                    np.array(all_distances, dtype=np.float64).reshape(-1, k))
+        return all_indices, all_distances
+
+    def within(self, queries, radius_m):
+        """
+        Finds all points within a great-circle radius of each query coordinate
+
+        Parameters
+        ----------
+        queries : iterable
+            Geodetic [longitude, latitude] coordinates in degrees
+        radius_m : float
+            Radius in meters
+
+        Returns
+        -------
+        tuple
+            (indices, distances in meters), one entry per query sorted by distance. The entries
+            are NumPy arrays if NumPy is installed, otherwise lists.
+        """
+        if radius_m < 0:
+            raise ValueError('`radius_m` must not be negative')
+
+        angle = radius_m / self.mean_radius
+        all_indices, all_distances = [], []
+        for lon, lat in queries:
+            indices, angles = self.__within(lon, lat, angle)
+            all_indices.append(indices)
+            all_distances.append(self.__to_meters(angles))
+
+        return all_indices, all_distances
+
+    def __within(self, lon, lat, angle):
+        """
+        Finds all points within `angle` of a coordinate
+
+        Parameters
+        ----------
+        lon : float
+            Longitude in degrees
+        lat : float
+            Latitude in degrees
+        angle : float
+            Angular radius in radians
+
+        Returns
+        -------
+        tuple
+            (indices, angles in radians) sorted by angle
+        """
+        if not -90 <= lat <= 90:
+            raise ValueError('`lat` must be within [-90, 90]')
+
+        lon_rad, lat_rad = radians(lon), radians(lat)
+        query = lookup._geodetic_to_n_vector(lon, lat)
+        candidates = self.__candidates(lon_rad, lat_rad, angle)
+
+        if coord_utils.HAS_NUMPY:
+            np = coord_utils.np
+            vectors = self.unit_vectors[candidates]
+            chords = np.sqrt(((vectors - query) ** 2).sum(axis=1))
+            angles = 2 * np.arcsin(np.minimum(chords / 2, 1.0))
+            inside = angles <= angle
+            candidates, angles = candidates[inside], angles[inside]
+            ranking = np.lexsort((candidates, angles))
+            return candidates[ranking], angles[ranking]
+
+        found = []
+        for i in candidates:
+            chord = sqrt(sum((a - b) ** 2 for a, b in zip(self.unit_vectors[i], query)))
+            distance = 2 * asin(min(chord / 2, 1.0))
+            if distance <= angle:
+                found.append((distance, i))
+        found.sort()
+        return [i for _, i in found], [d for d, _ in found]
+
+    def __candidates(self, lon_rad, lat_rad, angle):
+        """
+        Collects the indices of all points in the latitude bands and longitude window that
+        contain the spherical cap of `angle` around the coordinate
+
+        Parameters
+        ----------
+        lon_rad : float
+            Longitude in radians
+        lat_rad : float
+            Latitude in radians
+        angle : float
+            Angular radius in radians
+
+        Returns
+        -------
+        numpy.ndarray or list
+            Candidate indices
+        """
+        start = self.__index_at(min(lat_rad + angle, pi / 2), floor) - 1
+        stop = self.__index_at(max(lat_rad - angle, -pi / 2), ceil) + 2
+        start, stop = max(0, start), min(self.n_points, stop)
+
+        if abs(lat_rad) + angle >= pi / 2 - EPSILON or angle >= pi / 2:
+            windows = [(-pi - 1, pi + 1)]
+        else:
+            half_width = asin(min(sin(angle) / cos(lat_rad), 1.0)) + EPSILON
+            low, high = lon_rad - half_width, lon_rad + half_width
+            windows = [(max(low, -pi - 1), min(high, pi + 1))]
+            if low < -pi:
+                windows.append((low + 2 * pi, pi + 1))
+            if high > pi:
+                windows.append((-pi - 1, high - 2 * pi))
+
+        band_starts = range(start - start % self.band_size, stop, self.band_size)
+
+        if coord_utils.HAS_NUMPY:
+            np = coord_utils.np
+            slices = []
+            for band_start in band_starts:
+                band_lons = self.sorted_lons[band_start:band_start + self.band_size]
+                for low, high in windows:
+                    first = band_start + np.searchsorted(band_lons, low, 'left')
+                    last = band_start + np.searchsorted(band_lons, high, 'right')
+                    slices.append(self.order[first:last])
+            candidates = np.concatenate(slices or [np.empty(0, dtype=np.int64)])
+            return candidates[(candidates >= start) & (candidates < stop)]
+
+        candidates = []
+        for band_start in band_starts:
+            band_stop = min(band_start + self.band_size, self.n_points)
+            for low, high in windows:
+                first = bisect_left(self.sorted_lons, low, band_start, band_stop)
+                last = bisect_right(self.sorted_lons, high, band_start, band_stop)
+                candidates.extend(i for i in self.order[first:last] if start <= i < stop)
+        return candidates
+
+    def __to_meters(self, angles):
+        """Converts angles in radians to great-circle distances in meters"""
+        if coord_utils.HAS_NUMPY:
+            return angles * self.mean_radius
+        return [a * self.mean_radius for a in angles]
+
+    def __index_at(self, lat_rad, rounding):
+        """
+        Finds the (fractional) point index at which the spiral passes a geodetic latitude
+
+        Parameters
+        ----------
+        lat_rad : float
+            Latitude in radians
+        rounding : callable
+            Rounding function applied to the fractional index
+
+        Returns
+        -------
+        int
+        """
+        z = lookup._geodetic_to_sphere(0, degrees(lat_rad), self.equatorial_radius,
+                                       self.polar_radius)[2]
+        return int(rounding((1 - 1 / self.n_points - z) * self.n_points / 2))
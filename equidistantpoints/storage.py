@@ -0,0 +1,450 @@
+"""Coordinate file formats: CSV with optional compression, and binary files that can be
+memory-mapped without copying"""
+from __future__ import division
+import ast
+import bz2
+import gzip
+import struct
+import sys
+from array import array
+from itertools import chain
+from mmap import mmap as map_file, ACCESS_READ
+
+from . import coord_utils
+from .coord_array import CoordinateArray, extend_from_bytes, to_bytes
+from .coord_utils import COORD_TYPES, COORD_WIDTHS, DTYPES
+
+try:
+    import lzma
+except ImportError:  # Python 2
+    lzma = None
+
+FILE_FORMATS = ('binary', 'npy')
+TEXT_FORMATS = ('csv', 'tsv', 'ndjson')
+BINARY_MAGIC = b'EDPC'
+BINARY_VERSION = 2
+BINARY_HEADER = struct.Struct('<4sIIIQQQddI')
+BINARY_DTYPES = ('float64', 'float32')  # Version 1 headers are zero-padded, i.e. float64
+NPY_DESCRS = {'float64': '<f8', 'float32': '<f4'}
+ITEM_SIZES = {'float64': 8, 'float32': 4}
+HEADER_SIZE = 64
+NPY_MAGIC = b'\x93NUMPY'
+COMPRESSIONS = {'.gz': gzip, '.bz2': bz2, '.xz': lzma}
+COMPRESSION_LEVEL = 6
+GEOJSON_TYPES = ('multipoint', 'features', 'seq')
+
+
+def open_output(file_path):
+    """
+    Opens a file for writing in binary mode, compressed with gzip, bzip2 or xz (at level
+    `COMPRESSION_LEVEL`) if its name ends with `.gz`, `.bz2` or `.xz`
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the output file, '-' for stdout (which is left open)
+
+    Returns
+    -------
+    file
+    """
+    if file_path == '-':
+        return NonClosing(getattr(sys.stdout, 'buffer', sys.stdout))
+
+    extension = next((ext for ext in COMPRESSIONS if file_path.endswith(ext)), None)
+    if extension is None:
+        return open(file_path, 'wb')
+
+    module = COMPRESSIONS[extension]
+    if module is None:
+        raise ValueError('Compression `{}` is not supported by this Python version'.format(
+            extension))
+    if module is lzma:
+        return lzma.open(file_path, 'wb', preset=COMPRESSION_LEVEL)
+    if module is bz2:  # bz2.open requires Python 3.3+
+        return bz2.BZ2File(file_path, 'wb', compresslevel=COMPRESSION_LEVEL)
+    return gzip.open(file_path, 'wb', compresslevel=COMPRESSION_LEVEL)
+
+
+def format_rows(chunk, precision=None, start_index=None, delimiter=',', line_terminator='\r\n',
+                indices=None, dtype='float64'):
+    """
+    Formats a chunk of coordinates as delimited text with a single string operation
+
+    Parameters
+    ----------
+    chunk : numpy.ndarray, CoordinateArray or list
+        Coordinates to be formatted
+    precision : int
+        Number of decimal places (default: shortest representation that round-trips)
+    start_index : int
+        Lattice index of the first coordinate. If given, every row starts with its index.
+    delimiter : str
+        Column delimiter
+    line_terminator : str
+        Row terminator (default: CRLF as written by the `csv` module)
+    indices : sequence
+        Lattice indices of the coordinates if they are not consecutive, used instead of
+        `start_index`
+    dtype : str
+        Precision of the coordinates ('float64' | 'float32'), see `_value_format`
+
+    Returns
+    -------
+    str
+    """
+    rows = chunk.tolist() if hasattr(chunk, 'tolist') else chunk
+    if not len(rows):
+        return ''
+
+    value_format = _value_format(precision, dtype)
+    row_format = delimiter.join([value_format] * len(rows[0]))
+    indices = _chunk_indices(len(rows), start_index, indices)
+    if indices is not None:
+        row_format = '%d' + delimiter + row_format
+
+    return _format_chunk(rows, row_format + line_terminator, indices)
+
+
+def format_ndjson(chunk, names, precision=None, start_index=None, indices=None,
+                  dtype='float64'):
+    """
+    Formats a chunk of coordinates as newline-delimited JSON objects, e.g.
+    `{"longitude": 0.0, "latitude": 87.45}`
+
+    Parameters
+    ----------
+    chunk : numpy.ndarray, CoordinateArray or list
+        Coordinates to be formatted
+    names : list
+        Names of the coordinate components
+    precision : int
+        Number of decimal places (default: shortest representation that round-trips)
+    start_index : int
+        Lattice index of the first coordinate. If given, every object starts with its `index`.
+    indices : sequence
+        Lattice indices of the coordinates if they are not consecutive, used instead of
+        `start_index`
+    dtype : str
+        Precision of the coordinates ('float64' | 'float32'), see `_value_format`
+
+    Returns
+    -------
+    str
+    """
+    rows = chunk.tolist() if hasattr(chunk, 'tolist') else chunk
+    if not len(rows):
+        return ''
+
+    value_format = _value_format(precision, dtype)
+    fields = ['"{}": {}'.format(name, value_format) for name in names]
+    indices = _chunk_indices(len(rows), start_index, indices)
+    if indices is not None:
+        fields.insert(0, '"index": %d')
+
+    return _format_chunk(rows, '{' + ', '.join(fields) + '}\n', indices)
+
+
+def _value_format(precision, dtype='float64'):
+    """
+    %-format of a coordinate component with the given number of decimal places. Without a
+    precision, float64 values are written in their shortest representation and float32 values
+    with the 9 significant digits that round-trip them (instead of the 17 of their float64
+    representation).
+    """
+    if precision is not None:
+        return '%.{}f'.format(precision)
+
+    return '%r' if dtype == 'float64' else '%.9g'
+
+
+def _chunk_indices(count, start_index, indices):
+    """Lattice indices of the rows of a chunk: `indices` if given, else consecutive ones"""
+    if indices is None and start_index is not None:
+        return range(start_index, start_index + count)
+
+    return indices
+
+
+def _format_chunk(rows, row_format, indices):
+    """
+    Applies a %-format to all rows at once
+
+    Parameters
+    ----------
+    rows : list
+        Coordinates to be formatted
+    row_format : str
+        Format of one row, taking the index (if `indices` are given) and the components
+    indices : sequence
+        Lattice indices of the rows, or None
+    """
+    if indices is None:
+        values = tuple(chain.from_iterable(rows))
+    else:
+        values = tuple(chain.from_iterable(zip(indices, *zip(*rows))))
+
+    return (row_format * len(rows)) % values
+
+
+def binary_header(coord_type, n_points, start, count, equatorial_radius, polar_radius,
+                  dtype='float64'):
+    """
+    Header of the binary format: magic `EDPC`, format version, coordinate type and width,
+    n_points, index of the first point, number of points, the radii and the precision, padded
+    to 64 bytes so that the little-endian coordinates following it are aligned for
+    memory-mapping
+
+    Parameters
+    ----------
+    coord_type : str
+        The coordinate type of the file ('geodetic' | 'cartesian' | 'ecef')
+    n_points : int
+        Number of points of the full lattice
+    start : int
+        Index of the first point within the lattice
+    count : int
+        Number of points in the file
+    equatorial_radius : float
+        Equatorial radius the coordinates were computed with
+    polar_radius : float
+        Polar radius the coordinates were computed with
+    dtype : str
+        Precision of the coordinates ('float64' | 'float32')
+
+    Returns
+    -------
+    bytes
+    """
+    header = BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, COORD_TYPES.index(coord_type),
+                                COORD_WIDTHS[coord_type], n_points, start, count,
+                                equatorial_radius, polar_radius, BINARY_DTYPES.index(dtype))
+
+    return header.ljust(HEADER_SIZE, b'\0')
+
+
+def npy_header(count, width, dtype='float64'):
+    """
+    Header of a NumPy `.npy` file (format version 1.0) holding a C-contiguous little-endian
+    float64 or float32 array of shape (count, width)
+
+    Parameters
+    ----------
+    count : int
+        Number of coordinates
+    width : int
+        Number of components per coordinate
+    dtype : str
+        Precision of the coordinates ('float64' | 'float32')
+
+    Returns
+    -------
+    bytes
+    """
+    description = "{{'descr': '{}', 'fortran_order': False, 'shape': ({}, {}), }}".format(
+        NPY_DESCRS[dtype], count, width)
+    # Magic, version and header length take 10 bytes, the header ends with a newline
+    padding = -(10 + len(description) + 1) % HEADER_SIZE
+    description = (description + ' ' * padding + '\n').encode('latin1')
+
+    return NPY_MAGIC + b'\x01\x00' + struct.pack('<H', len(description)) + description
+
+
+def iter_geojson(chunks, geojson_type='multipoint', start_index=0, precision=None, indices=None,
+                 dtype='float64'):
+    """
+    Yields a GeoJSON document of geodetic coordinates piece by piece, one piece per chunk
+
+    Parameters
+    ----------
+    chunks : iterable
+        Chunks of [longitude, latitude] coordinates
+    geojson_type : str
+        'multipoint' for a single MultiPoint geometry, 'features' for a FeatureCollection of
+        Point features, or 'seq' for newline-delimited Point features (GeoJSONSeq). Features
+        carry the point's index as property `index`.
+    start_index : int
+        Lattice index of the first coordinate
+    precision : int
+        Number of decimal places (default: shortest representation that round-trips)
+    indices : sequence
+        Lattice indices of all coordinates if they are not consecutive, used instead of
+        `start_index`
+    dtype : str
+        Precision of the coordinates ('float64' | 'float32'), see `_value_format`
+
+    Yields
+    ------
+    str
+    """
+    if geojson_type not in GEOJSON_TYPES:
+        raise ValueError('`geojson_type` must be one of: {}'.format(', '.join(GEOJSON_TYPES)))
+
+    coordinates_format = '[{0}, {0}]'.format(_value_format(precision, dtype))
+    if geojson_type == 'multipoint':
+        item_format, separator = coordinates_format, ', '
+        prefix, suffix = '{"type": "MultiPoint", "coordinates": [', ']}'
+    else:
+        item_format = ('{"type": "Feature", "geometry": {"type": "Point", "coordinates": ' +
+                       coordinates_format + '}, "properties": {"index": %d}}')
+        if geojson_type == 'features':
+            separator = ', '
+            prefix, suffix = '{"type": "FeatureCollection", "features": [', ']}'
+        else:
+            separator, prefix, suffix = '\n', '', '\n'
+
+    yield prefix
+    offset = 0
+    for chunk in chunks:
+        rows = chunk.tolist() if hasattr(chunk, 'tolist') else chunk
+        if not len(rows):
+            continue
+        if geojson_type == 'multipoint':
+            values = tuple(chain.from_iterable(rows))
+        else:
+            if indices is None:
+                chunk_indices = range(start_index + offset, start_index + offset + len(rows))
+            else:
+                chunk_indices = indices[offset:offset + len(rows)]
+            values = tuple(chain.from_iterable(zip(*(list(zip(*rows)) + [chunk_indices]))))
+        items = separator.join([item_format] * len(rows)) % values
+        yield items if offset == 0 else separator + items
+        offset += len(rows)
+    yield suffix if offset > 0 or geojson_type != 'seq' else ''
+
+
+def write_chunks(target_file, chunks, dtype='float64'):
+    """
+    Writes coordinates as little-endian float64 or float32, row by row
+
+    Parameters
+    ----------
+    target_file : file
+        File opened in 'wb' mode
+    chunks : iterable
+        Chunks of coordinates (NumPy arrays, CoordinateArrays or lists of coordinates)
+    dtype : str
+        Precision to be written ('float64' | 'float32')
+    """
+    typecode = DTYPES[dtype]
+    for chunk in chunks:
+        if coord_utils.HAS_NUMPY:
+            target_file.write(coord_utils.np.ascontiguousarray(chunk, dtype=NPY_DESCRS[dtype])
+                              .tobytes())
+            continue
+
+        if isinstance(chunk, CoordinateArray):
+            values = array(typecode, chunk.data)
+        else:
+            values = array(typecode, [value for coord in chunk for value in coord])
+        if sys.byteorder != 'little':
+            values.byteswap()
+        target_file.write(to_bytes(values))
+
+
+def read_header(file_path):
+    """
+    Reads the header of a binary or `.npy` coordinate file
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the file
+
+    Returns
+    -------
+    dict
+        'format', 'offset' (of the coordinates in bytes), 'count', 'width' and 'dtype'. Binary
+        files also hold 'coord_type', 'n_points', 'start', 'equatorial_radius' and
+        'polar_radius'.
+    """
+    with open(file_path, 'rb') as source_file:
+        prefix = source_file.read(HEADER_SIZE)
+
+        if prefix.startswith(BINARY_MAGIC):
+            (_, version, coord_type, width, n_points, start, count, equatorial_radius,
+             polar_radius, dtype) = BINARY_HEADER.unpack(prefix[:BINARY_HEADER.size])
+            if version not in (1, BINARY_VERSION):
+                raise ValueError('Unsupported binary format version {}'.format(version))
+            return {'format': 'binary', 'offset': HEADER_SIZE, 'count': count, 'width': width,
+                    'dtype': BINARY_DTYPES[dtype], 'coord_type': COORD_TYPES[coord_type],
+                    'n_points': n_points, 'start': start,
+                    'equatorial_radius': equatorial_radius, 'polar_radius': polar_radius}
+
+        if prefix.startswith(NPY_MAGIC):
+            major = bytearray(prefix[6:7])[0]
+            if major == 1:
+                length, offset = struct.unpack('<H', prefix[8:10])[0], 10
+            else:
+                length, offset = struct.unpack('<I', prefix[8:12])[0], 12
+            source_file.seek(offset)
+            description = ast.literal_eval(source_file.read(length).decode('latin1'))
+            shape = description['shape']
+            dtypes = dict((descr, dtype) for dtype, descr in NPY_DESCRS.items())
+            if description['descr'] not in dtypes or description['fortran_order'] or \
+                    len(shape) != 2 or shape[1] not in (2, 3):
+                raise ValueError('`{}` does not hold float64 or float32 coordinates'.format(
+                    file_path))
+            return {'format': 'npy', 'offset': offset + length, 'count': shape[0],
+                    'width': shape[1], 'dtype': dtypes[description['descr']]}
+
+    raise ValueError('`{}` is neither a binary nor a .npy coordinate file'.format(file_path))
+
+
+def load_coordinates(file_path, mmap=True):
+    """
+    Loads the coordinates of a binary or `.npy` file
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the file
+    mmap : bool
+        Map the file into memory (read-only) instead of reading it. The coordinates are then
+        only read from disk when accessed.
+
+    Returns
+    -------
+    numpy.ndarray or CoordinateArray
+        Coordinates of shape (count, width) in the precision of the file: a (memory-mapped)
+        NumPy array if NumPy is installed, otherwise a CoordinateArray over the mapped file or
+        an `array.array` (always read on Python 2, whose memoryview cannot wrap the mapping)
+    """
+    header = read_header(file_path)
+    count, width, offset = header['count'], header['width'], header['offset']
+    descr, typecode = NPY_DESCRS[header['dtype']], DTYPES[header['dtype']]
+    n_bytes = ITEM_SIZES[header['dtype']] * count * width
+
+    if coord_utils.HAS_NUMPY:
+        np = coord_utils.np
+        if mmap and count:
+            return np.memmap(file_path, dtype=descr, mode='r', offset=offset,
+                             shape=(count, width))
+        with open(file_path, 'rb') as source_file:
+            source_file.seek(offset)
+            return np.fromfile(source_file, dtype=descr, count=count * width).reshape(-1, width)
+
+    with open(file_path, 'rb') as source_file:
+        if mmap and count and sys.byteorder == 'little' and hasattr(memoryview, 'cast'):
+            mapped = map_file(source_file.fileno(), 0, access=ACCESS_READ)
+            data = memoryview(mapped)[offset:offset + n_bytes].cast(typecode)
+            return CoordinateArray(width, data)
+
+        source_file.seek(offset)
+        data = array(typecode)
+        extend_from_bytes(data, source_file.read(n_bytes))
+        if sys.byteorder != 'little':
+            data.byteswap()
+        return CoordinateArray(width, data)
+
+
+class NonClosing(object):
+    """Context manager around a stream that is flushed but left open on exit, e.g. stdout"""
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __enter__(self):
+        return self.stream
+
+    def __exit__(self, *args):
+        self.stream.flush()
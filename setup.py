@@ -9,8 +9,11 @@ setup(
     description='Generates (almost) evenly distributed, equidistant points across a perfect sphere '
                 'or the globe (in cartesian, ECEF and geodetic format)',
     packages=['equidistantpoints'],
+    extras_require={
+        'numpy': ['numpy']
+    },
     entry_points={
-        'console_scripts': ['edpoints=equidistantpoints.cli:cli_generate_points']
+        'console_scripts': ['edpoints=equidistantpoints.cli:main']
     },
     download_url='https://github.com/ksbg/equidistantpoints/archive/0.2.tar.gz',
     classifiers=[
@@ -0,0 +1,83 @@
+"""Tests the bulk assignment of coordinates to their nearest points"""
+import csv
+import os
+import struct
+from math import asin, degrees
+from random import Random
+from tempfile import mkstemp
+from unittest import TestCase
+
+from equidistantpoints import EquidistantPoints, cli
+from equidistantpoints.assign import assign_file
+
+
+class TestAssign(TestCase):
+    def setUp(self):
+        random = Random(7)
+        self.coordinates = [(random.uniform(-180, 180), degrees(asin(random.uniform(-1, 1))))
+                            for _ in range(500)]
+        self.points = EquidistantPoints(1000)
+        self.expected = [self.points.nearest_index(lon, lat) for lon, lat in self.coordinates]
+
+        self.files = [path for _, path in (mkstemp() for _ in range(3))]
+        self.csv_in, self.binary_in, self.out = self.files
+        with open(self.csv_in, 'w') as f:
+            writer = csv.writer(f)
+            writer.writerow(['id', 'latitude', 'longitude'])
+            for i, (lon, lat) in enumerate(self.coordinates):
+                writer.writerow([i, repr(lat), repr(lon)])
+        with open(self.binary_in, 'wb') as f:
+            for lon, lat in self.coordinates:
+                f.write(struct.pack('<dd', lon, lat))
+
+    def tearDown(self):
+        for path in self.files:
+            os.remove(path)
+
+    def __read_csv_indices(self):
+        with open(self.out, 'r') as f:
+            reader = csv.reader(f)
+            self.assertEqual(next(reader), ['index'])
+            return [int(row[0]) for row in reader]
+
+    def __read_binary_indices(self):
+        with open(self.out, 'rb') as f:
+            data = f.read()
+        return list(struct.unpack('<{}q'.format(len(data) // 8), data))
+
+    def test_nearest_indices(self):
+        lons, lats = zip(*self.coordinates)
+        self.assertEqual(list(self.points.nearest_indices(lons, lats)), self.expected)
+
+    def test_csv_to_csv(self):
+        count = assign_file(self.points, self.csv_in, self.out, lon_column='longitude',
+                            lat_column='latitude', chunk_size=64)
+        self.assertEqual(count, 500)
+        self.assertEqual(self.__read_csv_indices(), self.expected)
+
+    def test_csv_columns_by_index(self):
+        assign_file(self.points, self.csv_in, self.out, lon_column=2, lat_column=1)
+        self.assertEqual(self.__read_csv_indices(), self.expected)
+
+    def test_binary_to_binary(self):
+        assign_file(self.points, self.binary_in, self.out, input_format='binary',
+                    output_format='binary', chunk_size=100)
+        self.assertEqual(self.__read_binary_indices(), self.expected)
+
+    def test_workers(self):
+        assign_file(self.points, self.binary_in, self.out, input_format='binary', workers=3,
+                    chunk_size=37)
+        self.assertEqual(self.__read_csv_indices(), self.expected)
+
+    def test_cli(self):
+        cli.main(['assign', '1000', self.csv_in, '-o', self.out, '--lon-column', 'longitude',
+                  '--lat-column', '1', '--workers', '2', '--chunk-size', '50'])
+        self.assertEqual(self.__read_csv_indices(), self.expected)
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, assign_file, self.points, self.csv_in, self.out,
+                          input_format='json')
+        self.assertRaises(ValueError, assign_file, self.points, self.csv_in, self.out, workers=0)
+        self.assertRaises(ValueError, assign_file, self.points, self.csv_in, self.out,
+                          lon_column='lng')
+        self.assertRaises(ValueError, assign_file, self.points[:10], self.csv_in, self.out)
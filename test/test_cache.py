@@ -0,0 +1,80 @@
+"""Tests the on-disk lattice cache"""
+import os
+import shutil
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from equidistantpoints import EquidistantPoints, LatticeCache, storage
+
+
+class TestLatticeCache(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.cache = LatticeCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        points = EquidistantPoints(1000, cache=self.cache)
+        expected = EquidistantPoints(1000).to_list('ecef')
+        self.assertEqual(points.to_list('ecef'), expected)
+        self.assertEqual(len(self.cache.entries()), 1)
+
+        cached = EquidistantPoints(1000, cache=self.cache)
+        self.assertIsNotNone(self.cache.get(cached, 'ecef'))
+        self.assertEqual(cached.to_list('ecef'), expected)
+        self.assertEqual(cached[100:200].to_list('ecef'), expected[100:200])
+        self.assertEqual(cached.to_list('geodetic'), EquidistantPoints(1000).to_list('geodetic'))
+        self.assertEqual(len(self.cache.entries()), 2)
+
+    def test_keys(self):
+        points = EquidistantPoints(1000, cache=self.cache)
+        points.ecef
+        for other in (EquidistantPoints(1001), EquidistantPoints(1000, equatorial_radius=1.0),
+                      EquidistantPoints(1000, polar_radius=1.0)):
+            self.assertNotEqual(self.cache.path(other, 'ecef'), self.cache.path(points, 'ecef'))
+            self.assertIsNone(self.cache.get(other, 'ecef'))
+        self.assertIsNone(self.cache.get(points, 'cartesian'))
+        self.assertEqual(self.cache.path(EquidistantPoints(1000, 6378137, 6356752.3), 'ecef'),
+                         self.cache.path(points, 'ecef'))
+
+    def test_slices_are_not_stored(self):
+        EquidistantPoints(1000, cache=self.cache)[:500].ecef
+        self.assertEqual(self.cache.entries(), [])
+
+    def test_invalid_entries_are_ignored(self):
+        points = EquidistantPoints(1000)
+        path = self.cache.path(points, 'ecef')
+        with open(path, 'wb') as f:
+            f.write(storage.binary_header('ecef', 1000, 0, 1000, points.equatorial_radius,
+                                          points.polar_radius) + b'\0' * 80)
+        self.assertIsNone(self.cache.get(points, 'ecef'))
+        self.assertEqual(EquidistantPoints(1000, cache=self.cache).to_list('ecef'),
+                         points.to_list('ecef'))
+        self.assertIsNotNone(self.cache.get(points, 'ecef'))
+
+    def test_lru_eviction(self):
+        entry_size = storage.HEADER_SIZE + 8 * 3 * 1000
+        cache = LatticeCache(self.directory, max_bytes=2 * entry_size)
+        first, second, third = (EquidistantPoints(1000, radius, radius, cache=cache)
+                                for radius in (1.0, 2.0, 3.0))
+        first.ecef, second.ecef
+        os.utime(cache.path(first, 'ecef'), (1, 1))
+        os.utime(cache.path(second, 'ecef'), (2, 2))
+        cache.get(first, 'ecef')
+
+        third.ecef
+        self.assertEqual(cache.size, 2 * entry_size)
+        self.assertIsNotNone(cache.get(first, 'ecef'))
+        self.assertIsNone(cache.get(second, 'ecef'))
+        self.assertIsNotNone(cache.get(third, 'ecef'))
+
+        EquidistantPoints(10000, cache=cache).ecef
+        self.assertEqual(len(cache.entries()), 2)
+        cache.clear()
+        self.assertEqual(cache.size, 0)
+
+    def test_invalid_arguments(self):
+        self.assertRaises(TypeError, EquidistantPoints, 1000, cache=self.directory)
+        self.assertRaises(ValueError, LatticeCache, self.directory, max_bytes=-1)
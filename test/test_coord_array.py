@@ -0,0 +1,48 @@
+"""Tests the compact coordinate storage"""
+from array import array
+from unittest import TestCase, skipUnless
+
+from equidistantpoints import CoordinateArray
+
+
+class TestCoordinateArray(TestCase):
+    def setUp(self):
+        self.rows = [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0], [7.0, 8.0, 9.0], [10.0, 11.0, 12.0]]
+        self.coordinates = CoordinateArray.from_rows(self.rows, width=3)
+
+    def test_len_and_shape(self):
+        self.assertEqual(len(self.coordinates), 4)
+        self.assertEqual(self.coordinates.shape, (4, 3))
+        self.assertEqual(self.coordinates.nbytes, 4 * 3 * 8)
+
+    def test_indexing(self):
+        self.assertEqual(self.coordinates[1], [4.0, 5.0, 6.0])
+        self.assertEqual(self.coordinates[-1], [10.0, 11.0, 12.0])
+        self.assertRaises(IndexError, self.coordinates.__getitem__, 4)
+        self.assertRaises(IndexError, self.coordinates.__getitem__, -5)
+
+    def test_slicing(self):
+        self.assertEqual(self.coordinates[1:3].tolist(), self.rows[1:3])
+        self.assertEqual(self.coordinates[::2].tolist(), self.rows[::2])
+        self.assertEqual(self.coordinates[::-1].tolist(), self.rows[::-1])
+
+    def test_iteration(self):
+        self.assertEqual(list(self.coordinates), self.rows)
+        self.assertEqual(self.coordinates.tolist(), self.rows)
+
+    @skipUnless(hasattr(memoryview, 'cast'), 'array.array has no memoryview support')
+    def test_buffer(self):
+        view = memoryview(self.coordinates.data)
+        self.assertEqual(view.nbytes, self.coordinates.nbytes)
+        self.assertEqual(view.tolist(), [c for row in self.rows for c in row])
+        if hasattr(self.coordinates, '__buffer__'):
+            shaped = self.coordinates.__buffer__(0)
+            self.assertEqual((shaped.shape, shaped.tolist()), ((4, 3), self.rows))
+
+    @skipUnless(str is bytes, 'Python 2 only')
+    def test_old_buffer(self):
+        self.assertEqual(len(buffer(self.coordinates.data)), self.coordinates.nbytes)  # noqa
+
+    def test_invalid_dimensions(self):
+        self.assertRaises(IndexError, CoordinateArray.from_rows, [[1.0, 2.0]], 3)
+        self.assertRaises(ValueError, CoordinateArray, 3, array('d', [1.0, 2.0]))
@@ -1,5 +1,5 @@
 """Tests the mathematical helper functions"""
-from unittest import TestCase
+from unittest import TestCase, skipUnless
 
 from equidistantpoints import coord_utils
 
@@ -147,3 +147,145 @@ class TestCoordUtils(TestCase):
 
         for args in arguments:
             self.assertRaises((IndexError, TypeError), coord_utils.ecef_to_geodetic, *args)
+
+    def test_generate_points_index_range(self):
+        points = coord_utils.generate_points(100)
+        self.assertEqual(coord_utils.generate_points(100, 10, 20), points[10:20])
+        self.assertEqual(coord_utils.generate_points(100, 95), points[95:])
+        self.assertEqual(coord_utils.generate_points(100, 50, 50), [])
+
+    def test_generate_points_invalid_index_range(self):
+        for start, stop in [(-1, 10), (10, 5), (0, 101)]:
+            self.assertRaises(ValueError, coord_utils.generate_points, 100, start, stop)
+
+    def test_iter_points_chunks(self):
+        chunks = [list(c) for c in coord_utils.iter_points(1000, chunk_size=300)]
+        self.assertEqual([len(c) for c in chunks], [300, 300, 300, 100])
+
+    def test_iter_points_matches_full_generation(self):
+        cartesian = coord_utils.generate_points(1000)
+        ecef = coord_utils.cartesian_to_ecef(cartesian, er, pr, ra)
+        expected = {'cartesian': cartesian, 'ecef': ecef,
+                    'geodetic': coord_utils.ecef_to_geodetic(ecef, ra)}
+
+        for coord_type, coordinates in expected.items():
+            chunks = coord_utils.iter_points(1000, chunk_size=128, coord_type=coord_type,
+                                             equatorial_radius=er, polar_radius=pr)
+            generated = [c for chunk in chunks for c in chunk]
+            self.assertEqual(len(generated), 1000)
+            for a, b in zip(generated, coordinates):
+                for x, y in zip(a, b):
+                    self.assertAlmostEqual(x, y, places=10)
+
+    def test_iter_points_index_range(self):
+        chunks = list(coord_utils.iter_points(1000, chunk_size=64, start=900, stop=1000))
+        self.assertEqual(sum(len(c) for c in chunks), 100)
+        self.assertAlmostEqual(list(chunks[0][0])[2], coord_utils.generate_points(1000)[900][2])
+
+    def test_iter_points_invalid_arguments(self):
+        self.assertRaises(ValueError, next, coord_utils.iter_points(100, chunk_size=0))
+        self.assertRaises(ValueError, next, coord_utils.iter_points(100, coord_type='mercator'))
+
+    def test_inverse_conversions_round_trip(self):
+        cartesian = coord_utils.generate_points(500)
+        for radii in [(er, pr), (1.0, 1.0), (6378137.0, 5000000.0)]:
+            for rotation_axis in [ra, [[1, 0, 0], [0, 1, 0], [0, 0, 1]]]:
+                ecef = coord_utils.cartesian_to_ecef(cartesian, radii[0], radii[1], rotation_axis)
+                geodetic = coord_utils.ecef_to_geodetic(ecef, rotation_axis)
+                for a, b in zip(coord_utils.ecef_to_cartesian(ecef, radii[0], radii[1],
+                                                              rotation_axis), cartesian):
+                    for x, y in zip(a, b):
+                        self.assertAlmostEqual(x, y, places=14)
+                for a, b in zip(coord_utils.geodetic_to_ecef(geodetic, rotation_axis), ecef):
+                    for x, y in zip(a, b):
+                        self.assertAlmostEqual(x, y, places=14)
+
+    def test_convert_points_inverse(self):
+        cartesian = coord_utils.generate_points(100)
+        geodetic = coord_utils.convert_points(cartesian, 'cartesian', 'geodetic', er, pr, ra)
+        for a, b in zip(coord_utils.convert_points(geodetic, 'geodetic', 'cartesian', er, pr, ra),
+                        cartesian):
+            for x, y in zip(a, b):
+                self.assertAlmostEqual(x, y, places=14)
+        ecef = coord_utils.convert_points([[1.0, 2.0]], 'geodetic', 'ecef', er, pr, ra)[0]
+        for x, y in zip(ecef, coord_utils.geodetic_to_ecef([[1.0, 2.0]], ra)[0]):
+            self.assertAlmostEqual(x, y, places=15)
+        self.assertRaises(ValueError, coord_utils.convert_points, geodetic, 'geodetic',
+                          'mercator', er, pr, ra)
+
+    def test_iter_ellipsoid_points(self):
+        radii = [(er, pr), (1.0, 1.0), (3396190.0, 3376200.0)]
+        chunks = list(coord_utils.iter_ellipsoid_points(1000, radii, chunk_size=300,
+                                                        coord_types=('cartesian', 'geodetic')))
+        self.assertEqual([len(results) for results in chunks], [3] * 4)
+        for i, (equatorial_radius, polar_radius) in enumerate(radii):
+            for coord_type in ('cartesian', 'geodetic'):
+                expected = coord_utils.iter_points(1000, chunk_size=300, coord_type=coord_type,
+                                                   equatorial_radius=equatorial_radius,
+                                                   polar_radius=polar_radius)
+                for results, chunk in zip(chunks, expected):
+                    self.assertEqual(sorted(results[i]), ['cartesian', 'geodetic'])
+                    self.assertEqual([list(c) for c in results[i][coord_type]],
+                                     [list(c) for c in chunk])
+        self.assertRaises(ValueError, next, coord_utils.iter_ellipsoid_points(
+            100, radii, coord_types=('mercator',)))
+
+
+@skipUnless(coord_utils.HAS_NUMPY, 'NumPy is not installed')
+class TestCoordUtilsArray(TestCase):
+    def assertCoordinatesAlmostEqual(self, first, second, places=10):
+        self.assertEqual(len(first), len(second))
+        for a, b in zip(first, second):
+            for x, y in zip(a, b):
+                self.assertAlmostEqual(x, y, places=places)
+
+    def test_generate_points_matches_pure_python(self):
+        for n in [1, 3, 10, 1000]:
+            self.assertCoordinatesAlmostEqual(coord_utils.generate_points_array(n).tolist(),
+                                              coord_utils.generate_points(n), places=13)
+
+    def test_cartesian_to_ecef_matches_pure_python(self):
+        cartesian = coord_utils.generate_points(1000)
+        self.assertCoordinatesAlmostEqual(
+            coord_utils.cartesian_to_ecef_array(cartesian, er, pr, ra).tolist(),
+            coord_utils.cartesian_to_ecef(cartesian, er, pr, ra), places=13)
+
+    def test_ecef_to_geodetic_matches_pure_python(self):
+        ecef = coord_utils.cartesian_to_ecef(coord_utils.generate_points(1000), er, pr, ra)
+        self.assertCoordinatesAlmostEqual(coord_utils.ecef_to_geodetic_array(ecef, ra).tolist(),
+                                          coord_utils.ecef_to_geodetic(ecef, ra), places=10)
+
+    def test_inverse_conversions_match_pure_python(self):
+        ecef = coord_utils.cartesian_to_ecef(coord_utils.generate_points(1000), er, pr, ra)
+        geodetic = coord_utils.ecef_to_geodetic(ecef, ra)
+        self.assertCoordinatesAlmostEqual(
+            coord_utils.ecef_to_cartesian_array(ecef, er, pr, ra).tolist(),
+            coord_utils.ecef_to_cartesian(ecef, er, pr, ra), places=14)
+        self.assertCoordinatesAlmostEqual(coord_utils.geodetic_to_ecef_array(geodetic, ra).tolist(),
+                                          coord_utils.geodetic_to_ecef(geodetic, ra), places=14)
+
+    def test_inverse_conversions_round_trip(self):
+        np = coord_utils.np
+        cartesian = coord_utils.generate_points_array(100000)
+        ecef = coord_utils.cartesian_to_ecef_array(cartesian, er, pr, ra)
+        geodetic = coord_utils.ecef_to_geodetic_array(ecef, ra)
+        self.assertLess(np.abs(coord_utils.ecef_to_cartesian_array(ecef, er, pr, ra) -
+                               cartesian).max(), 1e-14)
+        self.assertLess(np.abs(coord_utils.geodetic_to_ecef_array(geodetic, ra) - ecef).max(),
+                        1e-14)
+        self.assertLess(np.abs(coord_utils.ecef_to_geodetic_array(
+            coord_utils.geodetic_to_ecef_array(geodetic, ra), ra) - geodetic).max(), 1e-11)
+
+    def test_generate_points_index_range(self):
+        self.assertCoordinatesAlmostEqual(coord_utils.generate_points_array(100, 10, 20).tolist(),
+                                          coord_utils.generate_points(100, 10, 20), places=13)
+
+    def test_array_coordinate_invalid_dimensions(self):
+        arguments = [
+            [[[1, 2, 3, 4], [5, 6, 7, 8]], er, pr, ra],
+            [[[1, 2], [5, 6]], er, pr, ra],
+            [[[1, 2, 3], [4, 5, 6]], er, pr, [[1, 2, 3], [4, 5, 6]]],
+        ]
+
+        for args in arguments:
+            self.assertRaises((IndexError, TypeError), coord_utils.cartesian_to_ecef_array, *args)
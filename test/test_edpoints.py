@@ -4,12 +4,15 @@ from __future__ import division
 import csv
 import json
 import os
-from multiprocessing import freeze_support
+from math import asin, cos, degrees, radians, sin
+from random import Random
 from tempfile import mkstemp
-from unittest import TestCase
+from unittest import TestCase, skipUnless
 
-from equidistantpoints import EquidistantPoints
-from .helpers import calculate_max_nn_distance_percentage_deviation, subprocess_call
+from equidistantpoints import EquidistantPoints, coord_utils, metrics
+from .helpers import subprocess_call
+
+SLOW_TESTS = bool(os.environ.get('EDPOINTS_SLOW_TESTS'))
 
 try:  # Python 2
     from Queue import Empty
@@ -18,14 +21,25 @@ except ImportError:  # Python 3
 
 
 class TestDistanceFluctuation(TestCase):
-    def setUp(self):
-        if os.name == 'nt':  # Windows fix
-            freeze_support()
-
     def test_max_percentage_deviation_less_than_4_percent(self):
         for i in [3, 10, 100, 1000, 10000]:
             self.assertLessEqual(
-                calculate_max_nn_distance_percentage_deviation(EquidistantPoints(i).geodetic), 0.04)
+                metrics.nearest_neighbor_stats(EquidistantPoints(i))['percentage_deviation'], 0.04)
+
+    @skipUnless(coord_utils.HAS_NUMPY, 'NumPy is not installed')
+    def test_max_percentage_deviation_one_million_points(self):
+        """Takes about 3 s"""
+        self.assertLessEqual(
+            metrics.nearest_neighbor_stats(EquidistantPoints(10 ** 6))['percentage_deviation'],
+            0.04)
+
+    @skipUnless(coord_utils.HAS_NUMPY and SLOW_TESTS,
+                'NumPy is not installed or EDPOINTS_SLOW_TESTS is not set')
+    def test_max_percentage_deviation_ten_million_points(self):
+        """Takes about 35 s and 1.2 GB of memory, only run if EDPOINTS_SLOW_TESTS is set"""
+        self.assertLessEqual(
+            metrics.nearest_neighbor_stats(EquidistantPoints(10 ** 7))['percentage_deviation'],
+            0.04)
 
     def test_edpoints_npoints_less_than_3(self):
         for i in [-1, 0, 1, 2]:
@@ -39,13 +53,305 @@ class TestDistanceFluctuation(TestCase):
             self.assertRaises(TypeError, EquidistantPoints, *args)
 
 
+class TestLazyCoordinates(TestCase):
+    def setUp(self):
+        self.calls = []
+        self.originals = {}
+        for name in ('generate_points', 'generate_points_array', 'cartesian_to_ecef',
+                     'cartesian_to_ecef_array', 'ecef_to_geodetic', 'ecef_to_geodetic_array'):
+            self.originals[name] = getattr(coord_utils, name)
+            setattr(coord_utils, name, self.__counting(name, self.originals[name]))
+
+    def tearDown(self):
+        for name, func in self.originals.items():
+            setattr(coord_utils, name, func)
+
+    def __counting(self, name, func):
+        def wrapper(*args, **kwargs):
+            self.calls.append(name.replace('_array', ''))
+            return func(*args, **kwargs)
+        return wrapper
+
+    def test_construction_computes_nothing(self):
+        EquidistantPoints(100)
+        self.assertEqual(self.calls, [])
+
+    def test_cartesian_skips_ellipsoid_conversions(self):
+        points = EquidistantPoints(100)
+        self.assertEqual(len(points.cartesian), 100)
+        self.assertEqual(self.calls, ['generate_points'])
+
+    def test_coordinates_are_cached(self):
+        points = EquidistantPoints(100)
+        self.assertIs(points.geodetic, points.geodetic)
+        self.assertEqual(self.calls, ['generate_points', 'cartesian_to_ecef', 'ecef_to_geodetic'])
+
+    def test_cached_intermediates_are_reused(self):
+        points = EquidistantPoints(100)
+        points.ecef
+        points.geodetic
+        self.assertEqual(self.calls, ['generate_points', 'cartesian_to_ecef', 'ecef_to_geodetic'])
+
+    def test_release(self):
+        points = EquidistantPoints(100)
+        geodetic = points.to_list('geodetic')
+        points.release('geodetic')
+        self.assertEqual(points.to_list('geodetic'), geodetic)
+        self.assertEqual(self.calls.count('ecef_to_geodetic'), 2)
+
+        points.release()
+        points.cartesian
+        self.assertEqual(self.calls.count('generate_points'), 3)
+
+    def test_release_invalid_coord_type(self):
+        self.assertRaises(ValueError, EquidistantPoints(100).release, 'mercator')
+
+
+class TestCoordinateStorage(TestCase):
+    def test_shapes(self):
+        points = EquidistantPoints(100)
+        self.assertEqual(tuple(points.cartesian.shape), (100, 3))
+        self.assertEqual(tuple(points.ecef.shape), (100, 3))
+        self.assertEqual(tuple(points.geodetic.shape), (100, 2))
+
+    def test_compact_storage(self):
+        points = EquidistantPoints(100)
+        self.assertEqual(points.cartesian.nbytes, 100 * 3 * 8)
+        self.assertEqual(points.geodetic.nbytes, 100 * 2 * 8)
+
+    def test_to_list(self):
+        points = EquidistantPoints(100)
+        cartesian = points.to_list('cartesian')
+        self.assertIsInstance(cartesian, list)
+        self.assertEqual(len(cartesian), 100)
+        self.assertEqual(cartesian[5], list(points.cartesian[5]))
+        self.assertRaises(ValueError, points.to_list, 'mercator')
+
+    def test_to_list_matches_coord_utils(self):
+        points = EquidistantPoints(100)
+        cartesian = coord_utils.generate_points(100)
+        ecef = coord_utils.cartesian_to_ecef(cartesian, points.equatorial_radius,
+                                             points.polar_radius, points.rotation_axis)
+        geodetic = coord_utils.ecef_to_geodetic(ecef, points.rotation_axis)
+
+        for expected, coord_type in ((cartesian, 'cartesian'), (ecef, 'ecef'),
+                                     (geodetic, 'geodetic')):
+            for a, b in zip(points.to_list(coord_type), expected):
+                for x, y in zip(a, b):
+                    self.assertAlmostEqual(x, y, places=10)
+
+
+class TestIterPoints(TestCase):
+    def test_chunks_match_coordinates(self):
+        points = EquidistantPoints(1000)
+        for coord_type in ('cartesian', 'ecef', 'geodetic'):
+            chunks = list(points.iter_points(coord_type, chunk_size=300))
+            self.assertEqual([len(c) for c in chunks], [300, 300, 300, 100])
+            self.assertEqual([c for chunk in chunks for c in chunk.tolist()],
+                             points.to_list(coord_type))
+
+    def test_does_not_cache(self):
+        points = EquidistantPoints(1000)
+        list(points.iter_points('geodetic', chunk_size=300))
+        calls = []
+        original = coord_utils.convert_points
+
+        def counting(*args, **kwargs):
+            if args[1] != args[2]:
+                calls.append(args[1:3])
+            return original(*args, **kwargs)
+
+        coord_utils.convert_points = counting
+        try:
+            list(points.iter_points('geodetic', chunk_size=500))
+        finally:
+            coord_utils.convert_points = original
+        self.assertEqual(calls, [('cartesian', 'ecef'), ('ecef', 'geodetic')] * 2)
+
+    def test_invalid_arguments(self):
+        points = EquidistantPoints(100)
+        self.assertRaises(ValueError, next, points.iter_points('mercator'))
+        self.assertRaises(ValueError, next, points.iter_points('geodetic', chunk_size=0))
+
+
+class TestRandomAccess(TestCase):
+    def setUp(self):
+        self.points = EquidistantPoints(1000)
+        self.expected = dict((coord_type, EquidistantPoints(1000).to_list(coord_type))
+                             for coord_type in ('cartesian', 'ecef', 'geodetic'))
+
+    def assertCoordinatesAlmostEqual(self, first, second):
+        self.assertEqual(len(first), len(second))
+        for a, b in zip(first, second):
+            for x, y in zip(a, b):
+                self.assertAlmostEqual(x, y, places=10)
+
+    def test_len(self):
+        self.assertEqual(len(self.points), 1000)
+        self.assertEqual(len(self.points[100:300]), 200)
+        self.assertEqual(len(self.points[-10:]), 10)
+        self.assertEqual(len(self.points[500:100]), 0)
+
+    def test_point_at(self):
+        for coord_type, coordinates in self.expected.items():
+            for i in (0, 1, 499, 999, -1):
+                self.assertCoordinatesAlmostEqual([self.points.point_at(i, coord_type)],
+                                                  [coordinates[i]])
+
+    def test_point_at_does_not_generate_all_points(self):
+        for n_points, i in ((10 ** 9, 10 ** 9 - 1), (10 ** 12, 123456789)):
+            self.assertCoordinatesAlmostEqual(
+                [EquidistantPoints(n_points).point_at(i, 'cartesian')],
+                coord_utils.generate_points(n_points, i, i + 1))
+
+    def test_point_at_out_of_range(self):
+        self.assertRaises(IndexError, self.points.point_at, 1000)
+        self.assertRaises(IndexError, self.points.point_at, -1001)
+        self.assertRaises(IndexError, self.points[10:20].point_at, 10)
+
+    def test_slicing(self):
+        for coord_type, coordinates in self.expected.items():
+            self.assertCoordinatesAlmostEqual(self.points[250:750].to_list(coord_type),
+                                              coordinates[250:750])
+            self.assertCoordinatesAlmostEqual(self.points[-50:].to_list(coord_type),
+                                              coordinates[-50:])
+
+    def test_nested_slicing(self):
+        sliced = self.points[100:900][50:60]
+        self.assertEqual(list(sliced.indices), list(range(150, 160)))
+        self.assertCoordinatesAlmostEqual(sliced.to_list('geodetic'),
+                                          self.expected['geodetic'][150:160])
+        self.assertCoordinatesAlmostEqual([sliced.point_at(0)], [self.expected['geodetic'][150]])
+
+    def test_slicing_cached_coordinates(self):
+        self.points.geodetic
+        self.assertCoordinatesAlmostEqual(self.points[10:20].to_list('geodetic'),
+                                          self.expected['geodetic'][10:20])
+
+    def test_invalid_indexing(self):
+        self.assertRaises(TypeError, self.points.__getitem__, 5)
+        self.assertRaises(ValueError, self.points.__getitem__, slice(None, None, 2))
+
+
+class TestParallelGeneration(TestCase):
+    def test_identical_to_serial(self):
+        serial = EquidistantPoints(10007)
+        parallel = EquidistantPoints(10007, workers=3)
+        for coord_type in ('geodetic', 'ecef', 'cartesian'):
+            self.assertEqual(parallel.to_list(coord_type), serial.to_list(coord_type))
+
+    def test_slices(self):
+        serial = EquidistantPoints(5000)[1234:4321]
+        parallel = EquidistantPoints(5000, workers=2)[1234:4321]
+        self.assertEqual(parallel.workers, 2)
+        self.assertEqual(parallel.to_list('ecef'), serial.to_list('ecef'))
+        self.assertEqual(parallel[10:10].to_list('geodetic'), [])
+
+    def test_more_workers_than_points(self):
+        points = EquidistantPoints(5, workers=8)
+        self.assertEqual(points.to_list('geodetic'), EquidistantPoints(5).to_list('geodetic'))
+
+    def test_invalid_workers(self):
+        self.assertRaises(ValueError, EquidistantPoints, 100, workers=0)
+        self.assertRaises(TypeError, EquidistantPoints, 100, workers=1.5)
+
+
+class TestMultipleEllipsoids(TestCase):
+    def test_identical_to_separate_instances(self):
+        radii = [(6378137.0, 6356752.3), (6378137.0, 6356752.31414), (3396190.0, 3376200.0)]
+        all_points = EquidistantPoints.for_ellipsoids(
+            70000, radii, coord_types=('cartesian', 'ecef', 'geodetic'))
+        self.assertEqual(len(all_points), 3)
+        for points, (equatorial_radius, polar_radius) in zip(all_points, radii):
+            self.assertEqual((points.equatorial_radius, points.polar_radius),
+                             (equatorial_radius, polar_radius))
+            separate = EquidistantPoints(70000, equatorial_radius, polar_radius)
+            for coord_type in ('cartesian', 'ecef', 'geodetic'):
+                self.assertEqual(points.to_list(coord_type), separate.to_list(coord_type))
+        self.assertIs(all_points[0].cartesian, all_points[2].cartesian)
+
+    def test_only_requested_types_are_cached(self):
+        points, = EquidistantPoints.for_ellipsoids(1000, [(1.0, 1.0)], coord_types=('ecef',))
+        self.assertEqual(points.ecef.shape, (1000, 3))
+        self.assertEqual(points.to_list('geodetic'),
+                         EquidistantPoints(1000, 1.0, 1.0).to_list('geodetic'))
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, EquidistantPoints.for_ellipsoids, 1000, [])
+        self.assertRaises(ValueError, EquidistantPoints.for_ellipsoids, 1000, [(1.0, 1.0)],
+                          coord_types=('mercator',))
+        self.assertRaises(ValueError, EquidistantPoints.for_ellipsoids, 2, [(1.0, 1.0)])
+
+
+class TestNearest(TestCase):
+    def __brute_force(self, points, lon, lat):
+        query = [cos(radians(lat)) * cos(radians(lon)), cos(radians(lat)) * sin(radians(lon)),
+                 sin(radians(lat))]
+        distances = [sum((a - b) ** 2 for a, b in zip(coord, query))
+                     for coord in points.to_list('ecef')]
+        return distances.index(min(distances))
+
+    def __queries(self, count):
+        random = Random(42)
+        queries = [(random.uniform(-180, 180), degrees(asin(random.uniform(-1, 1))))
+                   for _ in range(count)]
+        queries += [(random.uniform(-180, 180), random.choice([-1, 1]) * random.uniform(85, 90))
+                    for _ in range(count // 4)]
+        return queries + [(0, 90), (0, -90), (180, 0), (-180, 0)]
+
+    def test_nearest_index_matches_brute_force(self):
+        for n in (3, 10, 100, 1000, 5000):
+            points = EquidistantPoints(n)
+            for lon, lat in self.__queries(200):
+                self.assertEqual(points.nearest_index(lon, lat),
+                                 self.__brute_force(points, lon, lat))
+
+    def test_nearest_index_custom_ellipsoid(self):
+        points = EquidistantPoints(2000, equatorial_radius=6000.0, polar_radius=4800.0)
+        for lon, lat in self.__queries(200):
+            self.assertEqual(points.nearest_index(lon, lat), self.__brute_force(points, lon, lat))
+
+    def test_nearest_generated_point_is_itself(self):
+        points = EquidistantPoints(1000)
+        for i, (lon, lat) in enumerate(points.to_list('geodetic')):
+            self.assertEqual(points.nearest_index(lon, lat), i)
+
+    def test_nearest(self):
+        points = EquidistantPoints(1000)
+        index = points.nearest_index(13.4, 52.5)
+        self.assertEqual(points.nearest(13.4, 52.5), points.point_at(index))
+        self.assertEqual(points.nearest(13.4, 52.5, 'cartesian'),
+                         points.point_at(index, 'cartesian'))
+
+    def test_nearest_large_lattice(self):
+        points = EquidistantPoints(10 ** 10)
+        lon, lat = points.point_at(1234567890)
+        self.assertEqual(points.nearest_index(lon, lat), 1234567890)
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, EquidistantPoints(100).nearest_index, 0, 90.5)
+        self.assertRaises(ValueError, EquidistantPoints(100)[10:20].nearest_index, 0, 0)
+
+    def test_full_lattice_errors_name_the_operation(self):
+        points = EquidistantPoints(100)[10:20]
+        for operation, method, args in (('Nearest-point lookups', points.nearest_index, (0, 0)),
+                                        ('Spatial indexes', points.build_index, ()),
+                                        ('Neighbor graphs', points.neighbor_graph, ())):
+            try:
+                method(*args)
+            except ValueError as e:
+                self.assertEqual(str(e), operation + ' are only supported on the full lattice')
+            else:
+                self.fail('{} accepted a slice of the lattice'.format(operation))
+
+
 class TestPointGeneration(TestCase):
     @classmethod
     def setUpClass(cls):
         curdir = os.path.dirname(os.path.abspath(__file__))
 
         # Create temporary output files
-        tmp_files = [path for _, path in (mkstemp() for _ in range(4))]
+        tmp_files = [path for _, path in (mkstemp() for _ in range(5))]
         cls.files = {
             'cartesian_out': tmp_files[0],
             'cartesian_expected': os.path.join(curdir, 'out', 'cartesian_1000.csv'),
@@ -55,6 +361,7 @@ class TestPointGeneration(TestCase):
             'geodetic_csv_expected': os.path.join(curdir, 'out', 'geodetic_1000.csv'),
             'geodetic_json_out': tmp_files[3],
             'geodetic_json_expected': os.path.join(curdir, 'out', 'geodetic_1000.json'),
+            'parallel_out': tmp_files[4],
         }
 
         subprocess_call(['pip', 'install', '--upgrade', '--force-reinstall',
@@ -89,6 +396,11 @@ class TestPointGeneration(TestCase):
                          self.files['geodetic_csv_out']])
         self.__csv_compare(self.files['geodetic_csv_out'], self.files['geodetic_csv_expected'])
 
+    def test_parallel_geodetic_to_csv(self):
+        subprocess_call(['edpoints', '1000', '-w', '2', '-f',
+                         self.files['parallel_out']])
+        self.__csv_compare(self.files['parallel_out'], self.files['geodetic_csv_expected'])
+
     def test_geodetic_to_json(self):
         subprocess_call(['edpoints', '1000', '-g', '-f',
                          self.files['geodetic_json_out']])
@@ -104,5 +416,6 @@ class TestPointGeneration(TestCase):
 
     @classmethod
     def tearDownClass(cls):
-        for tmps in ('cartesian_out', 'ecef_out', 'geodetic_csv_out', 'geodetic_json_out'):
+        for tmps in ('cartesian_out', 'ecef_out', 'geodetic_csv_out', 'geodetic_json_out',
+                     'parallel_out'):
             os.remove(cls.files[tmps])
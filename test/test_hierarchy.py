@@ -0,0 +1,66 @@
+"""Tests the multi-resolution hierarchy of lattices"""
+from unittest import TestCase
+
+from equidistantpoints import EquidistantPoints, Hierarchy
+
+
+class TestHierarchy(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.hierarchy = Hierarchy([50, 500, 3000])
+
+    def test_parents_match_brute_force(self):
+        for level in (1, 2):
+            coarse = self.hierarchy.levels[level - 1].to_list('ecef')
+            for i, point in enumerate(self.hierarchy.levels[level].to_list('ecef')):
+                distances = [sum((a - b) ** 2 for a, b in zip(coord, point)) for coord in coarse]
+                self.assertEqual(self.hierarchy.parents[level][i],
+                                 distances.index(min(distances)))
+
+    def test_flattened_ellipsoid(self):
+        hierarchy = Hierarchy([40, 400], equatorial_radius=1.0, polar_radius=0.7)
+        coarse = EquidistantPoints(40, 1.0, 0.7).to_list('ecef')
+        for i, point in enumerate(EquidistantPoints(400, 1.0, 0.7).to_list('ecef')):
+            distances = [sum((a - b) ** 2 for a, b in zip(coord, point)) for coord in coarse]
+            self.assertEqual(hierarchy.parents[1][i], distances.index(min(distances)))
+
+    def test_ancestors(self):
+        parents = self.hierarchy.parents
+        indices = [0, 17, 1500, 2999]
+        self.assertEqual(list(self.hierarchy.ancestors(2, indices, target_level=1)),
+                         [parents[2][i] for i in indices])
+        self.assertEqual(list(self.hierarchy.ancestors(2, indices)),
+                         [parents[1][parents[2][i]] for i in indices])
+        self.assertEqual(list(self.hierarchy.ancestors(1, indices[:2], target_level=1)),
+                         indices[:2])
+        self.assertEqual(len(self.hierarchy.ancestors(2, [])), 0)
+
+    def test_descendants(self):
+        finest = self.hierarchy.ancestors(2, range(3000))
+        for index in (0, 7, 49):
+            self.assertEqual(list(self.hierarchy.children(0, index)),
+                             [i for i, parent in enumerate(self.hierarchy.parents[1])
+                              if parent == index])
+        descendants = self.hierarchy.descendants(0, [7, 0, 7])
+        self.assertEqual([list(d) for d in descendants],
+                         [[i for i, a in enumerate(finest) if a == index] for index in (7, 0, 7)])
+        self.assertEqual(sorted(i for d in self.hierarchy.descendants(0, range(50)) for i in d),
+                         list(range(3000)))
+        self.assertEqual([list(d) for d in self.hierarchy.descendants(2, [5, 6])], [[5], [6]])
+        self.assertEqual(self.hierarchy.descendants(1, []), [])
+
+    def test_levels(self):
+        self.assertEqual(len(self.hierarchy), 3)
+        self.assertEqual(self.hierarchy.n_points, [50, 500, 3000])
+        self.assertIsNone(self.hierarchy.parents[0])
+        self.assertEqual(self.hierarchy.parents[2].itemsize, 4)
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, Hierarchy, [])
+        self.assertRaises(ValueError, Hierarchy, [100, 100])
+        self.assertRaises(TypeError, Hierarchy, [100, 1000.0])
+        self.assertRaises(ValueError, self.hierarchy.ancestors, 0, [0], target_level=1)
+        self.assertRaises(ValueError, self.hierarchy.children, 2, 0)
+        self.assertRaises(ValueError, self.hierarchy.descendants, 1, [0], target_level=0)
+        self.assertRaises(IndexError, self.hierarchy.ancestors, 1, [500])
+        self.assertRaises(IndexError, self.hierarchy.descendants, 0, [-1])
@@ -0,0 +1,133 @@
+"""Tests the per-stage instrumentation of EquidistantPoints"""
+import os
+import shutil
+import sys
+import time
+from tempfile import mkdtemp, mkstemp
+from unittest import TestCase, skipIf
+
+from equidistantpoints import EquidistantPoints, LatticeCache, cli
+from equidistantpoints.coord_utils import DEFAULT_CHUNK_SIZE
+from equidistantpoints.instrumentation import Stats, tracemalloc
+
+try:  # Python 2, whose sys.stderr takes byte strings
+    from StringIO import StringIO
+except ImportError:  # Python 3
+    from io import StringIO
+
+
+class TestStats(TestCase):
+    def setUp(self):
+        _, self.out = mkstemp()
+        self.steps = []
+        self.stats = Stats(hooks=[lambda *step: self.steps.append(step)])
+
+    def tearDown(self):
+        os.remove(self.out)
+
+    def test_writer_stages(self):
+        points = EquidistantPoints(150000, stats=self.stats)
+        start = time.time()
+        points.write_geodetic_to_csv(self.out)
+        elapsed = time.time() - start
+
+        stages = self.stats.stages
+        self.assertEqual(list(stages), ['cartesian', 'ecef', 'geodetic', 'write'])
+        self.assertEqual(set(stage['points'] for stage in stages.values()), set([150000]))
+        self.assertEqual(stages['cartesian']['steps'], 3)
+        self.assertEqual(stages['ecef']['payload_bytes'], 150000 * 3 * 8)
+        self.assertEqual(stages['geodetic']['payload_bytes'], 150000 * 2 * 8)
+        self.assertEqual(stages['write']['payload_bytes'], os.path.getsize(self.out))
+        # Memory is only measured while tracemalloc is tracing
+        self.assertEqual(set(stage['allocated_bytes'] for stage in stages.values()), set([None]))
+        # Stages are exclusive: none of the time is counted twice
+        self.assertLessEqual(self.stats.total_seconds, elapsed)
+        self.assertTrue(all(stage['seconds'] >= 0 for stage in stages.values()))
+
+        self.assertEqual(len(self.steps), 3 + 3 + 3 + 1)
+        for name, stage in stages.items():
+            steps = [step for step in self.steps if step[0] == name]
+            self.assertAlmostEqual(sum(step[1] for step in steps), stage['seconds'])
+            self.assertEqual(sum(step[2] for step in steps), stage['points'])
+            self.assertEqual(sum(step[3] for step in steps), stage['payload_bytes'])
+
+    def test_float32_payload(self):
+        geodetic = EquidistantPoints(100000, stats=self.stats, dtype='float32').geodetic
+        self.assertEqual(self.stats.stages['geodetic']['payload_bytes'], geodetic.nbytes)
+        self.assertEqual(self.stats.stages['geodetic']['payload_bytes'], 100000 * 2 * 4)
+        self.assertEqual(self.stats.stages['cartesian']['payload_bytes'], 100000 * 3 * 4)
+
+    @skipIf(tracemalloc is None, 'tracemalloc is not available')
+    def test_allocated_bytes(self):
+        tracemalloc.start()
+        try:
+            points = EquidistantPoints(100000, stats=self.stats)
+            points.ecef
+            with self.stats.stage('outer'):
+                with self.stats.stage('inner'):
+                    inner = bytearray(10 ** 6)
+        finally:
+            tracemalloc.stop()
+
+        stages = self.stats.stages
+        # The retained output of a stage is counted
+        self.assertGreaterEqual(stages['ecef']['allocated_bytes'], points.ecef.nbytes)
+        self.assertGreaterEqual(stages['inner']['allocated_bytes'], len(inner))
+        # ...but not again in the enclosing stage
+        self.assertLess(abs(stages['outer']['allocated_bytes']), len(inner) // 10)
+        self.assertEqual([len(step) for step in self.steps], [5] * len(self.steps))
+        self.assertEqual(stages['ecef']['allocated_bytes'],
+                         sum(step[4] for step in self.steps if step[0] == 'ecef'))
+
+    def test_cached_coordinates_are_not_recomputed(self):
+        points = EquidistantPoints(1000, stats=self.stats)
+        points.ecef
+        self.assertEqual(list(self.stats.stages), ['cartesian', 'ecef'])
+        self.assertEqual(self.stats.stages['ecef']['steps'], 1)
+
+        points[100:200].write_ecef_to_csv(self.out)
+        self.assertEqual(self.stats.stages['ecef']['steps'], 1)
+        self.assertEqual(self.stats.stages['write']['points'], 100)
+
+        self.stats.reset()
+        self.assertEqual(self.stats.total_seconds, 0)
+
+    def test_parallel_and_cache_stages(self):
+        directory = mkdtemp()
+        try:
+            cache = LatticeCache(directory)
+            EquidistantPoints(DEFAULT_CHUNK_SIZE + 1, workers=2, cache=cache,
+                              stats=self.stats).geodetic
+            EquidistantPoints(DEFAULT_CHUNK_SIZE + 1, cache=cache, stats=self.stats).geodetic
+        finally:
+            shutil.rmtree(directory)
+
+        stages = self.stats.stages
+        self.assertEqual(sorted(stages), ['cache_load', 'cache_store', 'geodetic'])
+        self.assertEqual(stages['geodetic']['steps'], 1)
+        self.assertEqual(stages['cache_load']['steps'], 2)
+        self.assertEqual(stages['cache_load']['points'], DEFAULT_CHUNK_SIZE + 1)
+        self.assertEqual(stages['cache_store']['payload_bytes'], (DEFAULT_CHUNK_SIZE + 1) * 2 * 8)
+
+    def test_summary(self):
+        EquidistantPoints(1000, stats=self.stats).write_to_binary(self.out)
+        lines = self.stats.summary().splitlines()
+        self.assertEqual([line.split()[0] for line in lines],
+                         ['stage', 'cartesian', 'ecef', 'geodetic', 'write', 'total'])
+        self.assertEqual([line.split()[4] for line in lines[1:-1]], ['-'] * 4)
+
+    def test_cli_profile(self):
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            cli.main(['1000', '--profile', '-e', '-f', self.out])
+            summary = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+        self.assertEqual([line.split()[0] for line in summary.splitlines()],
+                         ['stage', 'cartesian', 'ecef', 'write', 'total'])
+        self.assertIn('payload MiB', summary.splitlines()[0])
+        self.assertIn('allocated MiB', summary.splitlines()[0])
+
+    def test_invalid_stats(self):
+        self.assertRaises(TypeError, EquidistantPoints, 1000, stats={})
@@ -0,0 +1,56 @@
+"""Tests the lattice quality metrics"""
+from __future__ import division
+from math import asin, pi, sqrt
+from unittest import TestCase
+
+from equidistantpoints import EquidistantPoints, metrics
+
+
+class TestMetrics(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.points = EquidistantPoints(500)
+        cls.ecef = cls.points.to_list('ecef')
+        cls.mean_radius = (2 * cls.points.equatorial_radius + cls.points.polar_radius) / 3
+
+    def test_nearest_neighbor_distances(self):
+        distances = metrics.nearest_neighbor_distances(self.points)
+        self.assertEqual(len(distances), 500)
+        for i, point in enumerate(self.ecef):
+            chord = min(sqrt(sum((a - b) ** 2 for a, b in zip(point, other)))
+                        for j, other in enumerate(self.ecef) if j != i)
+            self.assertAlmostEqual(distances[i], 2 * self.mean_radius * asin(chord / 2), places=4)
+
+    def test_nearest_neighbor_stats(self):
+        distances = list(metrics.nearest_neighbor_distances(self.points))
+        stats = metrics.nearest_neighbor_stats(self.points)
+        self.assertEqual(stats['min'], min(distances))
+        self.assertEqual(stats['max'], max(distances))
+        self.assertAlmostEqual(stats['mean'], sum(distances) / 500, places=6)
+        self.assertAlmostEqual(stats['spread'], (stats['max'] - stats['min']) / stats['mean'])
+        self.assertLessEqual(stats['percentage_deviation'], stats['spread'])
+
+    def test_cell_areas_cover_sphere(self):
+        for n_points in (20, 500, 5000):
+            points = EquidistantPoints(n_points, equatorial_radius=1.0, polar_radius=1.0)
+            areas = metrics.cell_areas(points)
+            self.assertEqual(len(areas), n_points)
+            self.assertTrue(all(area > 0 for area in areas))
+            self.assertAlmostEqual(sum(areas), 4 * pi, places=9)
+
+    def test_cell_areas_match_all_bisectors(self):
+        points = EquidistantPoints(60, equatorial_radius=1.0, polar_radius=1.0)
+        ecef = points.to_list('ecef')
+        areas = metrics.cell_areas(points)
+        for i, point in enumerate(ecef):
+            expected = metrics._cell_area(point, ecef[:i] + ecef[i + 1:])
+            self.assertAlmostEqual(areas[i], expected, places=12)
+
+    def test_cell_area_stats(self):
+        stats = metrics.cell_area_stats(self.points)
+        self.assertAlmostEqual(stats['mean'] * 500, 4 * pi * self.mean_radius ** 2, delta=1e3)
+        self.assertLess(stats['spread'], 0.15)
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, metrics.cell_areas, EquidistantPoints(8))
+        self.assertRaises(ValueError, metrics.nearest_neighbor_stats, EquidistantPoints(100)[:50])
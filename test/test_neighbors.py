@@ -0,0 +1,76 @@
+"""Tests the neighbor adjacency graph"""
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from equidistantpoints import EquidistantPoints, NeighborGraph, coord_utils
+
+
+class TestNeighborGraph(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.points = EquidistantPoints(1000)
+        cls.ecef = cls.points.to_list('ecef')
+        cls.tmp_dir = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+
+    def __brute_force(self, ecef, index, k):
+        distances = [(sum((a - b) ** 2 for a, b in zip(coord, ecef[index])), i)
+                     for i, coord in enumerate(ecef) if i != index]
+        return [i for _, i in sorted(distances)[:k]]
+
+    def test_matches_brute_force(self):
+        for n_points, k in ((10, 6), (1000, 6), (1000, 12)):
+            points = EquidistantPoints(n_points) if n_points != 1000 else self.points
+            ecef = points.to_list('ecef')
+            graph = points.neighbor_graph(k=k)
+            self.assertEqual(graph.n_points, n_points)
+            self.assertEqual(graph.nnz, n_points * k)
+            for i in range(n_points):
+                self.assertEqual(list(graph.neighbors(i)), self.__brute_force(ecef, i, k))
+
+    def test_flattened_ellipsoid(self):
+        points = EquidistantPoints(500, equatorial_radius=1.0, polar_radius=0.7)
+        ecef = points.to_list('ecef')
+        graph = points.neighbor_graph(k=8)
+        for i in range(0, 500, 7):
+            self.assertEqual(list(graph.neighbors(i)), self.__brute_force(ecef, i, 8))
+
+    def test_symmetric(self):
+        graph = self.points.neighbor_graph(k=6)
+        symmetric = self.points.neighbor_graph(k=6, symmetric=True)
+        self.assertEqual(symmetric.k, 0)
+        expected = [set(graph.neighbors(i)) for i in range(1000)]
+        for i in range(1000):
+            for j in graph.neighbors(i):
+                expected[j].add(i)
+        for i in range(1000):
+            self.assertEqual(list(symmetric.neighbors(i)), sorted(expected[i]))
+
+    def test_save_load(self):
+        graph = self.points.neighbor_graph(k=6)
+        file_path = os.path.join(self.tmp_dir, 'graph.edpg')
+        graph.save(file_path)
+        self.assertEqual(os.path.getsize(file_path), 28 + 8 * (1001 + 6000))
+
+        mmap_options = (False, True) if coord_utils.HAS_NUMPY else (False,)
+        for mmap in mmap_options:
+            loaded = NeighborGraph.load(file_path, mmap=mmap)
+            self.assertEqual(loaded.k, 6)
+            self.assertEqual(list(loaded.indptr), list(graph.indptr))
+            self.assertEqual(list(loaded.indices), list(graph.indices))
+
+    def test_load_invalid_file(self):
+        file_path = os.path.join(self.tmp_dir, 'invalid.edpg')
+        with open(file_path, 'wb') as invalid_file:
+            invalid_file.write(b'\0' * 64)
+        self.assertRaises(ValueError, NeighborGraph.load, file_path)
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, self.points.neighbor_graph, k=0)
+        self.assertRaises(ValueError, self.points.neighbor_graph, k=1000)
+        self.assertRaises(ValueError, self.points[10:20].neighbor_graph)
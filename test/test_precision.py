@@ -0,0 +1,148 @@
+"""Tests the float32 precision mode of the coordinates"""
+import os
+import shutil
+import struct
+import tempfile
+from array import array
+from itertools import chain
+from math import asin, sqrt
+from tempfile import mkstemp
+from unittest import TestCase, skipUnless
+
+from equidistantpoints import EquidistantPoints, LatticeCache, cli, coord_utils, storage
+
+COORD_TYPES = ('cartesian', 'ecef', 'geodetic')
+LARGEST_RADIUS = 6378137.0 ** 2 / 6356752.3  # Radius of curvature at the poles (WGS-84)
+
+
+def _rounded(coordinates):
+    """Coordinates rounded to float32, as a flat list"""
+    return array('f', chain.from_iterable(coordinates)).tolist()
+
+
+def _normals(coordinates, coord_type):
+    """ECEF normal vectors of (rounded) coordinates, computed in float64"""
+    return coord_utils.convert_points([[float(c) for c in coord] for coord in coordinates],
+                                      coord_type, 'ecef', 6378137.0, 6356752.3,
+                                      coord_utils.ROTATION_AXIS)
+
+
+class TestFloat32(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.points64 = EquidistantPoints(20000)
+        cls.points32 = EquidistantPoints(20000, dtype='float32')
+
+    def setUp(self):
+        _, self.out = mkstemp()
+
+    def tearDown(self):
+        os.remove(self.out)
+
+    def test_rounded_once(self):
+        self.points32.release()
+        self.points32.ecef  # Cached float32 coordinates are not converted further
+        for coord_type in COORD_TYPES:
+            self.assertEqual(list(chain.from_iterable(self.points32.to_list(coord_type))),
+                             _rounded(self.points64.to_list(coord_type)))
+            self.assertEqual(self.points32.point_at(777, coord_type),
+                             _rounded([self.points64.point_at(777, coord_type)]))
+            self.assertEqual(self.points32[100:200].to_list(coord_type),
+                             self.points32.to_list(coord_type)[100:200])
+            self.assertEqual(EquidistantPoints(20000, dtype='float32').point_at(-1, coord_type),
+                             self.points32.to_list(coord_type)[-1])
+        self.assertEqual(self.points32.geodetic.nbytes * 2, self.points64.geodetic.nbytes)
+
+    def test_max_error(self):
+        """The positional error of each coordinate type stays within FLOAT32_MAX_ERROR"""
+        exact = self.points64.to_list('ecef')
+        for coord_type in COORD_TYPES:
+            normals = _normals(self.points32.to_list(coord_type), coord_type)
+            error = 0
+            for normal, point in zip(normals, exact):
+                norm = sqrt(sum(c ** 2 for c in normal))
+                chord = sqrt(sum((a / norm - b) ** 2 for a, b in zip(normal, point)))
+                error = max(error, 2 * asin(chord / 2) * LARGEST_RADIUS)
+            self.assertLess(error, coord_utils.FLOAT32_MAX_ERROR[coord_type])
+            self.assertGreater(error, coord_utils.FLOAT32_MAX_ERROR[coord_type] / 2)
+
+    def test_binary(self):
+        for coord_type in ('ecef', 'geodetic'):
+            for mmap in (True, False):
+                self.points32[1000:3000].write_to_binary(self.out, coord_type=coord_type)
+                self.assertEqual(os.path.getsize(self.out),
+                                 64 + 2000 * 4 * coord_utils.COORD_WIDTHS[coord_type])
+                loaded = EquidistantPoints.load(self.out, mmap=mmap)
+                self.assertEqual(loaded.dtype, 'float32')
+                self.assertEqual(loaded.indices, range(1000, 3000))
+                self.assertEqual(loaded.to_list(coord_type),
+                                 self.points32.to_list(coord_type)[1000:3000])
+                self.assertEqual(loaded.to_list('geodetic'),
+                                 self.points32.to_list('geodetic')[1000:3000])
+
+        self.points32.write_to_npy(self.out, coord_type='cartesian')
+        header = storage.read_header(self.out)
+        self.assertEqual((header['dtype'], header['offset'] % 64), ('float32', 0))
+        self.assertEqual(storage.load_coordinates(self.out).tolist(),
+                         self.points32.to_list('cartesian'))
+
+    def test_version_1_header(self):
+        self.points64[:10].write_to_binary(self.out)
+        with open(self.out, 'r+b') as f:
+            f.seek(4)
+            f.write(struct.pack('<I', 1))
+            f.seek(storage.BINARY_HEADER.size - 4)
+            f.write(b'\0' * 4)
+        self.assertEqual(storage.read_header(self.out)['dtype'], 'float64')
+        self.assertEqual(EquidistantPoints.load(self.out).to_list('geodetic'),
+                         self.points64.to_list('geodetic')[:10])
+
+    def test_text(self):
+        self.points32.write_geodetic_to_csv(self.out)
+        with open(self.out) as f:
+            rows = [[float(value) for value in row.split(',')] for row in f.read().split()[1:]]
+        self.assertEqual(_rounded(rows),
+                         list(chain.from_iterable(self.points32.to_list('geodetic'))))
+        self.assertEqual(storage.format_rows([array('f', [0.1, -2.5]).tolist()], delimiter=' ',
+                                             start_index=0, dtype='float32'),
+                         '0 0.100000001 -2.5\r\n')
+
+    def test_cache(self):
+        directory = tempfile.mkdtemp()
+        try:
+            cache = LatticeCache(directory)
+            self.assertNotEqual(cache.path(self.points32, 'ecef'),
+                                cache.path(self.points64, 'ecef'))
+            EquidistantPoints(20000, cache=cache, dtype='float32').ecef
+            EquidistantPoints(20000, cache=cache).ecef
+            cached = EquidistantPoints(20000, cache=cache, dtype='float32')
+            self.assertEqual(cached.to_list('ecef'), self.points32.to_list('ecef'))
+            self.assertEqual(EquidistantPoints(20000, cache=cache).to_list('ecef'),
+                             self.points64.to_list('ecef'))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_workers(self):
+        points = EquidistantPoints(20000, workers=2, dtype='float32')
+        self.assertEqual(points.to_list('geodetic'), self.points32.to_list('geodetic'))
+
+    def test_cli(self):
+        cli.main(['20000', '--dtype', 'float32', '--format', 'binary', '-f', self.out])
+        loaded = EquidistantPoints.load(self.out)
+        self.assertEqual(loaded.dtype, 'float32')
+        self.assertEqual(loaded.to_list('geodetic'), self.points32.to_list('geodetic'))
+
+    def test_invalid_dtype(self):
+        self.assertRaises(ValueError, EquidistantPoints, 100, dtype='float16')
+
+    @skipUnless(coord_utils.HAS_NUMPY, 'NumPy is not installed')
+    def test_numpy(self):
+        np = coord_utils.np
+        self.assertEqual(self.points32.geodetic.dtype, np.float32)
+        self.assertEqual(next(self.points32[:0].iter_points('ecef'), None), None)
+        self.assertEqual(next(EquidistantPoints(100, dtype='float32').iter_points()).dtype,
+                         np.float32)
+        self.points32.write_to_npy(self.out)
+        loaded = np.load(self.out)
+        self.assertEqual(loaded.dtype, np.float32)
+        self.assertTrue(np.array_equal(loaded, self.points64.geodetic.astype(np.float32)))
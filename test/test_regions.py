@@ -0,0 +1,139 @@
+"""Tests the latitude bands and bounding boxes of the lattice"""
+import json
+import os
+import sys
+from tempfile import mkstemp
+from unittest import TestCase
+
+from equidistantpoints import EquidistantPoints, cli, coord_utils, regions
+from equidistantpoints.coord_array import INT64_TYPECODE
+
+try:  # Python 2, whose argparse writes byte strings
+    from StringIO import StringIO
+except ImportError:  # Python 3
+    from io import StringIO
+
+BANDS = [(45.8, 47.8), (-90, 90), (89.9, 90), (-90, -89.9), (0, 0), (-10, 10), (60, 60.01)]
+BBOXES = [(5.9, 45.8, 10.5, 47.8), (170, -20, -170, 20), (-180, -90, 180, 90), (0, -90, 0, 90)]
+
+
+def _within(lon, lat, bbox):
+    lon_min, lat_min, lon_max, lat_max = bbox
+    if lon_min > lon_max:
+        return lat_min <= lat <= lat_max and (lon >= lon_min or lon <= lon_max)
+    return lat_min <= lat <= lat_max and lon_min <= lon <= lon_max
+
+
+class TestRegions(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.geodetic = EquidistantPoints(20000).to_list('geodetic')
+
+    def test_latitude_index_range(self):
+        for lat_min, lat_max in BANDS:
+            start, stop = regions.latitude_index_range(20000, lat_min, lat_max)
+            expected = [i for i, (_, lat) in enumerate(self.geodetic) if lat_min <= lat <= lat_max]
+            self.assertEqual(list(range(start, stop)), expected)
+
+        geodetic = EquidistantPoints(1000, 1.0, 1.0).to_list('geodetic')
+        start, stop = regions.latitude_index_range(1000, -30, 30, 1.0, 1.0)
+        self.assertEqual(list(range(start, stop)),
+                         [i for i, (_, lat) in enumerate(geodetic) if -30 <= lat <= 30])
+
+    def test_region_indices(self):
+        for bbox in BBOXES:
+            expected = [i for i, (lon, lat) in enumerate(self.geodetic) if _within(lon, lat, bbox)]
+            self.assertEqual(list(regions.region_indices(20000, bbox)), expected)
+            self.assertEqual(list(regions.region_indices(20000, bbox, chunk_size=7, start=500,
+                                                         stop=15000)),
+                             [i for i in expected if 500 <= i < 15000])
+
+    def test_invalid_bbox(self):
+        for bbox in [(0, 0, 1), (-181, 0, 0, 1), (0, 0, 181, 1), (0, -91, 1, 0), (0, 10, 1, 5)]:
+            self.assertRaises(ValueError, regions.check_bbox, bbox)
+        self.assertRaises(ValueError, regions.latitude_index_range, 1000, 10, 5)
+
+
+class TestEquidistantPointsRegions(TestCase):
+    def setUp(self):
+        self.points = EquidistantPoints(20000)
+        self.geodetic = self.points.to_list('geodetic')
+        self.points.release()
+        _, self.out = mkstemp()
+
+    def tearDown(self):
+        os.remove(self.out)
+
+    def test_latitude_band(self):
+        band = self.points.latitude_band(40, 60)
+        self.assertEqual(band.to_list('geodetic'), [self.geodetic[i] for i in band.indices])
+        self.assertTrue(all(40 <= lat <= 60 for _, lat in band.to_list('geodetic')))
+
+        sliced = self.points[band.indices[10]:].latitude_band(40, 60)
+        self.assertEqual(sliced.indices, band.indices[10:])
+        self.assertEqual(len(self.points[:100].latitude_band(-10, 10)), 0)
+
+    def test_region(self):
+        bbox = BBOXES[0]
+        subset = self.points.region(bbox)
+        expected = [i for i, (lon, lat) in enumerate(self.geodetic) if _within(lon, lat, bbox)]
+        self.assertEqual(list(subset.indices), expected)
+        self.assertEqual(len(subset), len(expected))
+        self.assertEqual(subset.to_list('geodetic'), [self.geodetic[i] for i in expected])
+        self.assertEqual(subset.point_at(-1), self.geodetic[expected[-1]])
+
+        subset.release()
+        self.assertEqual(subset.point_at(1), self.geodetic[expected[1]])
+        self.assertEqual(subset[1:].to_list('geodetic'), [self.geodetic[i] for i in expected[1:]])
+        self.assertEqual(list(subset.region((7, 40, 20, 50)).indices),
+                         [i for i in expected if self.geodetic[i][0] >= 7])
+        self.assertEqual(list(self.points.region((-180, 40, 180, 60)).indices),
+                         list(self.points.latitude_band(40, 60).indices))
+
+        # One 64-bit integer type on every platform, also after selecting twice
+        nested = subset.region((7, 40, 20, 50)).indices
+        if coord_utils.HAS_NUMPY:
+            self.assertEqual((subset.indices.dtype, nested.dtype), (coord_utils.np.int64,) * 2)
+        else:
+            self.assertEqual((subset.indices.typecode, nested.typecode), (INT64_TYPECODE,) * 2)
+            self.assertEqual(subset.indices.itemsize, 8)
+
+    def test_region_writers(self):
+        subset = self.points.region(BBOXES[0])
+        indices = list(subset.indices)
+
+        subset.write_geodetic_to_csv(self.out, index=True)
+        with open(self.out) as f:
+            self.assertEqual([int(row.split(',')[0]) for row in f.read().split()[1:]], indices)
+        subset.write_geodetic_to_geojson(self.out, geojson_type='features')
+        with open(self.out) as f:
+            features = json.load(f)['features']
+        self.assertEqual([feature['properties']['index'] for feature in features], indices)
+        subset.write_to_ndjson(self.out, index=True)
+        with open(self.out) as f:
+            self.assertEqual([json.loads(line)['index'] for line in f], indices)
+
+        self.assertRaises(ValueError, subset.write_to_binary, self.out)
+        band = self.points.latitude_band(40, 60)
+        band.write_to_binary(self.out)
+        self.assertEqual(EquidistantPoints.load(self.out).indices, band.indices)
+
+    def test_cli(self):
+        cli.main(['20000', '--bbox', '5.9', '45.8', '10.5', '47.8', '--index', '-f', self.out])
+        with open(self.out) as f:
+            self.assertEqual([int(row.split(',')[0]) for row in f.read().split()[1:]],
+                             list(self.points.region(BBOXES[0]).indices))
+
+        cli.main(['20000', '--lat-band', '40', '60', '--format', 'binary', '-f', self.out])
+        self.assertEqual(EquidistantPoints.load(self.out).indices,
+                         self.points.latitude_band(40, 60).indices)
+
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            for argv in (['--bbox', '0', '0', '1', '1', '--format', 'binary'],
+                         ['--lat-band', '10', '5'], ['--bbox', '0', '0', '1', '1', '--lat-band',
+                                                     '0', '1']):
+                self.assertRaises(SystemExit, cli.main, ['1000', '-f', self.out] + argv)
+        finally:
+            sys.stderr = stderr
@@ -0,0 +1,114 @@
+"""Tests the relaxation of the lattice towards more uniform nearest-neighbor distances"""
+import os
+from tempfile import mkstemp
+from unittest import TestCase, skipIf, skipUnless
+
+from equidistantpoints import EquidistantPoints, coord_utils, metrics, neighbors
+
+
+@skipUnless(coord_utils.HAS_NUMPY, 'NumPy is not installed')
+class TestRelaxation(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.points = EquidistantPoints(5000)
+        cls.relaxed = cls.points.relax(max_iterations=10)
+
+    def test_improves_uniformity(self):
+        report = self.relaxed.relaxation
+        before = metrics.nearest_neighbor_stats(self.points)
+        after = metrics.nearest_neighbor_stats(self.relaxed)
+        self.assertAlmostEqual(report.initial_deviation, before['max_deviation'], places=6)
+        self.assertLess(after['max_deviation'], 0.5 * before['max_deviation'])
+        self.assertLess(after['percentage_deviation'], before['percentage_deviation'])
+        self.assertAlmostEqual(report.improvement,
+                               1 - report.final_deviation / report.initial_deviation)
+
+    def test_report(self):
+        report = self.relaxed.relaxation
+        self.assertEqual([row[0] for row in report.history], list(range(11)))
+        self.assertEqual(report.iterations, 10)
+        self.assertEqual(report.final_deviation, min(row[2] for row in report.history))
+        self.assertEqual(report.history[report.best_iteration][2], report.final_deviation)
+        self.assertTrue(0 <= report.setup_seconds <= report.history[0][1] <= report.seconds)
+        summary = report.summary().split('\n')
+        self.assertEqual(len(summary), 13)
+        self.assertTrue(summary[report.best_iteration + 1].endswith(' *'))
+
+    def test_stopping(self):
+        report = self.points.relax(max_iterations=0).relaxation
+        self.assertEqual((report.iterations, report.improvement), (0, 0))
+
+        report = self.points.relax(target_deviation=0.06).relaxation
+        self.assertLessEqual(report.final_deviation, 0.06)
+        self.assertLess(report.iterations, 10)
+        self.assertTrue(all(row[2] > 0.06 for row in report.history[:-1]))
+
+        self.assertEqual(self.points.relax(max_seconds=0).relaxation.iterations, 0)
+
+    def test_coordinates(self):
+        np = coord_utils.np
+        ecef = self.relaxed.ecef
+        self.assertFalse(np.array_equal(ecef, self.points.ecef))
+        self.assertTrue(np.allclose((ecef ** 2).sum(axis=1), 1))
+        self.assertLess(np.abs(ecef - self.points.ecef).max(), 0.02)
+        self.assertEqual(self.points.relax(max_iterations=10).to_list('ecef'), ecef.tolist())
+
+        for coord_type in ('cartesian', 'ecef', 'geodetic'):
+            coordinates = self.relaxed.to_list(coord_type)
+            self.assertEqual(self.relaxed.point_at(-1, coord_type), coordinates[-1])
+            self.assertEqual(self.relaxed[100:200].to_list(coord_type), coordinates[100:200])
+            self.assertEqual(self.relaxed[100:200].point_at(5, coord_type), coordinates[105])
+        self.assertTrue(np.allclose(coord_utils.convert_points(
+            self.relaxed.cartesian, 'cartesian', 'ecef', self.relaxed.equatorial_radius,
+            self.relaxed.polar_radius, self.relaxed.rotation_axis), ecef))
+
+        self.relaxed.release()
+        self.assertEqual(self.relaxed.to_list('ecef'), ecef.tolist())
+        self.assertIs(self.relaxed[:10].relaxation, self.relaxed.relaxation)
+
+    def test_neighbor_graph_matches_brute_force(self):
+        np = coord_utils.np
+        ecef = self.relaxed.ecef
+        chords = ((ecef[:, np.newaxis, :] - ecef[np.newaxis, :, :]) ** 2).sum(axis=2)
+        np.fill_diagonal(chords, np.inf)
+        expected = np.sort(chords, axis=1)
+        candidates = neighbors.RELAXED_CANDIDATES
+        try:
+            # Without extra candidates, rows are searched among all points
+            for extra in (candidates, 0):
+                neighbors.RELAXED_CANDIDATES = extra
+                for k in (1, metrics.CELL_NEIGHBORS):
+                    found = self.relaxed.neighbor_graph(k=k).indices.reshape(-1, k)
+                    self.assertTrue(np.array_equal(
+                        np.take_along_axis(chords, found, axis=1), expected[:, :k]))
+        finally:
+            neighbors.RELAXED_CANDIDATES = candidates
+
+        radius = (2 * self.relaxed.equatorial_radius + self.relaxed.polar_radius) / 3
+        self.assertTrue(np.allclose(metrics.nearest_neighbor_distances(self.relaxed),
+                                    2 * radius * np.arcsin(np.sqrt(expected[:, 0]) / 2)))
+
+    def test_unsupported(self):
+        for method, args in ((self.relaxed.nearest_index, (0, 0)),
+                             (self.relaxed.nearest_indices, ([0], [0])),
+                             (self.relaxed.build_index, ()),
+                             (self.relaxed.region, ((0, 0, 10, 10),)),
+                             (self.relaxed.latitude_band, (0, 10))):
+            self.assertRaises(ValueError, method, *args)
+        self.assertRaises(ValueError, self.points[:100].relax)
+        self.assertRaises(ValueError, self.points.relax, max_iterations=-1)
+        self.assertRaises(ValueError, self.points.relax, step=0)
+
+        _, out = mkstemp()
+        try:
+            self.assertRaises(ValueError, self.relaxed.write_to_binary, out)
+            self.relaxed.write_to_npy(out, coord_type='ecef')
+            self.assertEqual(coord_utils.np.load(out).tolist(), self.relaxed.to_list('ecef'))
+        finally:
+            os.remove(out)
+
+
+@skipIf(coord_utils.HAS_NUMPY, 'NumPy is installed')
+class TestRelaxationWithoutNumpy(TestCase):
+    def test_requires_numpy(self):
+        self.assertRaises(ImportError, EquidistantPoints(1000).relax)
@@ -0,0 +1,221 @@
+"""Tests the local lookup service"""
+import json
+import os
+import socket
+import tempfile
+import threading
+from unittest import TestCase, skipIf
+
+from equidistantpoints import EquidistantPoints, cli, service
+
+QUERIES = [[13.4, 52.5], [-74.0, 40.7], [151.2, -33.9], [0.0, 90.0], [-180.0, -90.0]]
+
+
+def _request(method, path, body=None, close=False):
+    """Raw HTTP/1.1 request bytes"""
+    body = b'' if body is None else json.dumps(body).encode('utf-8')
+    return '{} {} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {}\r\n{}\r\n'.format(
+        method, path, len(body), 'Connection: close\r\n' if close else '').encode('latin1') + body
+
+
+def _read_response(f):
+    """(status, headers, decoded JSON body) of the next response of a socket file"""
+    status = int(f.readline().split()[1])
+    headers = {}
+    while True:
+        line = f.readline().decode('latin1').strip()
+        if not line:
+            break
+        name, _, value = line.partition(':')
+        headers[name.lower()] = value.strip()
+    body = f.read(int(headers['content-length']))
+    return status, headers, json.loads(body.decode('utf-8'))
+
+
+@skipIf(service.asyncio is None, 'asyncio is not available')
+class TestLookupService(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.points = EquidistantPoints(20000)
+        cls.service = service.LookupService(cls.points)
+        cls.service.start(port=0)
+        cls.thread = threading.Thread(target=cls.service.serve_forever)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.stop()
+        cls.thread.join()
+        cls.service.close()
+
+    def setUp(self):
+        self.sock = socket.create_connection(self.service.address)
+        self.f = self.sock.makefile('rb')
+
+    def tearDown(self):
+        self.f.close()
+        self.sock.close()
+
+    def query(self, method, path, body=None, close=False):
+        self.sock.sendall(_request(method, path, body, close))
+        return _read_response(self.f)
+
+    def test_nearest(self):
+        status, _, result = self.query('POST', '/nearest', {'points': QUERIES})
+        self.assertEqual(status, 200)
+        expected = self.points.nearest_indices([lon for lon, _ in QUERIES],
+                                               [lat for _, lat in QUERIES])
+        self.assertEqual(result['indices'], list(expected))
+        self.assertEqual(self.query('POST', '/nearest', {'points': []})[2], {'indices': []})
+
+    def test_knn(self):
+        status, _, result = self.query('POST', '/knn', {'points': QUERIES, 'k': 4})
+        self.assertEqual(status, 200)
+        indices, distances = self.points.build_index().knn(QUERIES, 4)
+        self.assertEqual(result['indices'], service._to_list(indices))
+        self.assertEqual(result['distances'], service._to_list(distances))
+
+    def test_info(self):
+        status, _, result = self.query('GET', '/info')
+        self.assertEqual(status, 200)
+        self.assertEqual(result['n_points'], 20000)
+        self.assertEqual(result['equatorial_radius'], 6378137.0)
+
+    def test_errors(self):
+        self.assertEqual(self.query('GET', '/unknown')[0], 404)
+        self.assertEqual(self.query('GET', '/nearest')[0], 405)
+        for body in ({'points': [[0, 91]]}, {'points': [[0]]}, {'points': [[0, True]]},
+                     {'points': 'abc'}, [1, 2]):
+            self.assertEqual(self.query('POST', '/nearest', body)[0], 400)
+        for k in (0, 20001, 1.5, None):
+            self.assertEqual(self.query('POST', '/knn', {'points': QUERIES, 'k': k})[0], 400)
+        # The connection is kept alive after errors
+        self.assertEqual(self.query('GET', '/info')[0], 200)
+
+        self.sock.sendall(b'GARBAGE\r\n\r\n')
+        status, headers, _ = _read_response(self.f)
+        self.assertEqual((status, headers['connection']), (400, 'close'))
+        self.assertEqual(self.f.read(), b'')
+
+    def test_pipelining(self):
+        """Pipelined requests are batched and answered in request order"""
+        batches = self.service.batches
+        requests = [_request('POST', '/nearest', {'points': [query]})
+                    for query in QUERIES]
+        requests.insert(2, _request('GET', '/info'))
+        requests.append(_request('POST', '/knn', {'points': QUERIES[:1], 'k': 2},
+                                 close=True))
+        self.sock.sendall(b''.join(requests))
+
+        responses = [_read_response(self.f) for _ in requests]
+        self.assertEqual([response[2]['indices'] for response in responses[:2] + responses[3:-1]],
+                         [[self.points.nearest_index(lon, lat)] for lon, lat in QUERIES])
+        self.assertEqual(responses[2][2]['n_points'], 20000)
+        self.assertEqual(len(responses[-1][2]['indices'][0]), 2)
+        self.assertEqual(responses[-1][1]['connection'], 'close')
+        self.assertEqual(self.f.read(), b'')
+        self.assertLess(self.service.batches - batches, len(requests) - 1)
+
+    def test_large_body_in_pieces(self):
+        queries = [[lon / 10, lat / 10] for lon in range(-1800, 1800, 9) for lat in (-450, 450)]
+        request = _request('POST', '/nearest', {'points': queries})
+        for start in range(0, len(request), 1000):
+            self.sock.sendall(request[start:start + 1000])
+        self.assertEqual(_read_response(self.f)[2]['indices'],
+                         [self.points.nearest_index(lon, lat) for lon, lat in queries])
+
+    def test_concurrent_connections(self):
+        connections = [socket.create_connection(self.service.address) for _ in range(8)]
+        try:
+            for i, connection in enumerate(connections):
+                connection.sendall(_request('POST', '/nearest',
+                                            {'points': [QUERIES[i % len(QUERIES)]]}))
+            for i, connection in enumerate(connections):
+                with connection.makefile('rb') as f:
+                    lon, lat = QUERIES[i % len(QUERIES)]
+                    self.assertEqual(_read_response(f)[2]['indices'],
+                                     [self.points.nearest_index(lon, lat)])
+        finally:
+            for connection in connections:
+                connection.close()
+
+
+@skipIf(service.asyncio is None, 'asyncio is not available')
+class TestBatching(TestCase):
+    def setUp(self):
+        self.points = EquidistantPoints(5000)
+        self.service = service.LookupService(self.points)
+
+    def tearDown(self):
+        self.service.close()
+
+    def test_one_batch_per_iteration(self):
+        results = []
+        for query in QUERIES:
+            self.service.submit('nearest', [query], None, results.append)
+        self.service.submit('knn', QUERIES[:2], 3, results.append)
+        self.service.submit('knn', QUERIES[2:], 3, results.append)
+        self.service.loop.call_soon(self.service.loop.stop)
+        self.service.serve_forever()
+
+        self.assertEqual((self.service.batches, self.service.queries), (1, 2 * len(QUERIES)))
+        self.assertEqual(results[:len(QUERIES)],
+                         [[self.points.nearest_index(lon, lat)] for lon, lat in QUERIES])
+        indices, distances = self.points.build_index().knn(QUERIES, 3)
+        self.assertEqual([index for result in results[-2:] for index in result[0]],
+                         service._to_list(indices))
+
+    def test_failed_batch(self):
+        results = []
+        self.service.submit('knn', QUERIES, 5001, results.append)
+        self.service.loop.call_soon(self.service.loop.stop)
+        self.service.serve_forever()
+        self.assertIsInstance(results[0], ValueError)
+
+    def test_unix_socket(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'edpoints.sock')
+        try:
+            self.service.start(path=path)
+            self.assertEqual(self.service.address, path)
+            thread = threading.Thread(target=self.service.serve_forever)
+            thread.start()
+            try:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.connect(path)
+                with sock, sock.makefile('rb') as f:
+                    sock.sendall(_request('POST', '/nearest', {'points': QUERIES[:1]}))
+                    self.assertEqual(_read_response(f)[2]['indices'],
+                                     [self.points.nearest_index(*QUERIES[0])])
+            finally:
+                self.service.stop()
+                thread.join()
+        finally:
+            self.service.close()
+            if os.path.exists(path):
+                os.remove(path)
+            os.rmdir(directory)
+
+
+class TestParsing(TestCase):
+    def test_parse_query(self):
+        self.assertEqual(service.parse_query(b'{"points": [[1, 2.5]]}', 10), ([[1.0, 2.5]], None))
+        self.assertEqual(service.parse_query(b'{"points": [], "k": 3}', 10, True), ([], 3))
+        for body in (b'', b'\xff', b'{"points": [[1, NaN]]}', b'{"points": [[1, 2, 3]]}'):
+            self.assertRaises(ValueError, service.parse_query, body, 10)
+        self.assertRaises(ValueError, service.parse_query, b'{"points": []}', 10, True)
+
+    def test_serve_args(self):
+        args = cli.parse_serve_args(['1000', '--port', '0'])
+        self.assertEqual((args['n_points'], args['port'], args['host']), (1000, 0, '127.0.0.1'))
+        self.assertEqual(cli.parse_serve_args(['--load', 'x.bin'])['load'], 'x.bin')
+        self.assertEqual(cli.parse_serve_args(['1000'])['dtype'], 'float64')
+        for argv in ([], ['1000', '--load', 'x.bin'], ['1000', '-w', '0'],
+                     ['--load', 'x.bin', '-r', '6378000'], ['--load', 'x.bin', '-w', '2'],
+                     ['--load', 'x.bin', '--dtype', 'float32']):
+            with open(os.devnull, 'w') as devnull:
+                stderr, cli.sys.stderr = cli.sys.stderr, devnull
+                try:
+                    self.assertRaises(SystemExit, cli.parse_serve_args, argv)
+                finally:
+                    cli.sys.stderr = stderr
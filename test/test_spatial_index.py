@@ -0,0 +1,64 @@
+"""Tests the spatial index over generated points"""
+from math import asin, cos, degrees, radians, sin, sqrt
+from random import Random
+from unittest import TestCase
+
+from equidistantpoints import EquidistantPoints
+
+
+class TestSpatialIndex(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.points = EquidistantPoints(2000)
+        cls.index = cls.points.build_index()
+        cls.ecef = cls.points.to_list('ecef')
+
+        random = Random(11)
+        cls.queries = [(random.uniform(-180, 180), degrees(asin(random.uniform(-1, 1))))
+                       for _ in range(100)]
+        cls.queries += [(random.uniform(-180, 180), random.choice([-1, 1]) * random.uniform(85, 90))
+                        for _ in range(25)]
+        cls.queries += [(0, 90), (0, -90), (180, 0), (-179.99, 10), (179.99, -10)]
+
+    def __brute_force(self, lon, lat):
+        query = [cos(radians(lat)) * cos(radians(lon)), cos(radians(lat)) * sin(radians(lon)),
+                 sin(radians(lat))]
+        distances = [2 * asin(min(sqrt(sum((a - b) ** 2 for a, b in zip(coord, query))) / 2, 1))
+                     * self.index.mean_radius for coord in self.ecef]
+        return sorted((d, i) for i, d in enumerate(distances))
+
+    def test_knn(self):
+        indices, distances = self.index.knn(self.queries, 7)
+        self.assertEqual(len(indices), len(self.queries))
+        for (lon, lat), found, found_distances in zip(self.queries, indices, distances):
+            expected = self.__brute_force(lon, lat)[:7]
+            self.assertEqual(list(found), [i for _, i in expected])
+            for a, (b, _) in zip(found_distances, expected):
+                self.assertAlmostEqual(a, b, places=4)
+
+    def test_knn_first_neighbor_is_nearest(self):
+        indices, _ = self.index.knn(self.queries, 1)
+        for (lon, lat), found in zip(self.queries, indices):
+            self.assertEqual(found[0], self.points.nearest_index(lon, lat))
+
+    def test_knn_all_points(self):
+        indices, _ = self.index.knn([(10, 10)], 2000)
+        self.assertEqual(sorted(indices[0]), list(range(2000)))
+
+    def test_within(self):
+        for radius in (0, 100000, 750000, 5000000):
+            indices, distances = self.index.within(self.queries, radius)
+            for (lon, lat), found, found_distances in zip(self.queries, indices, distances):
+                expected = [i for d, i in self.__brute_force(lon, lat) if d <= radius]
+                self.assertEqual(list(found), expected)
+                self.assertTrue(all(d <= radius for d in found_distances))
+
+    def test_index_is_reused(self):
+        self.assertIs(self.points.build_index(), self.index)
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, self.index.knn, [(0, 0)], 0)
+        self.assertRaises(ValueError, self.index.knn, [(0, 0)], 2001)
+        self.assertRaises(ValueError, self.index.within, [(0, 0)], -1)
+        self.assertRaises(ValueError, self.index.within, [(0, 91)], 1000)
+        self.assertRaises(ValueError, self.points[:100].build_index)
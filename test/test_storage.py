@@ -0,0 +1,268 @@
+"""Tests the CSV writers and the binary and memory-mapped coordinate files"""
+import bz2
+import csv
+import gzip
+import io
+import json
+import os
+import struct
+import sys
+from tempfile import mkstemp
+from unittest import TestCase, skipUnless
+
+from equidistantpoints import EquidistantPoints, cli, coord_utils, storage
+
+try:  # Python 2, whose csv module writes byte strings
+    from StringIO import StringIO
+except ImportError:  # Python 3
+    from io import StringIO
+
+
+class TestStorage(TestCase):
+    def setUp(self):
+        self.points = EquidistantPoints(1000)
+        self.files = [path for _, path in (mkstemp() for _ in range(2))]
+        self.out, self.npy_out = self.files[0], self.files[1] + '.npy'
+        self.files.append(self.npy_out)
+
+    def tearDown(self):
+        for path in self.files:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_binary_round_trip(self):
+        for coord_type in ('cartesian', 'ecef', 'geodetic'):
+            for mmap in (True, False):
+                self.points.write_to_binary(self.out, coord_type=coord_type)
+                loaded = EquidistantPoints.load(self.out, mmap=mmap)
+                self.assertEqual(loaded.n_points, 1000)
+                self.assertEqual(len(loaded), 1000)
+                self.assertEqual(loaded.to_list(coord_type), self.points.to_list(coord_type))
+
+    def test_binary_layout(self):
+        self.points.write_to_binary(self.out, coord_type='geodetic')
+        with open(self.out, 'rb') as f:
+            data = f.read()
+        self.assertEqual(len(data), 64 + 1000 * 2 * 8)
+        self.assertEqual(data[:4], b'EDPC')
+        self.assertEqual(list(struct.unpack('<2d', data[64:80])),
+                         self.points.to_list('geodetic')[0])
+
+    def test_load_slice_and_radii(self):
+        points = EquidistantPoints(5000, equatorial_radius=1.0, polar_radius=0.9)[1200:1700]
+        points.write_to_binary(self.out, coord_type='ecef')
+        loaded = EquidistantPoints.load(self.out)
+        self.assertEqual(loaded.indices, range(1200, 1700))
+        self.assertEqual((loaded.equatorial_radius, loaded.polar_radius), (1.0, 0.9))
+        self.assertEqual(loaded.to_list('ecef'), points.to_list('ecef'))
+        self.assertEqual(loaded.to_list('geodetic'), points.to_list('geodetic'))
+
+    def test_npy(self):
+        self.points.write_to_npy(self.npy_out, coord_type='cartesian')
+        with open(self.npy_out, 'rb') as f:
+            self.assertEqual(len(f.read()) % 8, 0)
+        header = storage.read_header(self.npy_out)
+        self.assertEqual(header['offset'] % 64, 0)
+        self.assertEqual((header['count'], header['width']), (1000, 3))
+        coordinates = storage.load_coordinates(self.npy_out)
+        self.assertEqual(coordinates.tolist(), self.points.to_list('cartesian'))
+        self.assertRaises(ValueError, EquidistantPoints.load, self.npy_out)
+
+    @skipUnless(coord_utils.HAS_NUMPY, 'NumPy is not installed')
+    def test_npy_readable_by_numpy(self):
+        self.points.write_to_npy(self.npy_out)
+        array = coord_utils.np.load(self.npy_out, mmap_mode='r')
+        self.assertEqual(array.shape, (1000, 2))
+        self.assertTrue((array == self.points.geodetic).all())
+
+    def test_invalid_file(self):
+        with open(self.out, 'wb') as f:
+            f.write(b'x' * 100)
+        self.assertRaises(ValueError, storage.read_header, self.out)
+        self.assertRaises(ValueError, self.points.write_to_binary, self.out, 'mercator')
+
+    def test_cli(self):
+        cli.main(['1000', '-e', '--format', 'binary', '-f', self.out])
+        self.assertEqual(EquidistantPoints.load(self.out).to_list('ecef'),
+                         self.points.to_list('ecef'))
+        cli.main(['1000', '--format', 'npy', '-f', self.npy_out])
+        self.assertEqual(storage.load_coordinates(self.npy_out).tolist(),
+                         self.points.to_list('geodetic'))
+
+    def test_cli_invalid_arguments(self):
+        self.assertRaises(SystemExit, cli.parse_args, ['1000', '--precision', '-1'])
+        self.assertRaises(SystemExit, cli.parse_args, ['1000', '-c', '--format', 'geojson',
+                                                       '-f', self.out])
+
+
+class TestCsvWriter(TestCase):
+    def setUp(self):
+        self.points = EquidistantPoints(1000)
+        _, self.out = mkstemp()
+
+    def tearDown(self):
+        for path in (self.out, self.out + '.gz', self.out + '.bz2', self.out + '.xz'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def __read_rows(self, opener=open):
+        with opener(self.out, 'rb') as f:
+            return list(csv.reader(io.StringIO(f.read().decode('ascii'))))
+
+    def test_full_precision_matches_csv_module(self):
+        self.points.write_ecef_to_csv(self.out)
+        expected = StringIO()
+        writer = csv.writer(expected)
+        writer.writerow(['x', 'y', 'z'])
+        writer.writerows(self.points.to_list('ecef'))
+        with open(self.out, 'rb') as f:
+            self.assertEqual(f.read().decode('ascii'), expected.getvalue())
+
+    def test_precision(self):
+        self.points.write_geodetic_to_csv(self.out, precision=3)
+        rows = self.__read_rows()
+        self.assertEqual(rows[0], ['longitude', 'latitude'])
+        for row, expected in zip(rows[1:], self.points.to_list('geodetic')):
+            self.assertEqual(row, ['{:.3f}'.format(value) for value in expected])
+
+    def test_index_column(self):
+        self.points[250:750].write_cartesian_to_csv(self.out, index=True)
+        rows = self.__read_rows()
+        self.assertEqual(rows[0], ['index', 'x', 'y', 'z'])
+        self.assertEqual([int(row[0]) for row in rows[1:]], list(range(250, 750)))
+        self.assertEqual([[float(value) for value in row[1:]] for row in rows[1:]],
+                         self.points[250:750].to_list('cartesian'))
+
+    def test_no_header(self):
+        self.points.write_geodetic_to_csv(self.out, header=False, precision=1)
+        self.assertEqual(len(self.__read_rows()), 1000)
+
+    def test_compression(self):
+        openers = [('.gz', gzip.open), ('.bz2', bz2.BZ2File)]
+        if storage.lzma is not None:
+            openers.append(('.xz', storage.lzma.open))
+        self.points.write_geodetic_to_csv(self.out, precision=5)
+        expected = self.__read_rows()
+        for extension, opener in openers:
+            self.out += extension
+            self.points.write_geodetic_to_csv(self.out, precision=5)
+            self.assertEqual(self.__read_rows(opener), expected)
+            self.out = self.out[:-len(extension)]
+
+    def test_cli(self):
+        cli.main(['1000', '-e', '--precision', '2', '--index', '-f', self.out])
+        rows = self.__read_rows()
+        self.assertEqual(rows[0], ['index', 'x', 'y', 'z'])
+        self.assertEqual(rows[1], ['0'] + ['{:.2f}'.format(value)
+                                           for value in self.points.point_at(0, 'ecef')])
+        self.assertRaises(SystemExit, cli.parse_args, ['1000', '--precision', '-1'])
+
+
+class TestGeoJsonWriter(TestCase):
+    def setUp(self):
+        self.points = EquidistantPoints(1000)
+        _, self.out = mkstemp()
+
+    def tearDown(self):
+        for path in (self.out, self.out + '.gz'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_multipoint_matches_json_module(self):
+        self.points.write_geodetic_to_geojson(self.out)
+        with open(self.out, 'r') as f:
+            self.assertEqual(f.read(), json.dumps({'type': 'MultiPoint',
+                                                   'coordinates': self.points.to_list('geodetic')}))
+
+    def test_feature_collection(self):
+        self.points[100:900].write_geodetic_to_geojson(self.out, geojson_type='features')
+        with open(self.out, 'r') as f:
+            collection = json.load(f)
+        self.assertEqual(collection['type'], 'FeatureCollection')
+        self.assertEqual(len(collection['features']), 800)
+        for i, (feature, coordinates) in enumerate(zip(collection['features'],
+                                                       self.points[100:900].to_list('geodetic'))):
+            self.assertEqual(feature['geometry'], {'type': 'Point', 'coordinates': coordinates})
+            self.assertEqual(feature['properties'], {'index': 100 + i})
+
+    def test_sequence(self):
+        self.points.write_geodetic_to_geojson(self.out + '.gz', geojson_type='seq', precision=4)
+        with gzip.open(self.out + '.gz', 'rb') as f:
+            lines = f.read().decode('ascii').splitlines()
+        self.assertEqual(len(lines), 1000)
+        for i, (line, coordinates) in enumerate(zip(lines, self.points.to_list('geodetic'))):
+            feature = json.loads(line)
+            self.assertEqual(feature['properties'], {'index': i})
+            self.assertEqual(feature['geometry']['coordinates'],
+                             [round(value, 4) for value in coordinates])
+
+    def test_empty(self):
+        self.points[5:5].write_geodetic_to_geojson(self.out, geojson_type='features')
+        with open(self.out, 'r') as f:
+            self.assertEqual(json.load(f)['features'], [])
+        self.assertRaises(ValueError, self.points.write_geodetic_to_geojson, self.out, 'kml')
+
+    def test_cli(self):
+        cli.main(['1000', '-g', 'features', '-f', self.out])
+        with open(self.out, 'r') as f:
+            self.assertEqual(len(json.load(f)['features']), 1000)
+        cli.main(['1000', '-g', '-f', self.out])
+        with open(self.out, 'r') as f:
+            self.assertEqual(json.load(f)['type'], 'MultiPoint')
+
+
+class TestStreamingOutput(TestCase):
+    def setUp(self):
+        self.points = EquidistantPoints(1000)
+        _, self.out = mkstemp()
+        self.stdout = sys.stdout
+        sys.stdout = io.TextIOWrapper(io.BytesIO())
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+        os.remove(self.out)
+
+    def __cli_stdout(self, argv):
+        sys.stdout.buffer.seek(0)
+        sys.stdout.buffer.truncate()
+        cli.main(argv)
+        return sys.stdout.buffer.getvalue()
+
+    def __file_output(self, argv):
+        cli.main(argv + ['-f', self.out])
+        with open(self.out, 'rb') as f:
+            return f.read()
+
+    def test_stdout_matches_file(self):
+        for argv in (['1000'], ['1000', '-c', '--format', 'tsv', '--index'],
+                     ['1000', '-e', '--format', 'ndjson', '--precision', '3'],
+                     ['1000', '--format', 'binary'], ['1000', '-g', 'seq']):
+            self.assertEqual(self.__cli_stdout(argv), self.__file_output(argv))
+
+    def test_csv_to_stdout(self):
+        rows = list(csv.reader(io.StringIO(self.__cli_stdout(['1000']).decode('ascii'))))
+        self.assertEqual(rows[0], ['longitude', 'latitude'])
+        self.assertEqual([[float(value) for value in row] for row in rows[1:]],
+                         self.points.to_list('geodetic'))
+        rows = self.__cli_stdout(['1000', '--no-header']).decode('ascii').splitlines()
+        self.assertEqual(len(rows), 1000)
+
+    def test_tsv(self):
+        self.points.write_ecef_to_csv(self.out, precision=2, delimiter='\t')
+        with open(self.out, 'rb') as f:
+            lines = f.read().decode('ascii').split('\n')
+        self.assertEqual(lines[0], 'x\ty\tz')
+        self.assertEqual(lines[1], '\t'.join('{:.2f}'.format(value)
+                                             for value in self.points.point_at(0, 'ecef')))
+        self.assertEqual(lines[-1], '')
+
+    def test_ndjson(self):
+        self.points[10:20].write_to_ndjson(self.out, index=True)
+        with open(self.out, 'r') as f:
+            objects = [json.loads(line) for line in f]
+        self.assertEqual([o['index'] for o in objects], list(range(10, 20)))
+        self.assertEqual([[o['longitude'], o['latitude']] for o in objects],
+                         self.points[10:20].to_list('geodetic'))
+        self.points.write_to_ndjson(self.out, coord_type='cartesian')
+        with open(self.out, 'r') as f:
+            self.assertEqual(sorted(json.loads(f.readline())), ['x', 'y', 'z'])